@@ -7,13 +7,39 @@
 from __future__ import print_function
 
 import argparse
+import array
+import asynchat
+import asyncore
 import BaseHTTPServer
+import bisect
+import collections
+import email.utils
+import gzip
+import hashlib
 import httplib
+import itertools
+import json
+import math
+import mimetypes
+import multiprocessing
 import os
+import Queue
 import random
+import re
+import select
+import socket
+import StringIO
+import struct
 import sys
 import threading
+import time
 import urlparse
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None # shuffle_batch() falls back to pure Python
 
 ################################################################################
 
@@ -75,13 +101,63 @@ class CardsApplication(object):
     the application.
     """
 
-    def __init__(self, http_server_port=8080):
+    def __init__(self, http_server_port=8080, num_workers=0, keep_alive=False,
+            asynchronous=False, resource_cache_size=None, sprites=False,
+            max_tables=None, table_idle_timeout=None, state_dir=None,
+            seed=None, secure=False):
         """
         Initializes a new instance of this class.
         *http_server_port* must be an integer whose value is the TCP port to
         which the HTTP server will bind (default: 8080).
+        *num_workers* must be an integer whose value is the number of threads
+        with which the HTTP server will handle requests; may be 0 (the default)
+        to handle requests one at a time in the thread that runs the server.
+        *keep_alive* is evaluated as a boolean; if True then the HTTP server
+        will speak HTTP/1.1 and keep connections open between requests
+        (default: False).
+        *asynchronous* is evaluated as a boolean; if True then AsyncHttpServer
+        is used instead of MyHttpServer, and num_workers and keep_alive are
+        ignored (default: False).
+        *resource_cache_size* must be an integer whose value is the maximum
+        number of bytes of resource files that the HTTP server will cache in
+        memory; may be None (the default) to use
+        ResourceCache.DEFAULT_MAX_SIZE.
+        *sprites* is evaluated as a boolean; if True then the web pages use the
+        single image res/cards.png for all of the cards (default: False).
+        *max_tables* must be an integer whose value is the maximum number of
+        tables that the HTTP server will keep in memory; may be None (the
+        default) to use TableRegistry.DEFAULT_MAX_TABLES.
+        *table_idle_timeout* must be a number whose value is the number of
+        seconds after which the HTTP server discards an unused table; may be
+        None (the default) to use TableRegistry.DEFAULT_IDLE_TIMEOUT.
+        *state_dir* must be a string whose value is the path of the directory
+        in which the HTTP server will store the state of the tables so that it
+        survives restarts; may be None (the default) to not store it.
+        *seed* must be an integer whose value is the seed of the random number
+        generators with which the HTTP server shuffles the decks, so that the
+        shuffles are reproducible; may be None (the default) to use the random
+        module.
+        *secure* is evaluated as a boolean; if True then the HTTP server
+        shuffles the decks with the cryptographically secure random number
+        generator of the operating system (default: False).
         """
+        if resource_cache_size is None:
+            resource_cache_size = ResourceCache.DEFAULT_MAX_SIZE
+        if max_tables is None:
+            max_tables = TableRegistry.DEFAULT_MAX_TABLES
+        if table_idle_timeout is None:
+            table_idle_timeout = TableRegistry.DEFAULT_IDLE_TIMEOUT
         self.http_server_port = http_server_port
+        self.num_workers = num_workers
+        self.keep_alive = keep_alive
+        self.asynchronous = asynchronous
+        self.resource_cache_size = resource_cache_size
+        self.sprites = sprites
+        self.max_tables = max_tables
+        self.table_idle_timeout = table_idle_timeout
+        self.state_dir = state_dir
+        self.seed = seed
+        self.secure = secure
 
 
     def run(self):
@@ -89,10 +165,322 @@ class CardsApplication(object):
         Runs this application.
         Raises self.Error on error.
         """
-        http_server = MyHttpServer(self.http_server_port)
+        if self.asynchronous:
+            http_server = AsyncHttpServer(self.http_server_port,
+                resource_cache_size=self.resource_cache_size,
+                sprites=self.sprites, max_tables=self.max_tables,
+                table_idle_timeout=self.table_idle_timeout,
+                state_dir=self.state_dir, seed=self.seed,
+                secure=self.secure)
+        else:
+            http_server = MyHttpServer(self.http_server_port,
+                num_workers=self.num_workers, keep_alive=self.keep_alive,
+                resource_cache_size=self.resource_cache_size,
+                sprites=self.sprites, max_tables=self.max_tables,
+                table_idle_timeout=self.table_idle_timeout,
+                state_dir=self.state_dir, seed=self.seed,
+                secure=self.secure)
         print("To use the application, browse to http://localhost:{}"
             .format(self.http_server_port))
-        http_server.serve_forever()
+        try:
+            http_server.serve_forever()
+        finally:
+            http_server.server_close()
+
+
+    class Error(Exception):
+        """
+        Exception raised if an error occurs in the application.
+        """
+        pass
+
+################################################################################
+
+class SimulationApplication(object):
+    """
+    The "simulate" command of the cards application, which computes the
+    equity of each player in a hand of Texas hold 'em with EquitySimulator,
+    either by sampling the possible deals or by enumerating all of them, and
+    prints the result.  Simply invoke this object's run() method to run the
+    command.
+    """
+
+    def __init__(self, hands, board=(), opponents=0, max_trials=None,
+            min_trials=None, precision=None, processes=None, chunk_size=None,
+            seed=None, exhaustive=None, progress=False, output=None,
+            progress_output=None):
+        """
+        Initializes a new instance of this class.
+        *hands*, *board*, *opponents* and *seed* are as for
+        EquitySimulator.__init__(), and *max_trials*, *min_trials*,
+        *precision* and *processes* are as for EquitySimulator.run(), except
+        that None (the default) means to use the default value of
+        EquitySimulator.run().
+        *chunk_size* is as for EquitySimulator.run() or
+        EquitySimulator.enumerate_all(), whichever is used; may be None (the
+        default) to use the default value of that method.
+        *exhaustive* is evaluated as a boolean to determine whether to
+        enumerate all of the possible deals with
+        EquitySimulator.enumerate_all() instead of sampling them; may be None
+        (the default) to enumerate them if, and only if, that is possible and
+        there are at most max_trials of them.
+        *progress* is evaluated as a boolean; if True then a line is printed
+        with the progress of the simulation each time that the result of a
+        chunk is merged (default: False).
+        *output* and *progress_output* must be file-like objects to which to
+        print the result and the progress, respectively; may be None (the
+        default) to use sys.stdout and sys.stderr, respectively.
+        """
+        if max_trials is None:
+            max_trials = EquitySimulator.DEFAULT_MAX_TRIALS
+        if min_trials is None:
+            min_trials = EquitySimulator.DEFAULT_MIN_TRIALS
+        if precision is None:
+            precision = EquitySimulator.DEFAULT_PRECISION
+        self.hands = hands
+        self.board = board
+        self.opponents = opponents
+        self.max_trials = max_trials
+        self.min_trials = min_trials
+        self.precision = precision
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.seed = seed
+        self.exhaustive = exhaustive
+        self.progress = progress
+        self.output = output
+        self.progress_output = progress_output
+
+
+    def run(self):
+        """
+        Runs this application.
+        Raises self.Error on error.
+        """
+        output = self.output if self.output is not None else sys.stdout
+        try:
+            simulator = EquitySimulator(self.hands, board=self.board,
+                opponents=self.opponents, seed=self.seed)
+        except ValueError as e:
+            raise self.Error(str(e))
+
+        exhaustive = self.exhaustive
+        num_combinations = simulator.num_combinations
+        if exhaustive is None:
+            exhaustive = (num_combinations is not None and
+                num_combinations <= self.max_trials)
+        elif exhaustive and num_combinations is None:
+            raise self.Error("cannot enumerate the hole cards of opponents; "
+                "specify the hands of all of the players")
+        progress = self._print_progress if self.progress else None
+
+        start_time = time.time()
+        if exhaustive:
+            chunk_size = self.chunk_size
+            if chunk_size is None:
+                chunk_size = EquitySimulator.DEFAULT_ENUMERATION_CHUNK_SIZE
+            result = simulator.enumerate_all(processes=self.processes,
+                chunk_size=chunk_size, progress=progress)
+        else:
+            chunk_size = self.chunk_size
+            if chunk_size is None:
+                chunk_size = EquitySimulator.DEFAULT_CHUNK_SIZE
+            result = simulator.run(max_trials=self.max_trials,
+                min_trials=self.min_trials, precision=self.precision,
+                processes=self.processes, chunk_size=chunk_size,
+                progress=progress)
+        elapsed_time = time.time() - start_time
+
+        if simulator.board:
+            print("Board: {}".format(format_cards(simulator.board)),
+                file=output)
+        print("{:<8}{:>9}{:>9}{:>20}".format("Hand", "Win", "Tie", "Equity"),
+            file=output)
+        for player in xrange(result.num_players):
+            if player < len(simulator.hands):
+                name = format_cards(simulator.hands[player])
+            else:
+                name = "random"
+            line = "{:<8}{:>9.2%}{:>9.2%}{:>10.2%}".format(name,
+                result.win_probability(player), result.tie_probability(player),
+                result.equity(player))
+            if not result.exact:
+                line += " +/- {:.2%}".format(result.half_width(player))
+            print(line, file=output)
+        if result.exact:
+            print("all {} deals enumerated in {:.2f} seconds".format(
+                result.trials, elapsed_time), file=output)
+        else:
+            print("{} trials in {:.2f} seconds (seed {})".format(result.trials,
+                elapsed_time, simulator.seed), file=output)
+
+
+    def _print_progress(self, result):
+        """
+        Prints the progress of the simulation with the given result so far.
+        """
+        output = self.progress_output
+        if output is None:
+            output = sys.stderr
+        if result.total_trials is not None:
+            fraction = result.trials / float(result.total_trials)
+            print("{} of {} deals enumerated ({:.0%})".format(result.trials,
+                result.total_trials, fraction), file=output)
+        else:
+            print("{} trials, equity within +/- {:.2%}".format(result.trials,
+                result.max_half_width()), file=output)
+        output.flush()
+
+
+    class Error(Exception):
+        """
+        Exception raised if an error occurs in the application.
+        """
+        pass
+
+################################################################################
+
+class AnalysisApplication(object):
+    """
+    The "analyze" command of the cards application, which measures how close
+    the shuffles of shuffle_batch() come to a uniformly random shuffle, and how
+    quickly, with analyze_shuffles(), and prints a report.  Simply invoke this
+    object's run() method to run the command.
+    """
+
+    # the default number of decks to shuffle with each method, and the default
+    # number of times to shuffle each deck
+    DEFAULT_NUM_DECKS = 100000
+    DEFAULT_TIMES = 10
+
+    def __init__(self, methods=None, num_decks=DEFAULT_NUM_DECKS,
+            times=DEFAULT_TIMES, num_cards=52, seed=None, matrix_path=None,
+            progress=False, output=None, progress_output=None):
+        """
+        Initializes a new instance of this class.
+        *methods* must be an iterable of the names of the shuffle methods to
+        analyze, from SHUFFLE_METHODS; may be None (the default) to analyze
+        all of them.
+        *num_decks*, *times*, *num_cards* and *seed* are as for the n_decks,
+        times, num_cards and seed arguments of analyze_shuffles() (defaults:
+        DEFAULT_NUM_DECKS, DEFAULT_TIMES, 52 and None, respectively).
+        *matrix_path* must be a string whose value is the path of a CSV file to
+        which to write the position matrices (see ShuffleStatistics), with one
+        row per method, number of shuffles and card; may be None (the default)
+        to not write them.
+        *progress* is evaluated as a boolean; if True then a line is printed
+        with the number of decks analyzed after each batch (default: False).
+        *output* and *progress_output* must be file-like objects to which to
+        print the report and the progress, respectively; may be None (the
+        default) to use sys.stdout and sys.stderr, respectively.
+        """
+        if methods is None:
+            methods = SHUFFLE_METHODS
+        self.methods = tuple(methods)
+        self.num_decks = num_decks
+        self.times = times
+        self.num_cards = num_cards
+        self.seed = seed
+        self.matrix_path = matrix_path
+        self.progress = progress
+        self.output = output
+        self.progress_output = progress_output
+
+
+    def run(self):
+        """
+        Runs this application.
+        Raises self.Error on error.
+        """
+        output = self.output if self.output is not None else sys.stdout
+        progress_output = self.progress_output
+        if progress_output is None:
+            progress_output = sys.stderr
+
+        # open the matrix file first, so that an invalid path is reported
+        # before the analysis rather than after it
+        matrix_file = None
+        if self.matrix_path is not None:
+            try:
+                matrix_file = open(self.matrix_path, "w")
+            except (IOError, OSError) as e:
+                raise self.Error("unable to write {}: {}".format(
+                    self.matrix_path, e))
+
+        try:
+            if matrix_file is not None:
+                self._write_matrix_header(matrix_file)
+            for method in self.methods:
+                progress = None
+                if self.progress:
+                    def progress(num_decks, method=method):
+                        print("{}: {} of {} decks".format(method, num_decks,
+                            self.num_decks), file=progress_output)
+                        progress_output.flush()
+                start_time = time.time()
+                statistics = analyze_shuffles(self.num_decks, method=method,
+                    times=self.times, seed=self.seed,
+                    num_cards=self.num_cards, progress=progress)
+                elapsed_time = time.time() - start_time
+                self._print_report(method, statistics, elapsed_time, output)
+                if matrix_file is not None:
+                    self._write_matrices(method, statistics, matrix_file)
+        except (IOError, OSError) as e:
+            raise self.Error("unable to write {}: {}".format(
+                self.matrix_path, e))
+        finally:
+            if matrix_file is not None:
+                matrix_file.close()
+
+
+    def _print_report(self, method, statistics, elapsed_time, output):
+        """
+        Prints the report of the statistics of one shuffle method.
+        """
+        print("{} shuffle: {} decks of {} cards, shuffled {} times in {:.2f} "
+            "seconds".format(method, self.num_decks, self.num_cards,
+            self.times, elapsed_time), file=output)
+        print("{:>7}{:>14}{:>14}{:>14}{:>16}".format("Times", "Rising TVD",
+            "Position TVD", "Rising seqs", "Adjacent pairs"), file=output)
+        row_format = "{:>7}{:>14.4f}{:>14.4f}{:>14.2f}{:>16.2f}"
+        for (index, time_statistics) in enumerate(statistics):
+            print(row_format.format(index + 1,
+                time_statistics.rising_sequence_distance(),
+                time_statistics.position_distance(),
+                time_statistics.mean_rising_sequences(),
+                time_statistics.mean_adjacent_pairs()), file=output)
+        num_cards = self.num_cards
+        print(row_format.format("uniform", 0, 0, (num_cards + 1) / 2.0,
+            (num_cards - 1) / float(max(num_cards, 1))), file=output)
+        # the expected total variation distance between the observed and the
+        # true distribution of the position of a card for a uniform shuffle,
+        # below which differences are mostly sampling noise
+        noise = 0.5 * math.sqrt(2.0 * num_cards / (math.pi * self.num_decks))
+        print("(sampling noise alone gives position TVDs of roughly {:.4f})"
+            .format(noise), file=output)
+        print("", file=output)
+
+
+    def _write_matrix_header(self, f):
+        """
+        Writes the header row of the CSV file of position matrices.
+        """
+        f.write(",".join(["method", "times", "card"] +
+            ["position {}".format(position)
+            for position in xrange(self.num_cards)]) + "\n")
+
+
+    def _write_matrices(self, method, statistics, f):
+        """
+        Writes the position matrices of the given list of ShuffleStatistics
+        of a shuffle method to the CSV file of position matrices.
+        """
+        for (index, time_statistics) in enumerate(statistics):
+            matrix = time_statistics.position_probabilities()
+            for (card, probabilities) in enumerate(matrix):
+                f.write(",".join([method, str(index + 1), str(card)] +
+                    ["{:.6f}".format(probability)
+                    for probability in probabilities]) + "\n")
 
 
     class Error(Exception):
@@ -108,8 +496,18 @@ class Card(object):
     Represents a card in a standard deck of cards.
     A card has 2 properties: a suit and a rank.
     Instances of this class may be compared for equality using the == operator.
+
+    Cards are immutable.  The 52 cards of a standard deck are "interned": there
+    is exactly one instance of each, and Card(suit, rank) returns that instance
+    instead of creating a new one.  Each interned card also has a "code", an
+    integer in the range 0 to 51, inclusive, that uniquely identifies it and
+    by which interned cards are hashed and ordered.  Cards with a suit or rank
+    outside of those of a standard deck may still be created, but they are not
+    interned and their code is None.
     """
 
+    __slots__ = ("_suit", "_rank", "_code")
+
     SPADE = "spade"
     HEART = "heart"
     CLUB = "club"
@@ -129,17 +527,109 @@ class Card(object):
         DIAMOND: "diamonds",
     }
 
-    def __init__(self, suit, rank):
+    # the suits and ranks of a standard deck, in the order used to compute
+    # the codes of the interned cards: code = (suit index * 13) + (rank - 1)
+    SUITS = (CLUB, DIAMOND, HEART, SPADE)
+    RANKS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13)
+
+    # the number of distinct interned cards; also 1 more than the largest code
+    NUM_CODES = 52
+
+    def __new__(cls, suit, rank):
         """
-        Initializes a new instance of this class.
+        Returns the card with the given suit and rank.
         *suit* is the suit of the card, and must be equal to one of the
         following constants defined in this class: SPADE, HEART, CLUB, DIAMOND.
         *rank* must be an integer whose value is the rank of the card; the
         valid range is 1 to 13, inclusive, where 1 is the ace, 11 is the Jack,
         12 is the Queen, and 13 is the king.
+        If the suit and rank are valid then the interned instance is returned;
+        otherwise, a new instance is created and returned.
+        """
+        try:
+            return cls._INTERNED[(suit, rank)]
+        except (KeyError, TypeError):
+            return cls._create(suit, rank, None)
+
+
+    @classmethod
+    def _create(cls, suit, rank, code):
+        """
+        Creates and returns a new instance of this class, bypassing interning.
+        This method is called by __new__() and when building the table of
+        interned cards, and is not normally called from any other context.
+        """
+        card = object.__new__(cls)
+        object.__setattr__(card, "_suit", suit)
+        object.__setattr__(card, "_rank", rank)
+        object.__setattr__(card, "_code", code)
+        return card
+
+
+    @classmethod
+    def from_code(cls, code):
+        """
+        Returns the interned card with the given code.
+        *code* must be an integer whose value is the code of the card to
+        return, in the range 0 to 51, inclusive.
+        Raises IndexError if the code is out of range.
+        """
+        if code < 0:
+            raise IndexError("invalid card code: {}".format(code))
+        return cls._BY_CODE[code]
+
+
+    @classmethod
+    def from_string(cls, s):
+        """
+        Returns the interned card whose human-friendly string representation
+        (see __str__()) is the given string; for example, if *s* is
+        "ace of clubs" then Card(CLUB, 1) is returned.
+        Raises ValueError if the string does not name one of the interned cards.
+        """
+        try:
+            return cls._BY_STRING[s]
+        except (KeyError, TypeError):
+            raise ValueError("invalid card: {!r}".format(s))
+
+
+    @property
+    def suit(self):
+        """
+        The suit of this card.
+        """
+        return self._suit
+
+
+    @property
+    def rank(self):
         """
-        self.suit = suit
-        self.rank = rank
+        The rank of this card.
+        """
+        return self._rank
+
+
+    @property
+    def code(self):
+        """
+        The integer code of this card, in the range 0 to 51, inclusive, or None
+        if this card is not one of the cards of a standard deck.
+        """
+        return self._code
+
+
+    def __setattr__(self, name, value):
+        """
+        Raises AttributeError, since instances of this class are immutable.
+        """
+        raise AttributeError("Card objects are immutable")
+
+
+    def __delattr__(self, name):
+        """
+        Raises AttributeError, since instances of this class are immutable.
+        """
+        raise AttributeError("Card objects are immutable")
 
 
     def __eq__(self, other):
@@ -149,13 +639,92 @@ class Card(object):
         "rank" attribute with values that compare equal using the == operator
         to the corresponding attributes of this object.
         """
+        if self is other:
+            return True
         try:
             other_suit = other.suit
             other_rank = other.rank
         except AttributeError:
             return False
         else:
-            return self.suit == other_suit and self.rank == other_rank
+            return self._suit == other_suit and self._rank == other_rank
+
+
+    def __ne__(self, other):
+        """
+        Compares another object to this object for inequality.
+        Returns the logical negation of __eq__().
+        """
+        return not self.__eq__(other)
+
+
+    def __hash__(self):
+        """
+        Returns the hash code of this object.
+        The hash code of an interned card is its code.
+        """
+        code = self._code
+        if code is not None:
+            return code
+        return hash((self._suit, self._rank))
+
+
+    def __lt__(self, other):
+        """
+        Compares interned cards by their codes.
+        """
+        if self._code is None or getattr(other, "_code", None) is None:
+            return NotImplemented
+        return self._code < other._code
+
+
+    def __le__(self, other):
+        """
+        Compares interned cards by their codes.
+        """
+        if self._code is None or getattr(other, "_code", None) is None:
+            return NotImplemented
+        return self._code <= other._code
+
+
+    def __gt__(self, other):
+        """
+        Compares interned cards by their codes.
+        """
+        if self._code is None or getattr(other, "_code", None) is None:
+            return NotImplemented
+        return self._code > other._code
+
+
+    def __ge__(self, other):
+        """
+        Compares interned cards by their codes.
+        """
+        if self._code is None or getattr(other, "_code", None) is None:
+            return NotImplemented
+        return self._code >= other._code
+
+
+    def __copy__(self):
+        """
+        Returns this object, since instances of this class are immutable.
+        """
+        return self
+
+
+    def __deepcopy__(self, memo):
+        """
+        Returns this object, since instances of this class are immutable.
+        """
+        return self
+
+
+    def __reduce__(self):
+        """
+        Supports pickling; unpickling an interned card yields the interned
+        instance.
+        """
+        return (Card, (self._suit, self._rank))
 
 
     def __str__(self):
@@ -164,15 +733,15 @@ class Card(object):
         returns it.  For example, if rank==1 and suit==CLUBS then "ace of clubs"
         is returned.
         """
-        if self.rank in self.RANK_NAMES:
-            rank_name = self.RANK_NAMES[self.rank]
+        if self._rank in self.RANK_NAMES:
+            rank_name = self.RANK_NAMES[self._rank]
         else:
-            rank_name = self.rank
+            rank_name = self._rank
 
-        if self.suit in self.SUIT_NAMES:
-            suit_name = self.SUIT_NAMES[self.suit]
+        if self._suit in self.SUIT_NAMES:
+            suit_name = self.SUIT_NAMES[self._suit]
         else:
-            suit_name = self.suit
+            suit_name = self._suit
 
         return "{} of {}".format(rank_name, suit_name)
 
@@ -183,7 +752,17 @@ class Card(object):
         returns it.  For example, if rank==1 and suit==CLUBS then Card(clubs, 1)
         is returned.
         """
-        return "Card({!r}, {!r})".format(self.suit, self.rank)
+        return "Card({!r}, {!r})".format(self._suit, self._rank)
+
+
+# build the table of interned cards, indexed by code
+Card._BY_CODE = tuple(
+    Card._create(suit, rank, (suit_index * len(Card.RANKS)) + (rank - 1))
+    for (suit_index, suit) in enumerate(Card.SUITS)
+    for rank in Card.RANKS
+)
+Card._INTERNED = dict(((card.suit, card.rank), card) for card in Card._BY_CODE)
+Card._BY_STRING = dict((str(card), card) for card in Card._BY_CODE)
 
 ################################################################################
 
@@ -196,16 +775,45 @@ class Deck(list):
     can be acquired by multiple threads to safely perform concurrent access.
     This class also implements the context manager protocol to better implement
     acquiring the lock with the "with" statement.
+    To make index() take constant time, a deck maintains an index of the
+    positions of its cards by code.  The index is built by the first call to
+    index() after the deck is modified, and is kept up to date by draw(), so
+    that it is rebuilt at most once per shuffle or reset.
+    The shuffle methods use the random number generator in the "rng"
+    attribute, which is the random module unless another generator or a seed
+    is given, in which case the shuffles of the deck are reproducible, or a
+    secure generator is requested.
     """
 
+    # the patterns in which deal() may deal the cards: "round-robin" deals one
+    # card to each player in turn, as at a card table, and "block" deals all of
+    # the cards of each player before those of the next player
+    DEAL_PATTERNS = ("round-robin", "block")
+
     def __init__(self, *args, **kwargs):
         """
         Initializes a new instance of this class.
         All positional and keyword arguments are passed verbatim to the
-        constructor of the superclass.
-        If no positional or keyword arguments are given, then the list is
+        constructor of the superclass, except for the following keyword
+        arguments:
+        *rng* must be an object with the same interface as random.Random to use
+        as the source of randomness for shuffling; may be None (the default)
+        to use the random module, unless a seed is given.
+        *seed* is the seed of a new CounterRandom to use as the source of
+        randomness for shuffling; may be None (the default) to not use one.
+        *secure* is evaluated as a boolean; if True then SECURE_RANDOM, which
+        uses the cryptographically secure random number generator of the
+        operating system, is used as the source of randomness for shuffling
+        (default: False).
+        If no other positional or keyword arguments are given, then the list is
         initialized by reset().
+        Raises ValueError if more than one of rng, seed and secure are given.
         """
+        rng = kwargs.pop("rng", None)
+        seed = kwargs.pop("seed", None)
+        secure = kwargs.pop("secure", False)
+        self.rng = _create_rng(rng, seed, secure)
+        self._positions = None
         super(Deck, self).__init__(*args, **kwargs)
         if not args and not kwargs:
             self.reset()
@@ -219,7 +827,7 @@ class Deck(list):
         re-populated with the 13 different-ranked cards of each suit in
         ascending order.
         """
-        self[:] = self.iter_cards()
+        self[:] = FACTORY_CARDS
 
 
     def draw(self):
@@ -228,14 +836,145 @@ class Deck(list):
         The Card object at the highest index of this list is removed and
         returned.  IndexError is raised if this list is empty.
         """
-        return self.pop()
+        card = list.pop(self)
+        positions = self._positions
+        if positions is not None:
+            # the drawn card was at the highest index, so its position is the
+            # last one in the list of positions of its code
+            positions[card.code].pop()
+        return card
+
+
+    def draw_many(self, n):
+        """
+        Draws n cards from this deck at once, which is equivalent to, but much
+        faster than, invoking draw() n times.
+        *n* must be a non-negative integer whose value is the number of cards
+        to draw.
+        Returns a list of the drawn Card objects, in the order in which draw()
+        would have returned them (i.e. the card at the highest index first).
+        Raises ValueError if n is negative, or IndexError if there are fewer
+        than n cards in this deck, in which case no cards are drawn.
+        """
+        start = self._draw_start(n)
+        cards = list.__getslice__(self, start, len(self))
+        list.__delslice__(self, start, len(self))
+        positions = self._positions
+        if positions is not None:
+            # as in draw(), the drawn cards were at the highest indices
+            for card in cards:
+                positions[card.code].pop()
+        cards.reverse()
+        return cards
+
+
+    def _draw_start(self, n):
+        """
+        Returns the index of the first of the n cards at the top of this deck,
+        to be drawn by draw_many().
+        Raises ValueError if n is negative, or IndexError if there are fewer
+        than n cards in this deck.
+        """
+        if n < 0:
+            raise ValueError("invalid number of cards: {}".format(n))
+        if n > len(self):
+            raise IndexError("cannot draw {} cards from a deck of {}"
+                .format(n, len(self)))
+        return len(self) - n
+
+
+    def deal(self, players, cards_each, pattern="round-robin"):
+        """
+        Deals hands of cards from this deck, drawing all of the cards at once
+        with draw_many().
+        *players* must be a non-negative integer whose value is the number of
+        hands to deal.
+        *cards_each* must be a non-negative integer whose value is the number of
+        cards to deal to each player.
+        *pattern* must be one of the strings in DEAL_PATTERNS, which determines
+        which of the drawn cards each player receives (default:
+        "round-robin").
+        Returns a list of the hands, each of which is a list of Card objects in
+        the order in which they were dealt.
+        Raises ValueError if any of the arguments is invalid, or IndexError if
+        there are fewer than players * cards_each cards in this deck, in which
+        case no cards are drawn.
+        """
+        self._check_deal(players, cards_each, pattern)
+        return self._split_hands(self.draw_many(players * cards_each),
+            players, cards_each, pattern)
+
+
+    @classmethod
+    def _check_deal(cls, players, cards_each, pattern):
+        """
+        Raises ValueError if the arguments of deal() are invalid.
+        """
+        if players < 0:
+            raise ValueError("invalid number of players: {}".format(players))
+        if cards_each < 0:
+            raise ValueError("invalid number of cards: {}".format(cards_each))
+        if pattern not in cls.DEAL_PATTERNS:
+            raise ValueError("invalid deal pattern: {}".format(pattern))
+
+
+    @staticmethod
+    def _split_hands(cards, players, cards_each, pattern):
+        """
+        Splits the cards drawn by deal() into the hands of the players, with
+        one slice per hand.
+        """
+        if pattern == "block":
+            return [cards[i * cards_each:(i + 1) * cards_each]
+                for i in xrange(players)]
+        return [cards[i::players] for i in xrange(players)]
+
+
+    def index(self, card, *args):
+        """
+        Returns the index of the lowest-indexed occurrence of the given card in
+        this deck.  If *card* has a code (see Card.code) and no start or stop
+        arguments are specified then this takes constant time, except for the
+        first call after the deck is modified other than by draw().
+        Raises ValueError if the card is not in this deck.
+        """
+        code = getattr(card, "code", None)
+        if code is None or args:
+            return list.index(self, card, *args)
+
+        positions = self._positions
+        if positions is None:
+            positions = self._build_positions()
+            if positions is None:
+                return list.index(self, card)
+
+        card_positions = positions[code]
+        if not card_positions:
+            raise ValueError("{!r} is not in deck".format(card))
+        return card_positions[0]
+
+
+    def _build_positions(self):
+        """
+        Builds and stores the index used by index() and returns it; returns
+        None if the index cannot be built because the deck contains an object
+        that does not have a code.
+        """
+        positions = [[] for unused in xrange(Card.NUM_CODES)]
+        for (index, card) in enumerate(self):
+            code = getattr(card, "code", None)
+            if code is None:
+                return None
+            positions[code].append(index)
+        self._positions = positions
+        return positions
 
 
     def shuffle(self):
         """
         Shuffles the cards in this deck using complete randomness.
         """
-        random.shuffle(self)
+        self.rng.shuffle(self)
 
 
     def shuffle_3waycut(self, split_index_1=None, split_index_2=None):
@@ -256,92 +995,153 @@ class Deck(list):
         if len(self) < 3:
             self.shuffle()
             return
-
-        if split_index_1 is None:
-            split_index_1 = random.randint(1, len(self) - 2)
-        if split_index_2 is None:
-            split_index_2 = random.randint(split_index_1 + 1, len(self) - 1)
-        chunk1 = self[:split_index_1]
-        chunk2 = self[split_index_1:split_index_2]
-        chunk3 = self[split_index_2:]
-        chunks = [chunk1, chunk2, chunk3]
-        random.shuffle(chunks)
-        del self[:]
-        for chunk in chunks:
-            self.extend(chunk)
+        self[:] = shuffled_3waycut(self, split_index_1, split_index_2,
+            self.rng)
 
 
-    def shuffle_riffle(self):
+    def shuffle_riffle(self, times=1):
         """
         Shuffles the cards in the deck using the "riffle" technique.
         According to Wikipedia, riffle is a shuffling technique "in which half
         of the deck is held in each hand with the thumbs inward, then cards are
         released by the thumbs so that they fall to the table interleaved.
+        *times* must be an integer whose value is the number of times to riffle
+        the deck (default: 1); for example, specify 7 to perform the 7 riffles
+        that are commonly considered to sufficiently randomize a 52-card deck.
         """
-        num_cards = len(self)
+        self[:] = shuffled_riffle(self, self.rng, times)
 
-        # nothing to do if deck is empty or only has 1 card
-        if num_cards <= 1:
-            return
 
-        # find a uniform interval about the center of the deck;
-        # the "leeway" simulates how closely a human will find the true center,
-        # with increasing accuracy as the deck gets smaller
-        mid = num_cards / 2
-        leeway = num_cards / 10
-        mid_left = mid - leeway
-        if mid_left < 1:
-            mid_left = 1
-        mid_right = mid + leeway
-        if mid_right > num_cards - 1:
-            mid_right = num_cards - 1
+    @staticmethod
+    def iter_cards(num_decks=1):
+        """
+        A generator function that yields each of the unique cards in a 52-card
+        deck as Card objects, grouped by suit and in decreasing order of rank,
+        from King down to Ace.
+        *num_decks* must be an integer whose value is the number of times to
+        yield the cards of the deck (default: 1).
+        """
+        for unused in xrange(num_decks):
+            for suit in (Card.CLUB, Card.DIAMOND, Card.HEART, Card.SPADE):
+                for rank in (13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1):
+                    yield Card(suit, rank)
 
-        # split the deck into two halves, choosing the split point randomly
-        # within the "leeway" of the true center, as calculated above
-        split_index = random.randint(mid_left, mid_right)
-        left = self[:split_index]
-        right = self[split_index:]
 
-        # remove all cards from the deck;
-        # they will be added back in the loop below as they are "fanned"
-        del self[:]
+    # the methods below override those of list that modify the list, in order
+    # to discard the information derived from the cards; see _invalidate()
 
-        # continue contributing cards from the left and right piles until both
-        # are empty
-        while left or right:
+    def _invalidate(self):
+        """
+        Discards the information derived from the cards in this deck, which is
+        rebuilt when it is next needed: the index of card positions used by
+        index().  This method is invoked by the methods that modify the list,
+        other than draw() and draw_many(), which keep it up to date.
+        """
+        self._positions = None
 
-            # size_difference is used to simulate how a human will tend to
-            # "even out" the left and right piles should one start getting
-            # noticeably smaller than the other
-            size_difference = len(right) - len(left)
 
-            # contribute a few cards from the right hand, if the pile isn't too
-            # much bigger than the one in the left hand
-            if size_difference > -5:
-                n = random.randint(1, 3)
-                while right and n > 0:
-                    self.append(right.pop(0))
-                    n -= 1
+    def __setitem__(self, index, value):
+        """
+        Replaces the card (or slice of cards) at the given index.
+        """
+        self._invalidate()
+        list.__setitem__(self, index, value)
 
-            # contribute a few cards from the left hand, if the pile isn't too
-            # much bigger than the one in the right hand
-            if size_difference < 5:
-                n = random.randint(1, 3)
-                while left and n > 0:
-                    self.append(left.pop(0))
-                    n -= 1
 
+    def __delitem__(self, index):
+        """
+        Removes the card (or slice of cards) at the given index.
+        """
+        self._invalidate()
+        list.__delitem__(self, index)
 
-    @staticmethod
-    def iter_cards():
+
+    def __setslice__(self, i, j, sequence):
         """
-        A generator function that yields each of the unique cards in a 52-card
-        deck as Card objects, grouped by suit and in decreasing order of rank,
-        from King down to Ace.
+        Replaces the cards from index i up to index j.
+        """
+        self._invalidate()
+        list.__setslice__(self, i, j, sequence)
+
+
+    def __delslice__(self, i, j):
+        """
+        Removes the cards from index i up to index j.
+        """
+        self._invalidate()
+        list.__delslice__(self, i, j)
+
+
+    def __iadd__(self, other):
+        """
+        Adds the cards of another sequence to the top of the deck.
+        """
+        self._invalidate()
+        return list.__iadd__(self, other)
+
+
+    def __imul__(self, n):
+        """
+        Repeats the cards in the deck n times.
+        """
+        self._invalidate()
+        return list.__imul__(self, n)
+
+
+    def append(self, card):
+        """
+        Adds a card to the top of the deck.
         """
-        for suit in (Card.CLUB, Card.DIAMOND, Card.HEART, Card.SPADE):
-            for rank in (13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1):
-                yield Card(suit, rank)
+        self._invalidate()
+        list.append(self, card)
+
+
+    def extend(self, cards):
+        """
+        Adds the given cards to the top of the deck.
+        """
+        self._invalidate()
+        list.extend(self, cards)
+
+
+    def insert(self, index, card):
+        """
+        Inserts a card into the deck before the given index.
+        """
+        self._invalidate()
+        list.insert(self, index, card)
+
+
+    def pop(self, *args):
+        """
+        Removes and returns the card at the given index (default: the top).
+        """
+        self._invalidate()
+        return list.pop(self, *args)
+
+
+    def remove(self, card):
+        """
+        Removes the first occurrence of the given card from the deck.
+        """
+        self._invalidate()
+        list.remove(self, card)
+
+
+    def reverse(self):
+        """
+        Reverses the order of the cards in the deck.
+        """
+        self._invalidate()
+        list.reverse(self)
+
+
+    def sort(self, *args, **kwargs):
+        """
+        Sorts the cards in the deck, with the same arguments as list.sort().
+        """
+        self._invalidate()
+        list.sort(self, *args, **kwargs)
 
 
     def __enter__(self):
@@ -360,42 +1160,4696 @@ class Deck(list):
 
 ################################################################################
 
-class MyHttpServer(BaseHTTPServer.HTTPServer):
+class Shoe(Deck):
     """
-    The HTTP server that provides the user interface for this application.
+    A "shoe" of cards, as used by casinos, consisting of multiple decks of cards
+    shuffled together.  A cut card is placed in the shoe to mark the point at
+    which the shoe should be reshuffled; see needs_shuffle.
+    The number of cards of each rank and suit remaining in the shoe are kept
+    up to date as cards are drawn, so that count_rank() and count_suit() take
+    constant time.  Any other modification of the list, such as a shuffle or
+    slice assignment, discards the counts, like the index of card positions
+    of Deck, and they are recounted when they are next needed.
     """
 
-    def __init__(self, tcp_port):
+    def __init__(self, num_decks=6, cut_card_penetration=0.75, rng=None,
+            seed=None, secure=False):
         """
         Initializes a new instance of this class.
-        *tcp_port* must be an integer whose value is the TCP port to which the
-        HTTP server will bind and to which it will listen for and handle
-        requests.
+        *num_decks* must be an integer whose value is the number of 52-card
+        decks in the shoe (default: 6).
+        *cut_card_penetration* must be a number between 0 and 1, inclusive,
+        whose value is the fraction of the cards in a full shoe that are to be
+        dealt before the cut card is reached (default: 0.75).
+        *rng*, *seed* and *secure* are as in Deck.__init__().
+        The shoe is initialized by reset().
         """
-        self.deck = Deck()
-        self.discard = None
-        self.message = None
-        address = ("", tcp_port)
+        self.num_decks = num_decks
+        self.num_cards = num_decks * Card.NUM_CODES
+        self.cut_card_position = int(round(self.num_cards *
+            cut_card_penetration))
+        self._rank_counts = None
+        self._suit_counts = None
+        super(Shoe, self).__init__(rng=rng, seed=seed, secure=secure)
+
+
+    def reset(self):
+        """
+        Resets the shoe back to the "factory" state: the cards of num_decks
+        decks, each in the order of Deck.iter_cards().
+        """
+        self[:] = self.iter_cards(self.num_decks)
+        self.recount()
+
+
+    def draw(self):
+        """
+        Draws a card from this shoe.
+        The Card object at the highest index of this list is removed and
+        returned.  IndexError is raised if this list is empty.
+        """
+        card = super(Shoe, self).draw()
+        if self._rank_counts is not None:
+            self._rank_counts[card.rank] -= 1
+            self._suit_counts[card.suit] -= 1
+        return card
+
+
+    def draw_many(self, n):
+        """
+        Draws n cards from this shoe at once; see Deck.draw_many().
+        """
+        cards = super(Shoe, self).draw_many(n)
+        rank_counts = self._rank_counts
+        suit_counts = self._suit_counts
+        if rank_counts is not None:
+            for card in cards:
+                rank_counts[card.rank] -= 1
+                suit_counts[card.suit] -= 1
+        return cards
+
+
+    def _invalidate(self):
+        """
+        Discards the counts of the cards of each rank and suit, as well as the
+        information discarded by Deck._invalidate().
+        """
+        super(Shoe, self)._invalidate()
+        self._rank_counts = None
+        self._suit_counts = None
+
+
+    def recount(self):
+        """
+        Recalculates the number of cards of each rank and suit in this shoe.
+        The counts are recalculated automatically when they are needed after
+        the list is modified, so this method need not be called.
+        """
+        rank_counts = [0] * (len(Card.RANKS) + 1)
+        suit_counts = dict.fromkeys(Card.SUITS, 0)
+        for card in self:
+            rank_counts[card.rank] += 1
+            suit_counts[card.suit] += 1
+        self._rank_counts = rank_counts
+        self._suit_counts = suit_counts
+
+
+    @property
+    def rank_counts(self):
+        """
+        A list whose element at each index is the number of cards of that rank
+        remaining in this shoe; the element at index 0 is always 0.
+        """
+        if self._rank_counts is None:
+            self.recount()
+        return self._rank_counts
+
+
+    @property
+    def suit_counts(self):
+        """
+        A dict that maps each of the suits defined in Card to the number of
+        cards of that suit remaining in this shoe.
+        """
+        if self._suit_counts is None:
+            self.recount()
+        return self._suit_counts
+
+
+    def count_rank(self, rank):
+        """
+        Returns the number of cards of the given rank remaining in this shoe.
+        *rank* must be an integer in the range 1 to 13, inclusive.
+        """
+        return self.rank_counts[rank]
+
+
+    def count_suit(self, suit):
+        """
+        Returns the number of cards of the given suit remaining in this shoe.
+        *suit* must be one of the suit constants defined in Card.
+        """
+        return self.suit_counts[suit]
+
+
+    @property
+    def num_dealt(self):
+        """
+        The number of cards that have been dealt from this shoe since it was
+        last full; 0 if cards have been added so that it holds more than a
+        full shoe.
+        """
+        return max(self.num_cards - len(self), 0)
+
+
+    @property
+    def penetration(self):
+        """
+        The fraction of the cards of a full shoe that have been dealt; a
+        number between 0 and 1, inclusive.
+        """
+        if not self.num_cards:
+            return 0.0
+        return float(self.num_dealt) / self.num_cards
+
+
+    @property
+    def needs_shuffle(self):
+        """
+        Whether the cut card has been reached, indicating that the shoe should
+        be reset and shuffled before the next round.
+        """
+        return self.num_dealt >= self.cut_card_position
+
+################################################################################
+
+# the cards of a "factory" deck, in the order of Deck.iter_cards(), and their
+# codes
+FACTORY_CARDS = tuple(Deck.iter_cards())
+FACTORY_CODES = bytes(bytearray(card.code for card in FACTORY_CARDS))
+
+################################################################################
+
+class CompactDeck(object):
+    """
+    A deck of cards that stores each card as its one-byte code (see Card.code)
+    in a bytearray, rather than as a list of references to Card objects.
+    This class supports the same operations as Deck, but a CompactDeck of 52
+    cards occupies about 200 bytes instead of the 2 KB or so of a Deck, making
+    it suitable for applications that hold many decks at once.  Card objects
+    are only materialized when cards are drawn, indexed or iterated.
+    Only cards that have a code (i.e. the 52 cards of a standard deck) may be
+    stored in a CompactDeck.  As with Deck, the "bottom" of the deck is index 0,
+    instances of this class are *not* thread-safe, the "lock" attribute and
+    context manager protocol may be used to safely perform concurrent access,
+    and the shuffle methods use the random number generator in the "rng"
+    attribute.
+    """
+
+    __slots__ = ("codes", "rng", "_lock")
+
+    # the lock acquired when creating the "lock" of an instance
+    _LOCK_CREATION_LOCK = threading.Lock()
+
+    def __init__(self, cards=None, rng=None, seed=None, secure=False):
+        """
+        Initializes a new instance of this class.
+        *cards* must be an iterable of Card objects with which to populate the
+        deck, bottom card first; may be None (the default) to initialize the
+        deck by reset().
+        *rng*, *seed* and *secure* are as in Deck.__init__().
+        Raises ValueError if any of the given cards does not have a code, or if
+        more than one of rng, seed and secure are given.
+        """
+        self.codes = bytearray()
+        self.rng = _create_rng(rng, seed, secure)
+        self._lock = None
+        if cards is None:
+            self.reset()
+        else:
+            self.codes[:] = self.encode(cards)
+
+
+    @classmethod
+    def from_codes(cls, codes):
+        """
+        Creates and returns a new instance of this class from card codes.
+        *codes* must be a string or an iterable of integers whose values are
+        the codes of the cards of the deck, bottom card first.
+        """
+        deck = cls(())
+        deck.codes[:] = codes
+        return deck
+
+
+    @property
+    def lock(self):
+        """
+        The threading.RLock that may be acquired to safely perform concurrent
+        access to this deck.  The lock is created on first use, so that decks
+        that are never shared between threads do not pay for one.
+        """
+        lock = self._lock
+        if lock is None:
+            with self._LOCK_CREATION_LOCK:
+                lock = self._lock
+                if lock is None:
+                    lock = self._lock = threading.RLock()
+        return lock
+
+
+    def reset(self):
+        """
+        Resets the deck back to the "factory" state; see Deck.reset().
+        """
+        self.codes[:] = FACTORY_CODES
+
+
+    def draw(self):
+        """
+        Draws a card from this deck.
+        The card at the highest index is removed and returned as a Card object.
+        IndexError is raised if this deck is empty.
+        """
+        return Card.from_code(self.codes.pop())
+
+
+    def draw_many(self, n):
+        """
+        Draws n cards from this deck at once; see Deck.draw_many().
+        """
+        if n < 0:
+            raise ValueError("invalid number of cards: {}".format(n))
+        codes = self.codes
+        if n > len(codes):
+            raise IndexError("cannot draw {} cards from a deck of {}"
+                .format(n, len(codes)))
+        start = len(codes) - n
+        drawn = codes[start:]
+        del codes[start:]
+        drawn.reverse()
+        return map(Card.from_code, drawn)
+
+
+    def deal(self, players, cards_each, pattern="round-robin"):
+        """
+        Deals hands of cards from this deck; see Deck.deal().
+        """
+        Deck._check_deal(players, cards_each, pattern)
+        return Deck._split_hands(self.draw_many(players * cards_each),
+            players, cards_each, pattern)
+
+
+    def shuffle(self):
+        """
+        Shuffles the cards in this deck using complete randomness.
+        """
+        self.rng.shuffle(self.codes)
+
+
+    def shuffle_3waycut(self, split_index_1=None, split_index_2=None):
+        """
+        Shuffles the cards in this deck using a "3-way cut" style; see
+        Deck.shuffle_3waycut() for details.
+        """
+        if len(self.codes) < 3:
+            self.shuffle()
+            return
+        self.codes[:] = shuffled_3waycut(self.codes, split_index_1,
+            split_index_2, self.rng)
+
+
+    def shuffle_riffle(self, times=1):
+        """
+        Shuffles the cards in this deck using the "riffle" technique; see
+        Deck.shuffle_riffle() for details.
+        """
+        self.codes[:] = shuffled_riffle(self.codes, self.rng, times)
+
+
+    def index(self, card):
+        """
+        Returns the index of the lowest-indexed occurrence of the given card in
+        this deck.  *card* must be a Card object.
+        Raises ValueError if the card is not in this deck.
+        """
+        code = card.code
+        if code is not None:
+            index = self.codes.find(chr(code))
+            if index >= 0:
+                return index
+        raise ValueError("{!r} is not in deck".format(card))
+
+
+    def to_deck(self):
+        """
+        Creates and returns a new Deck with the same cards as this deck.
+        """
+        return Deck(self)
+
+
+    @staticmethod
+    def encode(cards):
+        """
+        Returns a bytearray whose bytes are the codes of the given Card objects,
+        which is how CompactDeck stores them.
+        Raises ValueError if any of the given cards does not have a code.
+        """
+        codes = bytearray()
+        for card in cards:
+            code = card.code
+            if code is None:
+                raise ValueError("card cannot be stored in a CompactDeck "
+                    "because it does not have a code: {!r}".format(card))
+            codes.append(code)
+        return codes
+
+
+    def __len__(self):
+        """
+        Returns the number of cards in this deck.
+        """
+        return len(self.codes)
+
+
+    def __iter__(self):
+        """
+        Returns an iterator over the cards in this deck, bottom card first,
+        creating the Card objects lazily.
+        """
+        from_code = Card.from_code
+        return (from_code(code) for code in self.codes)
+
+
+    def __getitem__(self, index):
+        """
+        Returns the card at the given index; if *index* is a slice object then
+        a new CompactDeck with the cards of the slice is returned.
+        """
+        if isinstance(index, slice):
+            return self.from_codes(self.codes[index])
+        return Card.from_code(self.codes[index])
+
+
+    def __contains__(self, card):
+        """
+        Returns whether the given card is in this deck.
+        """
+        code = getattr(card, "code", None)
+        return code is not None and self.codes.find(chr(code)) >= 0
+
+
+    def __eq__(self, other):
+        """
+        Compares another object to this object for equality.
+        Two CompactDeck objects are equal if they contain the same cards in the
+        same order.
+        """
+        if not isinstance(other, CompactDeck):
+            return NotImplemented
+        return self.codes == other.codes
+
+
+    def __ne__(self, other):
+        """
+        Compares another object to this object for inequality.
+        """
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+
+    __hash__ = None
+
+
+    def __repr__(self):
+        """
+        Creates a Python-friendly string representation of this object, and
+        returns it.
+        """
+        return "CompactDeck({!r})".format(list(self))
+
+
+    def __getstate__(self):
+        """
+        Supports pickling; the lock is not pickled, nor is the random number
+        generator if it is the random module.
+        """
+        if self.rng is random:
+            return bytes(self.codes)
+        return (bytes(self.codes), self.rng)
+
+
+    def __setstate__(self, state):
+        """
+        Supports unpickling.
+        """
+        rng = random
+        if isinstance(state, tuple):
+            (state, rng) = state
+        self.codes = bytearray(state)
+        self.rng = rng
+        self._lock = None
+
+
+    def __enter__(self):
+        """
+        Acquire the lock when we are "entered" with the "with" statement.
+        """
+        self.lock.acquire()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Release the lock when the "with" statement exits.
+        """
+        self.lock.release()
+
+################################################################################
+
+class CounterRandom(random.Random):
+    """
+    A fast random number generator whose state is just a key, derived from the
+    seed and a "stream" number, and a counter: the n'th random number is a
+    hash of the key and n (the "SplitMix64" generator).  Generators with the
+    same seed but different streams produce independent sequences, so that
+    each deck, or each process of a parallel simulation, can have its own
+    reproducible generator without sharing one, and the state of a generator
+    can be saved or restored by noting its counter.
+    All of the methods of random.Random are supported; the sequences differ
+    from those of random.Random for the same seed.
+    """
+
+    # the constants of SplitMix64
+    GAMMA = 0x9E3779B97F4A7C15
+    MIX_1 = 0xBF58476D1CE4E5B9
+    MIX_2 = 0x94D049BB133111EB
+    MASK = 0xFFFFFFFFFFFFFFFF
+
+    # the value returned by random() is the top 53 bits of a 64-bit number
+    # multiplied by this value
+    RECIP_BPF = 2.0 ** -53
+
+    # the first element of the tuples returned by getstate()
+    VERSION = "CounterRandom-1"
+
+    def __new__(cls, *args, **kwargs):
+        # the constructor of random.Random would otherwise reject "stream"
+        return random.Random.__new__(cls)
+
+
+    def __init__(self, x=None, stream=0):
+        """
+        Initializes a new instance of this class.
+        *x* is the seed, as for seed().
+        *stream* must be a non-negative integer whose value is the number of
+        the stream of random numbers to generate for the seed (default: 0).
+        """
+        self.stream = stream
+        random.Random.__init__(self, x)
+
+
+    def seed(self, a=None):
+        """
+        Initializes the state of this generator from a seed, and sets the
+        counter to 0.
+        *a* is the seed: an integer, or a hashable object whose hash is used;
+        may be None (the default) to seed from os.urandom().
+        """
+        if a is None:
+            a = struct.unpack(">Q", os.urandom(8))[0]
+        elif not isinstance(a, (int, long)):
+            a = hash(a)
+        self.seed_value = a
+        self.key = self._derive_key(abs(a), abs(self.stream))
+        self.counter = 0
+        self.gauss_next = None
+
+
+    @classmethod
+    def _derive_key(cls, seed, stream):
+        """
+        Returns the key of the generator with the given non-negative seed and
+        stream, which is a hash of each 64 bits of their values.
+        """
+        key = 0
+        for value in (seed, stream):
+            num_words = 0
+            while True:
+                key = cls._mix((key + (value & cls.MASK) + cls.GAMMA)
+                    & cls.MASK)
+                num_words += 1
+                value >>= 64
+                if not value:
+                    break
+            key = cls._mix((key + num_words) & cls.MASK)
+        return key
+
+
+    @classmethod
+    def _mix(cls, z):
+        """
+        Returns the 64-bit hash of the given 64-bit integer used by SplitMix64.
+        """
+        z = ((z ^ (z >> 30)) * cls.MIX_1) & cls.MASK
+        z = ((z ^ (z >> 27)) * cls.MIX_2) & cls.MASK
+        return z ^ (z >> 31)
+
+
+    def next64(self):
+        """
+        Increments the counter and returns the next random 64-bit integer.
+        """
+        self.counter += 1
+        return self._mix((self.key + self.counter * self.GAMMA) & self.MASK)
+
+
+    def random(self):
+        """
+        Returns the next random floating point number in the range [0.0, 1.0).
+        """
+        # the same as next64(), inlined because this is called for each card
+        # that is shuffled
+        mask = self.MASK
+        self.counter += 1
+        z = (self.key + self.counter * self.GAMMA) & mask
+        z = ((z ^ (z >> 30)) * self.MIX_1) & mask
+        z = ((z ^ (z >> 27)) * self.MIX_2) & mask
+        return ((z ^ (z >> 31)) >> 11) * self.RECIP_BPF
+
+
+    def getrandbits(self, k):
+        """
+        Returns a non-negative integer with k random bits.
+        """
+        if k <= 0:
+            raise ValueError("number of bits must be greater than zero")
+        value = 0
+        num_bits = 0
+        while num_bits < k:
+            value = (value << 64) | self.next64()
+            num_bits += 64
+        return value >> (num_bits - k)
+
+
+    def shuffle(self, x, random=None):
+        """
+        Shuffles the given list in place, as random.Random.shuffle() does.
+        If *random* is not given, the result is the same as that of
+        random.Random.shuffle(), but much faster.
+        """
+        if random is not None:
+            return super(CounterRandom, self).shuffle(x, random)
+
+        (gamma, mix_1, mix_2, mask) = (self.GAMMA, self.MIX_1, self.MIX_2,
+            self.MASK)
+        recip_bpf = self.RECIP_BPF
+        n = len(x)
+        # key + counter * gamma, advanced by adding gamma for each number
+        state = (self.key + self.counter * gamma) & mask
+        for i in xrange(n - 1, 0, -1):
+            state = (state + gamma) & mask
+            z = ((state ^ (state >> 30)) * mix_1) & mask
+            z = ((z ^ (z >> 27)) * mix_2) & mask
+            j = int(((z ^ (z >> 31)) >> 11) * recip_bpf * (i + 1))
+            x[i], x[j] = x[j], x[i]
+        if n > 1:
+            self.counter += n - 1
+
+
+    def jumpahead(self, n):
+        """
+        Advances the counter by n, as if n random numbers were generated.
+        """
+        self.counter += n
+
+
+    def spawn(self, stream):
+        """
+        Creates and returns a new generator with the same seed as this one but
+        the given stream, whose counter is 0.
+        """
+        return CounterRandom(self.seed_value, stream=stream)
+
+
+    def getstate(self):
+        """
+        Returns an object capturing the current state of this generator, which
+        can be given to setstate() to restore it.
+        """
+        return (self.VERSION, self.seed_value, self.stream, self.key,
+            self.counter, self.gauss_next)
+
+
+    def setstate(self, state):
+        """
+        Restores the state of this generator from an object returned by
+        getstate().
+        Raises ValueError if the state is not from this class.
+        """
+        if not state or state[0] != self.VERSION:
+            raise ValueError("state is not from a CounterRandom: {!r}"
+                .format(state))
+        (unused, self.seed_value, self.stream, self.key, self.counter,
+            self.gauss_next) = state
+
+
+class SecureRandom(random.Random):
+    """
+    A random number generator that uses os.urandom(), the cryptographically
+    secure random number generator of the operating system, like
+    random.SystemRandom, but reads it in large blocks rather than once for each
+    random number, which makes shuffling with it about as fast as with the
+    random module.  The indices of the Fisher-Yates shuffles of shuffle() are
+    chosen by rejection sampling, so that every order is exactly equally
+    likely.
+    The methods of instances of this class may be invoked concurrently by
+    multiple threads.  The buffered random bytes are discarded in processes
+    forked after they were read, so that the processes do not reuse them.
+    The "metrics" attribute is a SecureRandom.Metrics object that counts the
+    random bytes read and used, and the time spent reading and shuffling.
+    """
+
+    # the default number of bytes to read from os.urandom() at a time
+    DEFAULT_BUFFER_SIZE = 4096
+
+    # the type code of the array of 32-bit random numbers read into the buffer
+    WORD_TYPECODE = "I" if array.array("I").itemsize == 4 else "L"
+
+    def __new__(cls, *args, **kwargs):
+        # the constructor of random.Random would otherwise seed itself with
+        # buffer_size, reading from os.urandom() needlessly
+        return random.Random.__new__(cls, 0)
+
+
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Initializes a new instance of this class; no random bytes are read
+        until they are first needed.
+        *buffer_size* must be an integer whose value is the number of bytes to
+        read from os.urandom() at a time, which is rounded down to a multiple
+        of 4 but not less than 4 (default: DEFAULT_BUFFER_SIZE).
+        """
+        self.buffer_size = max(buffer_size - (buffer_size % 4), 4)
+        self.lock = threading.Lock()
+        self.words = array.array(self.WORD_TYPECODE)
+        self.position = 0
+        self.pid = None
+        self.metrics = self.Metrics()
+        random.Random.__init__(self)
+
+
+    def seed(self, *args, **kwargs):
+        """
+        Does nothing, since the random numbers do not depend on a seed.
+        """
+        self.gauss_next = None
+
+
+    def getstate(self, *args, **kwargs):
+        """
+        Raises NotImplementedError, since the state cannot be saved.
+        """
+        raise NotImplementedError("SecureRandom has no state to save")
+
+    setstate = getstate
+
+
+    def __reduce__(self):
+        """
+        Supports pickling; the unpickled object reads its own random bytes.
+        """
+        return (self.__class__, (self.buffer_size,))
+
+
+    def _refill(self):
+        """
+        Replaces the buffered random numbers with newly-read ones.
+        This method must be invoked while holding self.lock.
+        """
+        metrics = self.metrics
+        start_time = time.time()
+        data = os.urandom(self.buffer_size)
+        metrics.read_seconds += time.time() - start_time
+        metrics.bytes_read += len(data)
+        metrics.num_reads += 1
+        self.words = array.array(self.WORD_TYPECODE, data)
+        self.position = 0
+        self.pid = os.getpid()
+
+
+    def _check_pid(self):
+        """
+        Discards the buffered random numbers if this process was forked since
+        they were read, so that they are not also used by the parent process.
+        This method must be invoked while holding self.lock.
+        """
+        if self.pid != os.getpid():
+            self.position = len(self.words)
+
+
+    def _next_word(self):
+        """
+        Returns the next random 32-bit integer from the buffer, refilling it if
+        necessary.  This method must be invoked while holding self.lock, after
+        _check_pid().
+        """
+        if self.position >= len(self.words):
+            self._refill()
+        word = self.words[self.position]
+        self.position += 1
+        self.metrics.words_used += 1
+        return word
+
+
+    def random(self):
+        """
+        Returns the next random floating point number in the range [0.0, 1.0),
+        made from 53 random bits.
+        """
+        with self.lock:
+            self._check_pid()
+            a = self._next_word() >> 5
+            b = self._next_word() >> 6
+        return (a * 67108864.0 + b) * (1.0 / 9007199254740992.0)
+
+
+    def getrandbits(self, k):
+        """
+        Returns a non-negative integer with k random bits.
+        """
+        if k <= 0:
+            raise ValueError("number of bits must be greater than zero")
+        num_words = (k + 31) // 32
+        value = 0
+        with self.lock:
+            self._check_pid()
+            for unused in xrange(num_words):
+                value = (value << 32) | self._next_word()
+        return value >> (num_words * 32 - k)
+
+
+    def _randbelow(self, n, *args):
+        """
+        Returns a random integer in the range [0, n), choosing it by rejection
+        sampling so that every integer is equally likely.
+        """
+        num_bits = max(n - 1, 1).bit_length()
+        while True:
+            value = self.getrandbits(num_bits)
+            if value < n:
+                return value
+            with self.lock:
+                self.metrics.words_rejected += (num_bits + 31) // 32
+
+
+    def randrange(self, start, stop=None, step=1):
+        """
+        Returns a randomly-selected element of range(start, stop, step), like
+        random.Random.randrange(), but always chooses it with _randbelow(), so
+        that every element is equally likely; the superclass' implementation
+        scales random() instead for all but very large ranges.  randint() and
+        choice() are implemented with this method.
+        Raises ValueError if the range is empty or an argument is not an
+        integer.
+        """
+        istart = int(start)
+        if istart != start:
+            raise ValueError("non-integer arg 1 for randrange()")
+        if stop is None:
+            if istart <= 0:
+                raise ValueError("empty range for randrange()")
+            return self._randbelow(istart)
+
+        istop = int(stop)
+        if istop != stop:
+            raise ValueError("non-integer stop for randrange()")
+        istep = int(step)
+        if istep != step:
+            raise ValueError("non-integer step for randrange()")
+        if istep > 0:
+            n = (istop - istart + istep - 1) // istep
+        elif istep < 0:
+            n = (istop - istart + istep + 1) // istep
+        else:
+            raise ValueError("zero step for randrange()")
+        if n <= 0:
+            raise ValueError("empty range for randrange({}, {}, {})".format(
+                start, stop, step))
+        return istart + istep * self._randbelow(n)
+
+
+    def choice(self, seq):
+        """
+        Returns a randomly-selected element of the given non-empty sequence,
+        choosing its index with randrange().
+        Raises IndexError if the sequence is empty.
+        """
+        if not seq:
+            raise IndexError("cannot choose from an empty sequence")
+        return seq[self.randrange(len(seq))]
+
+
+    def shuffle(self, x, random=None):
+        """
+        Shuffles the given list in place.
+        If *random* is not given, then the Fisher-Yates shuffle is performed
+        with indices chosen by rejection sampling from the buffered random
+        numbers: the random number for index i is masked to the smallest number
+        of bits that can represent i, and is rejected if it is greater than i.
+        """
+        if random is not None:
+            return super(SecureRandom, self).shuffle(x, random)
+
+        n = len(x)
+        if n > 0xFFFFFFFF:
+            # the indices do not fit in the 32-bit random numbers
+            for i in xrange(n - 1, 0, -1):
+                j = self._randbelow(i + 1)
+                x[i], x[j] = x[j], x[i]
+            return
+
+        metrics = self.metrics
+        start_time = time.time()
+        with self.lock:
+            self._check_pid()
+            words = self.words
+            position = self.position
+            num_words = len(words)
+            num_used = 0
+            num_rejected = 0
+            mask = (1 << max(n - 1, 1).bit_length()) - 1
+            for i in xrange(n - 1, 0, -1):
+                while (mask >> 1) >= i:
+                    mask >>= 1
+                while True:
+                    if position >= num_words:
+                        self._refill()
+                        words = self.words
+                        position = 0
+                        num_words = len(words)
+                    j = words[position] & mask
+                    position += 1
+                    num_used += 1
+                    if j <= i:
+                        break
+                    num_rejected += 1
+                x[i], x[j] = x[j], x[i]
+            self.position = position
+            metrics.words_used += num_used
+            metrics.words_rejected += num_rejected
+            metrics.num_shuffles += 1
+            metrics.cards_shuffled += n
+            metrics.shuffle_seconds += time.time() - start_time
+
+
+    class Metrics(object):
+        """
+        The counts and timings of the work done by a SecureRandom.
+        """
+
+        def __init__(self):
+            """
+            Initializes a new instance of this class, with all counts zero.
+            """
+            # the number of bytes read from os.urandom(), the number of times
+            # it was invoked, and the number of seconds spent in it
+            self.bytes_read = 0
+            self.num_reads = 0
+            self.read_seconds = 0.0
+
+            # the number of 32-bit random numbers used, and how many of them
+            # were rejected by rejection sampling
+            self.words_used = 0
+            self.words_rejected = 0
+
+            # the number of shuffles performed by shuffle(), the total number
+            # of cards shuffled, and the number of seconds spent shuffling,
+            # including reading from os.urandom()
+            self.num_shuffles = 0
+            self.cards_shuffled = 0
+            self.shuffle_seconds = 0.0
+
+
+        @property
+        def read_bytes_per_second(self):
+            """
+            The average number of bytes read from os.urandom() per second spent
+            reading them, or 0.0 if no time was spent.
+            """
+            if not self.read_seconds:
+                return 0.0
+            return self.bytes_read / self.read_seconds
+
+
+        @property
+        def cards_per_second(self):
+            """
+            The average number of cards shuffled by shuffle() per second spent
+            shuffling, or 0.0 if no time was spent.
+            """
+            if not self.shuffle_seconds:
+                return 0.0
+            return self.cards_shuffled / self.shuffle_seconds
+
+
+        @property
+        def rejection_rate(self):
+            """
+            The fraction of the random numbers used that were rejected.
+            """
+            if not self.words_used:
+                return 0.0
+            return float(self.words_rejected) / self.words_used
+
+
+        def as_dict(self):
+            """
+            Returns a dict whose keys are the names of the counts and timings
+            and whose values are their values, including those of the
+            properties.
+            """
+            result = dict(self.__dict__)
+            for name in ("read_bytes_per_second", "cards_per_second",
+                    "rejection_rate"):
+                result[name] = getattr(self, name)
+            return result
+
+
+# the SecureRandom shared by the decks created with secure=True, so that they
+# share its buffer of random bytes
+SECURE_RANDOM = SecureRandom()
+
+
+def _create_rng(rng, seed, secure=False):
+    """
+    Returns the random number generator to use for the *rng*, *seed* and
+    *secure* arguments of Deck.__init__(), which are described there.
+    """
+    if (rng is not None) + (seed is not None) + bool(secure) > 1:
+        raise ValueError("only one of rng, seed and secure may be specified")
+    if secure:
+        return SECURE_RANDOM
+    if rng is None:
+        if seed is None:
+            return random
+        return CounterRandom(seed)
+    return rng
+
+################################################################################
+
+def shuffled_3waycut(cards, split_index_1=None, split_index_2=None,
+        rng=random):
+    """
+    Performs a "3-way cut" shuffle of the given cards; see
+    Deck.shuffle_3waycut() for details.
+    *cards* must be a sequence of at least 3 elements that supports slicing;
+    it is not modified.
+    *split_index_1* and *split_index_2* are as in Deck.shuffle_3waycut().
+    *rng* must be an object with the same interface as random.Random to use as
+    the source of randomness (default: the random module).
+    Returns a new sequence of the same type as *cards* with the shuffled cards.
+    """
+    if split_index_1 is None:
+        split_index_1 = rng.randint(1, len(cards) - 2)
+    if split_index_2 is None:
+        split_index_2 = rng.randint(split_index_1 + 1, len(cards) - 1)
+    chunk1 = cards[:split_index_1]
+    chunk2 = cards[split_index_1:split_index_2]
+    chunk3 = cards[split_index_2:]
+    chunks = [chunk1, chunk2, chunk3]
+    rng.shuffle(chunks)
+    return chunks[0] + chunks[1] + chunks[2]
+
+
+def shuffled_riffle(cards, rng=random, times=1):
+    """
+    Performs a "riffle" shuffle of the given cards; see Deck.shuffle_riffle()
+    for details.
+    *cards* must be a sequence that supports slicing; it is not modified.
+    *rng* must be an object with the same interface as random.Random to use as
+    the source of randomness (default: the random module).
+    *times* must be an integer whose value is the number of times to riffle
+    the cards (default: 1).
+    Returns a list with the shuffled cards.
+    The running time is linear in the number of cards.
+    """
+    num_cards = len(cards)
+    result = list(cards)
+
+    # nothing to do if deck is empty or only has 1 card
+    if num_cards <= 1:
+        return result
+
+    # find a uniform interval about the center of the deck;
+    # the "leeway" simulates how closely a human will find the true center,
+    # with increasing accuracy as the deck gets smaller
+    mid = num_cards / 2
+    leeway = num_cards / 10
+    mid_left = mid - leeway
+    if mid_left < 1:
+        mid_left = 1
+    mid_right = mid + leeway
+    if mid_right > num_cards - 1:
+        mid_right = num_cards - 1
+
+    for unused in xrange(times):
+        cards = result
+
+        # split the deck into two halves, choosing the split point randomly
+        # within the "leeway" of the true center, as calculated above;
+        # the left pile is cards[left:split_index] and the right pile is
+        # cards[right:num_cards], where left and right are the indices of the
+        # next card to be contributed from each pile
+        split_index = rng.randint(mid_left, mid_right)
+        left = 0
+        right = split_index
+
+        # the cards are added to this list as they are "fanned"
+        result = []
+
+        # continue contributing cards from the left and right piles until both
+        # are empty
+        while left < split_index or right < num_cards:
+
+            # size_difference is used to simulate how a human will tend to
+            # "even out" the left and right piles should one start getting
+            # noticeably smaller than the other
+            size_difference = (num_cards - right) - (split_index - left)
+
+            # contribute a few cards from the right hand, if the pile isn't
+            # too much bigger than the one in the left hand
+            if size_difference > -5:
+                n = rng.randint(1, 3)
+                end = min(right + n, num_cards)
+                result.extend(cards[right:end])
+                right = end
+
+            # contribute a few cards from the left hand, if the pile isn't too
+            # much bigger than the one in the right hand
+            if size_difference < 5:
+                n = rng.randint(1, 3)
+                end = min(left + n, split_index)
+                result.extend(cards[left:end])
+                left = end
+
+    return result
+
+
+# the names of the shuffle methods accepted by shuffle_batch()
+SHUFFLE_METHODS = ("random", "3waycut", "riffle")
+
+# the number of decks shuffled at once by the NumPy implementation of
+# shuffle_batch(), which bounds the size of its temporary arrays
+SHUFFLE_BATCH_CHUNK_SIZE = 4096
+
+
+def shuffle_batch(n_decks, method="random", seed=None, num_cards=52, times=1,
+        use_numpy=None):
+    """
+    Shuffles many decks at once, returning the resulting permutations.
+    This is much faster than shuffling Deck objects one at a time, especially
+    when NumPy is available, since then all of the decks are shuffled together
+    using vectorized array operations.
+    *n_decks* must be an integer whose value is the number of decks to shuffle.
+    *method* must be one of the strings in SHUFFLE_METHODS: "random" for the
+    algorithm of Deck.shuffle(), "3waycut" for that of Deck.shuffle_3waycut()
+    or "riffle" for that of Deck.shuffle_riffle() (default: "random").
+    *seed* is the seed for the random number generator; may be None (the
+    default) to seed from a source of entropy.  Note that the NumPy and pure
+    Python implementations produce different permutations for the same seed.
+    *num_cards* must be an integer whose value is the number of cards in each
+    deck (default: 52).
+    *times* must be an integer whose value is the number of times to shuffle
+    each deck (default: 1).
+    *use_numpy* is evaluated as a boolean to determine whether to use NumPy;
+    may be None (the default) to use NumPy if, and only if, it is installed.
+    Returns a matrix with one row per deck and one column per card, where the
+    value in row i, column j is the index of the card in the unshuffled deck
+    that is at index j of the i'th shuffled deck.  The matrix is a NumPy array
+    of unsigned integers if NumPy is used, or a list of lists otherwise.
+    Raises ValueError if the method is not one of SHUFFLE_METHODS, or if it is
+    "3waycut" and there are fewer than 3 cards.
+    """
+    use_numpy = _check_shuffle_batch_args(method, num_cards, use_numpy)
+
+    if not use_numpy:
+        return _shuffle_batch_python(n_decks, method, seed, num_cards, times)
+
+    perms = numpy.empty((n_decks, num_cards), dtype=_perm_dtype(num_cards))
+    random_state = numpy.random.RandomState(seed)
+    for (start, stop, chunk) in _iter_perm_chunks(n_decks, num_cards):
+        for unused in xrange(times):
+            chunk = _shuffle_batch_numpy(chunk, method, random_state)
+        perms[start:stop] = chunk
+    return perms
+
+
+def _check_shuffle_batch_args(method, num_cards, use_numpy):
+    """
+    Validates the arguments of shuffle_batch() and analyze_shuffles().
+    Returns whether to use NumPy, which is use_numpy unless it is None.
+    Raises ValueError if any of the arguments is invalid.
+    """
+    if method not in SHUFFLE_METHODS:
+        raise ValueError("invalid shuffle method: {}".format(method))
+    if method == "3waycut" and num_cards < 3:
+        raise ValueError("a 3-way cut needs at least 3 cards")
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise ValueError("NumPy is not installed")
+    return use_numpy
+
+
+def _shuffle_batch_python(n_decks, method, seed, num_cards, times):
+    """
+    The pure Python implementation of shuffle_batch().
+    """
+    rng = random.Random(seed)
+    perms = []
+    for unused in xrange(n_decks):
+        perm = range(num_cards)
+        for unused in xrange(times):
+            perm = _shuffled_python(perm, method, rng)
+        perms.append(perm)
+    return perms
+
+
+def _shuffled_python(perm, method, rng):
+    """
+    Shuffles a permutation once with one of the methods of shuffle_batch(),
+    returning the shuffled permutation as a list; *perm* must be a list, which
+    may be modified.
+    *rng* must be the random.Random to use.
+    """
+    if method == "riffle":
+        return shuffled_riffle(perm, rng)
+    elif method == "3waycut":
+        return shuffled_3waycut(perm, rng=rng)
+    rng.shuffle(perm)
+    return perm
+
+
+def _perm_dtype(num_cards):
+    """
+    Returns the smallest NumPy data type that can hold the indices of the
+    given number of cards, up to 65536.
+    """
+    return numpy.uint8 if num_cards <= 256 else numpy.uint16
+
+
+def _iter_perm_chunks(n_decks, num_cards):
+    """
+    Divides the given number of decks into chunks of SHUFFLE_BATCH_CHUNK_SIZE
+    decks, or fewer for the last one, for the NumPy implementation of
+    shuffle_batch() and analyze_shuffles().
+    Yields tuples (start, stop, chunk) of the indices of the first deck of the
+    chunk and of the deck after its last one, and a NumPy array with one row
+    per deck of the chunk, each of which is the unshuffled permutation.
+    """
+    dtype = _perm_dtype(num_cards)
+    for start in xrange(0, n_decks, SHUFFLE_BATCH_CHUNK_SIZE):
+        stop = min(start + SHUFFLE_BATCH_CHUNK_SIZE, n_decks)
+        chunk = numpy.empty((stop - start, num_cards), dtype=dtype)
+        chunk[:] = numpy.arange(num_cards, dtype=dtype)
+        yield (start, stop, chunk)
+
+
+def _shuffle_batch_numpy(perms, method, random_state):
+    """
+    The NumPy implementation of shuffle_batch(), which shuffles each row of
+    the given 2-dimensional array once, returning a new array.
+    *random_state* must be the numpy.random.RandomState to use.
+    """
+    (n_decks, num_cards) = perms.shape
+    rows = numpy.arange(n_decks)[:, None]
+
+    if method == "riffle":
+        return _riffle_batch_numpy(perms, random_state)
+
+    if method == "random":
+        return _fisher_yates_batch_numpy(perms, random_state)
+
+    # 3-way cut: choose the split indices with the same distribution as
+    # shuffled_3waycut(), and a random order in which to recombine the chunks
+    split1 = 1 + (random_state.random_sample(n_decks) *
+        (num_cards - 2)).astype(numpy.intp)
+    split2 = split1 + 1 + (random_state.random_sample(n_decks) *
+        (num_cards - 1 - split1)).astype(numpy.intp)
+    src_starts = numpy.column_stack((numpy.zeros(n_decks, numpy.intp), split1,
+        split2))
+    lengths = numpy.column_stack((split1, split2 - split1,
+        num_cards - split2))
+    order = random_state.random_sample((n_decks, 3)).argsort(axis=1)
+
+    # compute where each chunk starts in the shuffled deck
+    ordered_lengths = lengths[rows, order]
+    ordered_starts = numpy.cumsum(ordered_lengths, axis=1) - ordered_lengths
+    dest_starts = numpy.empty_like(ordered_starts)
+    dest_starts[rows, order] = ordered_starts
+
+    # move each card from its index in its chunk to the chunk's destination
+    indices = numpy.arange(num_cards)
+    chunk_ids = ((indices >= split1[:, None]).astype(numpy.intp) +
+        (indices >= split2[:, None]))
+    dest = dest_starts[rows, chunk_ids] + indices - src_starts[rows, chunk_ids]
+    result = numpy.empty_like(perms)
+    result[rows, dest] = perms
+    return result
+
+
+def _fisher_yates_batch_numpy(perms, random_state):
+    """
+    Performs the Fisher-Yates shuffle of random.shuffle() on each row of the
+    given 2-dimensional array, returning a new array.  Each iteration of the
+    loop below swaps one column of all of the decks at once; this is several
+    times faster than sorting random keys to get the permutations.
+    """
+    (n_decks, num_cards) = perms.shape
+    decks = numpy.arange(n_decks)
+
+    # work with the transpose so that the swapped cards are contiguous
+    result = perms.T.copy()
+    uniforms = random_state.random_sample((num_cards, n_decks))
+    for i in xrange(num_cards - 1, 0, -1):
+        j = (uniforms[i] * (i + 1)).astype(numpy.intp)
+        swapped = result[j, decks]
+        result[j, decks] = result[i]
+        result[i] = swapped
+
+    return numpy.ascontiguousarray(result.T)
+
+
+def _riffle_batch_numpy(perms, random_state):
+    """
+    Performs the riffle shuffle of shuffled_riffle() on each row of the given
+    2-dimensional array, returning a new array.
+    Each iteration of the loop below performs one iteration of the loop in
+    shuffled_riffle() for all of the decks at once, but only records the size
+    of the "packet" of cards contributed by each hand.  The packets are then
+    expanded into an "interleave mask" that specifies which hand each card of
+    the shuffled deck came from, from which the permutations are computed.
+    """
+    (n_decks, num_cards) = perms.shape
+    if num_cards <= 1:
+        return perms.copy()
+
+    mid = num_cards // 2
+    leeway = num_cards // 10
+    mid_left = max(mid - leeway, 1)
+    mid_right = min(mid + leeway, num_cards - 1)
+    split_index = random_state.randint(mid_left, mid_right + 1, size=n_decks)
+
+    # the number of cards remaining in each hand, and the sizes of the packets
+    # contributed by each hand; packets alternate right, left, right, etc.
+    left = split_index.copy()
+    right = num_cards - split_index
+    packets = []
+    while True:
+        size_difference = right - left
+        if not (left.any() or right.any()):
+            break
+        for (pile, contributes) in ((right, size_difference > -5),
+                (left, size_difference < 5)):
+            n = random_state.randint(1, 4, size=n_decks)
+            packet = numpy.where(contributes, numpy.minimum(n, pile), 0)
+            pile -= packet
+            packets.append(packet)
+
+    # mark the index at which each packet ends, then a cumulative sum yields
+    # the number of the packet containing each card; odd-numbered packets came
+    # from the left hand
+    ends = numpy.cumsum(numpy.column_stack(packets), axis=1)
+    ends += (numpy.arange(n_decks) * (num_cards + 1))[:, None]
+    counts = numpy.bincount(ends.ravel(), minlength=n_decks * (num_cards + 1))
+    packet_numbers = numpy.cumsum(counts.reshape(n_decks, num_cards + 1),
+        axis=1)[:, :num_cards]
+    from_left = (packet_numbers & 1).astype(bool)
+
+    # each hand's cards fall in order, so the index of each card in its hand is
+    # the number of cards from the same hand that precede it
+    left_index = numpy.cumsum(from_left, axis=1) - 1
+    right_index = numpy.cumsum(~from_left, axis=1) - 1 + split_index[:, None]
+    src_index = numpy.where(from_left, left_index, right_index)
+    return perms[numpy.arange(n_decks)[:, None], src_index]
+
+################################################################################
+
+def eulerian_numbers(n):
+    """
+    Returns the Eulerian numbers for n: a list whose k'th element is the number
+    of permutations of n items with k "descents" (adjacent items out of order),
+    and therefore with k + 1 rising sequences (see ShuffleStatistics).
+    *n* must be a non-negative integer.
+    """
+    numbers = [1]
+    for m in xrange(2, n + 1):
+        numbers = [(k + 1) * (numbers[k] if k < len(numbers) else 0) +
+            (m - k) * (numbers[k - 1] if k > 0 else 0) for k in xrange(m)]
+    return numbers
+
+################################################################################
+
+class ShuffleStatistics(object):
+    """
+    Statistics of the permutations produced by a shuffle, such as those
+    returned by shuffle_batch(), which measure how far the shuffle is from a
+    uniformly random permutation:
+
+    - The position matrix: the number of times that each card, identified by
+      its index in the unshuffled deck, ended at each position.  For a uniform
+      shuffle every element is num_decks / num_cards.
+    - The number of "rising sequences": maximal sets of consecutive cards that
+      are in order in the shuffled deck, though not necessarily adjacent.  A
+      riffle shuffle of a sorted deck leaves at most 2, and each further riffle
+      at most doubles them; a uniform shuffle leaves (num_cards + 1) / 2 on
+      average, with a distribution given by eulerian_numbers().
+    - The number of "adjacent pairs": consecutive cards that are still next to
+      each other, in order, which a cut leaves untouched.  A uniform shuffle
+      leaves (num_cards - 1) / num_cards on average.
+
+    The distances from uniform are total variation distances between the
+    distributions observed and those of a uniform shuffle.  Note that they are
+    estimated from a sample, and so include sampling noise of roughly
+    sqrt(number of values / num_decks) even for a perfect shuffle.
+    Statistics gathered separately can be combined with merge().
+    """
+
+    def __init__(self, num_cards):
+        """
+        Initializes a new instance of this class, with no permutations.
+        *num_cards* must be an integer whose value is the number of cards in
+        each deck.
+        """
+        self.num_cards = num_cards
+        self.num_decks = 0
+        # position_counts[card][position], and the number of decks with each
+        # number of rising sequences and of adjacent pairs
+        self.position_counts = [[0] * num_cards for unused in xrange(num_cards)]
+        self.rising_sequence_counts = [0] * (num_cards + 1)
+        self.adjacent_pair_counts = [0] * max(num_cards, 1)
+
+
+    def add(self, perm):
+        """
+        Records one permutation.
+        *perm* must be a sequence whose j'th element is the index in the
+        unshuffled deck of the card at index j of the shuffled deck, as in the
+        rows returned by shuffle_batch().
+        """
+        positions = [0] * self.num_cards
+        for (position, card) in enumerate(perm):
+            positions[card] = position
+            self.position_counts[card][position] += 1
+        descents = 0
+        adjacent_pairs = 0
+        for card in xrange(self.num_cards - 1):
+            if positions[card + 1] < positions[card]:
+                descents += 1
+            elif positions[card + 1] == positions[card] + 1:
+                adjacent_pairs += 1
+        self.num_decks += 1
+        self.rising_sequence_counts[min(descents + 1, self.num_cards)] += 1
+        self.adjacent_pair_counts[adjacent_pairs] += 1
+
+
+    def add_batch(self, perms):
+        """
+        Records many permutations at once, using vectorized array operations;
+        this requires NumPy.
+        *perms* must be a 2-dimensional NumPy array with one row per
+        permutation, each of which is as described for add().
+        """
+        num_cards = self.num_cards
+        num_decks = len(perms)
+        cards = perms.astype(numpy.intp)
+        indexes = numpy.arange(num_cards)
+
+        position_counts = numpy.bincount((cards * num_cards + indexes).ravel(),
+            minlength=num_cards * num_cards).reshape(num_cards, num_cards)
+
+        # the position of each card, which is the inverse permutation
+        positions = numpy.empty_like(cards)
+        positions[numpy.arange(num_decks)[:, numpy.newaxis], cards] = indexes
+        descents = (positions[:, 1:] < positions[:, :-1]).sum(axis=1)
+        rising_sequences = numpy.minimum(descents + 1, num_cards)
+        adjacent_pairs = (positions[:, 1:] == positions[:, :-1] + 1).sum(axis=1)
+
+        self.num_decks += num_decks
+        for (card, row) in enumerate(position_counts.tolist()):
+            counts = self.position_counts[card]
+            for (position, count) in enumerate(row):
+                counts[position] += count
+        self._add_counts(self.rising_sequence_counts,
+            numpy.bincount(rising_sequences, minlength=num_cards + 1))
+        self._add_counts(self.adjacent_pair_counts,
+            numpy.bincount(adjacent_pairs, minlength=num_cards))
+
+
+    @staticmethod
+    def _add_counts(counts, other_counts):
+        """
+        Adds each element of other_counts to the same element of counts.
+        """
+        for (index, count) in enumerate(other_counts):
+            counts[index] += int(count)
+
+
+    def merge(self, other):
+        """
+        Adds the permutations of other statistics, for the same number of
+        cards, to these statistics.  Returns this object.
+        Raises ValueError if the other statistics have a different number of
+        cards.
+        """
+        if other.num_cards != self.num_cards:
+            raise ValueError("cannot merge statistics for {} and {} cards"
+                .format(self.num_cards, other.num_cards))
+        self.num_decks += other.num_decks
+        for (counts, other_counts) in zip(self.position_counts,
+                other.position_counts):
+            self._add_counts(counts, other_counts)
+        self._add_counts(self.rising_sequence_counts,
+            other.rising_sequence_counts)
+        self._add_counts(self.adjacent_pair_counts, other.adjacent_pair_counts)
+        return self
+
+
+    def position_probabilities(self):
+        """
+        Returns the position matrix as probabilities: a list of lists whose
+        element [card][position] is the fraction of the decks in which the
+        card ended at the position.
+        """
+        num_decks = float(max(self.num_decks, 1))
+        return [[count / num_decks for count in counts]
+            for counts in self.position_counts]
+
+
+    def position_distance(self):
+        """
+        Returns the greatest total variation distance, over all of the cards,
+        between the distribution of the position of a card and the uniform
+        distribution.
+        """
+        uniform = 1.0 / max(self.num_cards, 1)
+        return max([self._distance(probabilities, uniform) for probabilities
+            in self.position_probabilities()] or [0.0])
+
+
+    def rising_sequence_probabilities(self):
+        """
+        Returns a list whose r'th element is the fraction of the decks with r
+        rising sequences.
+        """
+        num_decks = float(max(self.num_decks, 1))
+        return [count / num_decks for count in self.rising_sequence_counts]
+
+
+    def uniform_rising_sequence_probabilities(self):
+        """
+        Returns a list whose r'th element is the probability that a uniformly
+        random permutation has r rising sequences.
+        """
+        numbers = eulerian_numbers(self.num_cards)
+        total = float(sum(numbers))
+        return [0.0] + [number / total for number in numbers]
+
+
+    def rising_sequence_distance(self):
+        """
+        Returns the total variation distance between the distribution of the
+        number of rising sequences and that of a uniform shuffle.  For riffle
+        shuffles of the Gilbert-Shannon-Reeds model the probability of a
+        permutation depends only on its number of rising sequences, so this is
+        also the distance between the distribution of the permutations and the
+        uniform distribution; for other shuffles it is a lower bound of it.
+        """
+        uniform = self.uniform_rising_sequence_probabilities()
+        return 0.5 * sum(abs(p - q) for (p, q)
+            in zip(self.rising_sequence_probabilities(), uniform))
+
+
+    def mean_rising_sequences(self):
+        """
+        Returns the mean number of rising sequences.
+        """
+        return self._mean(self.rising_sequence_counts)
+
+
+    def mean_adjacent_pairs(self):
+        """
+        Returns the mean number of adjacent pairs.
+        """
+        return self._mean(self.adjacent_pair_counts)
+
+
+    def _mean(self, counts):
+        """
+        Returns the mean of a distribution given as the number of decks with
+        each value.
+        """
+        if not self.num_decks:
+            return 0.0
+        return sum(value * count for (value, count)
+            in enumerate(counts)) / float(self.num_decks)
+
+
+    @staticmethod
+    def _distance(probabilities, uniform):
+        """
+        Returns the total variation distance between a distribution and the
+        uniform distribution with the given probability for each value.
+        """
+        return 0.5 * sum(abs(p - uniform) for p in probabilities)
+
+
+def analyze_shuffles(n_decks, method="riffle", times=1, seed=None,
+        num_cards=52, use_numpy=None, progress=None):
+    """
+    Shuffles many decks with one of the methods of shuffle_batch() repeatedly,
+    gathering the statistics of the decks after each shuffle, so that it can be
+    seen how quickly repeated shuffles approach a uniform shuffle.  The decks
+    are shuffled in batches, as by shuffle_batch(), so this is fast when NumPy
+    is available.
+    *n_decks*, *method*, *seed*, *num_cards* and *use_numpy* are as for
+    shuffle_batch().
+    *times* must be an integer whose value is the number of times to shuffle
+    each deck (default: 1).
+    *progress* must be a callable to invoke with the number of decks
+    analyzed so far after each batch; may be None (the default) to not report
+    progress.
+    Returns a list of times ShuffleStatistics objects, the i'th of which has
+    the statistics of the decks after i + 1 shuffles.
+    Raises ValueError for the same arguments as shuffle_batch().
+    """
+    use_numpy = _check_shuffle_batch_args(method, num_cards, use_numpy)
+
+    statistics = [ShuffleStatistics(num_cards) for unused in xrange(times)]
+    if use_numpy:
+        random_state = numpy.random.RandomState(seed)
+        for (unused, stop, chunk) in _iter_perm_chunks(n_decks, num_cards):
+            for time_statistics in statistics:
+                chunk = _shuffle_batch_numpy(chunk, method, random_state)
+                time_statistics.add_batch(chunk)
+            if progress is not None:
+                progress(stop)
+    else:
+        rng = random.Random(seed)
+        for deck_number in xrange(n_decks):
+            perm = range(num_cards)
+            for time_statistics in statistics:
+                perm = _shuffled_python(perm, method, rng)
+                time_statistics.add(perm)
+            if progress is not None and (deck_number + 1) % (
+                    SHUFFLE_BATCH_CHUNK_SIZE) == 0:
+                progress(deck_number + 1)
+        if progress is not None and n_decks % SHUFFLE_BATCH_CHUNK_SIZE:
+            progress(n_decks)
+    return statistics
+
+################################################################################
+
+class HandEvaluator(object):
+    """
+    Ranks poker hands of 5 to 7 cards, given as Card objects or their codes
+    (see Card.code).  The value of a hand is an integer from 1, for a royal
+    flush, to NUM_HAND_VALUES (7462), for the worst 5-card high card hand, so
+    that a lower value is a better hand; the value of a hand of 6 or 7 cards is
+    that of the best 5-card hand in it.
+
+    Hands are ranked with precomputed lookup tables rather than by examining
+    the cards.  The value of a hand whose cards are not all of one suit depends
+    only on its ranks, which are identified by the product of a prime number
+    for each rank; a table maps each such product to the value.  The value of a
+    flush depends only on the set of ranks of the suit, which are identified by
+    a 13-bit mask indexing another table.  A hand of at most 7 cards that
+    contains a flush cannot also contain four of a kind or a full house, so
+    such a hand is always worth its best flush.
+    The tables take a noticeable time to compute, so they are cached in a file,
+    from which later instances load them.
+
+    evaluate() ranks one hand, iter_ranks() ranks a stream of hands, such as
+    those dealt by Deck.deal(), and evaluate_batch() ranks many hands at once,
+    which is much faster when NumPy is available.
+    The cards of each hand must be distinct.
+    """
+
+    # the number of distinct values of hands
+    NUM_HAND_VALUES = 7462
+
+    # the names of the classes of hands, and the worst value of each class
+    HAND_CLASSES = (
+        ("straight flush", 10),
+        ("four of a kind", 166),
+        ("full house", 322),
+        ("flush", 1599),
+        ("straight", 1609),
+        ("three of a kind", 2467),
+        ("two pair", 3325),
+        ("one pair", 6185),
+        ("high card", 7462),
+    )
+
+    # the number of cards in the hands that can be ranked
+    HAND_SIZES = (5, 6, 7)
+
+    # the prime number of each rank, from deuce to ace; the "rank index" of a
+    # card is the index of its rank in this tuple
+    PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+    # the masks of the ranks of the straights, from ace-high to five-high
+    STRAIGHT_MASKS = tuple(0x1F << low for low in xrange(8, -1, -1)) + (0x100F,)
+
+    # the rank index, prime, rank bit and suit index of each card code; the
+    # rank of a card is code % 13 + 1, with aces (rank 1) ranking highest
+    CODE_RANK_INDEXES = tuple((code % 13 - 1) % 13
+        for code in xrange(Card.NUM_CODES))
+    CODE_PRIMES = tuple([PRIMES[index] for index in CODE_RANK_INDEXES])
+    CODE_BITS = tuple(1 << index for index in CODE_RANK_INDEXES)
+    CODE_SUITS = tuple(code // 13 for code in xrange(Card.NUM_CODES))
+
+    # the default path of the file in which the tables are cached
+    DEFAULT_CACHE_PATH = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "hand_tables.cache")
+
+    # the layout of the cache file: the magic bytes, the CRC-32 of the rest of
+    # the file, and the number of entries in each product table, followed by
+    # the flush table as unsigned shorts and then, for each hand size, the
+    # sorted products as unsigned long longs and their values as unsigned
+    # shorts, all little-endian
+    CACHE_MAGIC = b"CARDHND1"
+    CACHE_HEADER = struct.Struct("<8sIIII")
+
+    # the default number of hands that iter_ranks() ranks at a time with
+    # evaluate_batch(), when NumPy is available
+    DEFAULT_BATCH_SIZE = 4096
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH):
+        """
+        Initializes a new instance of this class, loading the lookup tables
+        from the cache file or, if it does not exist or is not valid, computing
+        them and writing them to it.
+        *cache_path* must be a string whose value is the path of the cache
+        file, or None to neither read nor write one (default:
+        DEFAULT_CACHE_PATH).  Failing to write the file is not an error.
+        """
+        self.cache_path = cache_path
+        tables = None
+        if cache_path is not None:
+            tables = self._read_cache(cache_path)
+        if tables is None:
+            tables = self._build_tables()
+            if cache_path is not None:
+                self._write_cache(cache_path, tables)
+
+        # the flush table, indexed by the rank mask of a suit, whose entries
+        # are 0 for masks of fewer than 5 ranks; and, for each hand size, the
+        # sorted prime products and their values
+        (self.flush_values, self.products) = tables
+        self.product_values = dict((size, dict(entries))
+            for (size, entries) in self.products.iteritems())
+
+        if numpy is not None:
+            self._numpy_flush_values = numpy.array(self.flush_values,
+                dtype=numpy.uint16)
+            self._numpy_products = {}
+            for (size, entries) in self.products.iteritems():
+                self._numpy_products[size] = (
+                    numpy.array([product for (product, unused) in entries],
+                        dtype=numpy.int64),
+                    numpy.array([value for (unused, value) in entries],
+                        dtype=numpy.uint16))
+            self._numpy_primes = numpy.array(self.CODE_PRIMES,
+                dtype=numpy.int64)
+            # the rank bit of each card shifted into a 16-bit field per suit,
+            # so that the sum of a hand holds the rank mask of every suit
+            self._numpy_suit_bits = numpy.array([bit << (16 * suit)
+                for (bit, suit) in zip(self.CODE_BITS, self.CODE_SUITS)],
+                dtype=numpy.int64)
+
+
+    def evaluate(self, cards):
+        """
+        Returns the value of a hand.
+        *cards* must be a sequence of 5 to 7 distinct Card objects with codes,
+        or of their codes.
+        Raises ValueError if the number of cards is not supported or the cards
+        are not distinct.
+        """
+        codes = [getattr(card, "code", card) for card in cards]
+        return self._evaluate_codes(codes)
+
+
+    def _evaluate_codes(self, codes):
+        """
+        Returns the value of the hand with the given list of card codes.
+        """
+        code_primes = self.CODE_PRIMES
+        code_bits = self.CODE_BITS
+        code_suits = self.CODE_SUITS
+        suit_masks = [0, 0, 0, 0]
+        product = 1
+        for code in codes:
+            product *= code_primes[code]
+            suit = code_suits[code]
+            if suit_masks[suit] & code_bits[code]:
+                raise ValueError("the cards of the hand are not distinct: {}"
+                    .format(codes))
+            suit_masks[suit] |= code_bits[code]
+
+        flush_values = self.flush_values
+        for mask in suit_masks:
+            value = flush_values[mask]
+            if value:
+                return value
+        try:
+            return self.product_values[len(codes)][product]
+        except KeyError:
+            raise ValueError("invalid number of cards in hand: {}"
+                .format(len(codes)))
+
+
+    def iter_ranks(self, hands, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        A generator function that yields the value of each of the given hands,
+        which may be an iterator that generates them as they are dealt; the
+        values are yielded as the hands are consumed, batch_size at a time.
+        *hands* must be an iterable of hands as for evaluate().
+        *batch_size* must be an integer whose value is the number of hands to
+        rank at a time with evaluate_batch() if NumPy is available; may be 0 to
+        rank each hand with evaluate() as soon as it is consumed (default:
+        DEFAULT_BATCH_SIZE).
+        """
+        if numpy is None or batch_size <= 0:
+            for hand in hands:
+                yield self.evaluate(hand)
+            return
+
+        batch = []
+        for hand in hands:
+            batch.append([getattr(card, "code", card) for card in hand])
+            if len(batch) >= batch_size:
+                for value in self._evaluate_hands(batch):
+                    yield value
+                batch = []
+        for value in self._evaluate_hands(batch):
+            yield value
+
+
+    def _evaluate_hands(self, batch):
+        """
+        Returns the values of the hands in the given list of lists of card
+        codes, using evaluate_batch() if they all have the same size.
+        """
+        if not batch:
+            return []
+        size = len(batch[0])
+        if any(len(codes) != size for codes in batch):
+            return [self._evaluate_codes(codes) for codes in batch]
+        return self.evaluate_batch(batch).tolist()
+
+
+    def evaluate_batch(self, hands, use_numpy=None):
+        """
+        Returns the values of many hands of the same size, ranking them all
+        together using vectorized array operations if NumPy is used.
+        *hands* must be a 2-dimensional array-like object, such as a NumPy
+        array or a list of lists, with one row per hand and one column per
+        card, whose elements are the codes of the cards.
+        *use_numpy* is evaluated as a boolean to determine whether to use NumPy;
+        may be None (the default) to use NumPy if, and only if, it is installed.
+        Returns a NumPy array of unsigned integers if NumPy is used, or a list
+        otherwise.
+        Raises ValueError if the number of cards is not supported or the cards
+        of a hand are not distinct.
+        """
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ValueError("NumPy is not installed")
+        if not use_numpy:
+            return [self._evaluate_codes(list(codes)) for codes in hands]
+
+        codes = numpy.asarray(hands, dtype=numpy.intp)
+        if codes.ndim != 2:
+            codes = codes.reshape(len(codes), -1)
+        (num_hands, size) = codes.shape
+        if size not in self.HAND_SIZES:
+            raise ValueError("invalid number of cards in hand: {}".format(size))
+        (sorted_products, sorted_values) = self._numpy_products[size]
+
+        # the rank masks of the suits of each hand; a card that occurs more
+        # than once makes the sum of its bits differ from their union
+        suit_bits = self._numpy_suit_bits[codes]
+        suit_masks = suit_bits.sum(axis=1)
+        if not numpy.array_equal(suit_masks,
+                numpy.bitwise_or.reduce(suit_bits, axis=1)):
+            raise ValueError("the cards of a hand are not distinct")
+
+        # the non-flush value of each hand, found by binary search
+        products = self._numpy_primes[codes].prod(axis=1)
+        indexes = numpy.searchsorted(sorted_products, products)
+        values = sorted_values[indexes]
+
+        # the flush value of each hand, which is 0 for each suit without a
+        # flush; at most one suit of a hand can have a flush
+        flush_values = numpy.zeros(num_hands, dtype=numpy.uint16)
+        for suit in xrange(len(Card.SUITS)):
+            masks = (suit_masks >> (16 * suit)) & 0x1FFF
+            flush_values |= self._numpy_flush_values[masks]
+        return numpy.where(flush_values > 0, flush_values, values)
+
+
+    @classmethod
+    def hand_class(cls, value):
+        """
+        Returns the name of the class of hands, from HAND_CLASSES, to which a
+        hand with the given value belongs; for example, "full house".
+        Raises ValueError if the value is not in the range 1 to
+        NUM_HAND_VALUES, inclusive.
+        """
+        if not 1 <= value <= cls.NUM_HAND_VALUES:
+            raise ValueError("invalid hand value: {}".format(value))
+        index = bisect.bisect_left([worst for (unused, worst)
+            in cls.HAND_CLASSES], value)
+        return cls.HAND_CLASSES[index][0]
+
+
+    @classmethod
+    def _build_tables(cls):
+        """
+        Computes and returns the lookup tables, as a tuple (flush_values,
+        products), where flush_values is a list indexed by rank mask and
+        products is a dict that maps each hand size to a sorted list of tuples
+        (prime product, value).
+        """
+        primes = cls.PRIMES
+        ranks = range(len(primes) - 1, -1, -1) # best first
+        straight_masks = cls.STRAIGHT_MASKS
+
+        def product_of(rank_indexes):
+            product = 1
+            for index in rank_indexes:
+                product *= primes[index]
+            return product
+
+        # the sets of 5 distinct ranks that are not straights, best first
+        high_card_ranks = [combination for combination
+            in itertools.combinations(ranks, 5)
+            if sum(1 << index for index in combination) not in straight_masks]
+
+        # assign the values of the 5-card hands in order, best first
+        flush_5 = {}
+        products_5 = {}
+        values = itertools.count(1)
+        for mask in straight_masks:
+            flush_5[mask] = next(values)
+        for quads in ranks:
+            for kicker in ranks:
+                if kicker != quads:
+                    products_5[primes[quads] ** 4 * primes[kicker]] = (
+                        next(values))
+        for trips in ranks:
+            for pair in ranks:
+                if pair != trips:
+                    products_5[primes[trips] ** 3 * primes[pair] ** 2] = (
+                        next(values))
+        for combination in high_card_ranks:
+            flush_5[sum(1 << index for index in combination)] = next(values)
+        for mask in straight_masks:
+            products_5[product_of(index for index in ranks
+                if mask & (1 << index))] = next(values)
+        for trips in ranks:
+            kickers = [rank for rank in ranks if rank != trips]
+            for combination in itertools.combinations(kickers, 2):
+                products_5[primes[trips] ** 3 * product_of(combination)] = (
+                    next(values))
+        for (high, low) in itertools.combinations(ranks, 2):
+            for kicker in ranks:
+                if kicker != high and kicker != low:
+                    products_5[primes[high] ** 2 * primes[low] ** 2 *
+                        primes[kicker]] = next(values)
+        for pair in ranks:
+            kickers = [rank for rank in ranks if rank != pair]
+            for combination in itertools.combinations(kickers, 3):
+                products_5[primes[pair] ** 2 * product_of(combination)] = (
+                    next(values))
+        for combination in high_card_ranks:
+            products_5[product_of(combination)] = next(values)
+        assert next(values) == cls.NUM_HAND_VALUES + 1
+
+        # the best flush in each set of 5 to 7 ranks of a suit is the best of
+        # the sets with one rank fewer
+        flush_values = [0] * (1 << len(primes))
+        for (mask, value) in flush_5.iteritems():
+            flush_values[mask] = value
+        for num_ranks in (6, 7):
+            for combination in itertools.combinations(ranks, num_ranks):
+                mask = sum(1 << index for index in combination)
+                flush_values[mask] = min(flush_values[mask & ~(1 << index)]
+                    for index in combination)
+
+        # likewise, the best hand in each multiset of 6 or 7 ranks, with at
+        # most 4 of each, is the best of the multisets with one rank fewer
+        products = {5: products_5}
+        for size in (6, 7):
+            smaller = products[size - 1]
+            table = {}
+            for combination in itertools.combinations_with_replacement(ranks,
+                    size):
+                if any(combination.count(index) > 4
+                        for index in set(combination)):
+                    continue
+                product = product_of(combination)
+                table[product] = min(smaller[product // primes[index]]
+                    for index in set(combination))
+            products[size] = table
+
+        return (flush_values, dict((size, sorted(table.iteritems()))
+            for (size, table) in products.iteritems()))
+
+
+    @classmethod
+    def _read_cache(cls, path):
+        """
+        Reads the lookup tables from a cache file written by _write_cache().
+        Returns the same as _build_tables(), or None if the file does not exist
+        or is not valid.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        header = cls.CACHE_HEADER
+        if len(data) < header.size:
+            return None
+        (magic, crc, count_5, count_6, count_7) = header.unpack_from(data)
+        if (magic != cls.CACHE_MAGIC or
+                zlib.crc32(data[header.size:]) & 0xFFFFFFFF != crc):
+            return None
+
+        num_masks = 1 << len(cls.PRIMES)
+        sizes = ((5, count_5), (6, count_6), (7, count_7))
+        expected_length = header.size + 2 * num_masks + sum(10 * count
+            for (unused, count) in sizes)
+        if len(data) != expected_length:
+            return None
+        pos = header.size
+        flush_values = list(struct.unpack_from("<{}H".format(num_masks), data,
+            pos))
+        pos += 2 * num_masks
+        products = {}
+        for (size, count) in sizes:
+            keys = struct.unpack_from("<{}Q".format(count), data, pos)
+            pos += 8 * count
+            values = struct.unpack_from("<{}H".format(count), data, pos)
+            pos += 2 * count
+            products[size] = zip(keys, values)
+        return (flush_values, products)
+
+
+    @classmethod
+    def _write_cache(cls, path, tables):
+        """
+        Writes the lookup tables returned by _build_tables() to a cache file,
+        replacing it atomically.  Errors are ignored, since the tables can
+        always be computed again.
+        """
+        (flush_values, products) = tables
+        parts = [struct.pack("<{}H".format(len(flush_values)), *flush_values)]
+        for size in cls.HAND_SIZES:
+            entries = products[size]
+            parts.append(struct.pack("<{}Q".format(len(entries)),
+                *[product for (product, unused) in entries]))
+            parts.append(struct.pack("<{}H".format(len(entries)),
+                *[value for (unused, value) in entries]))
+        payload = b"".join(parts)
+        header = cls.CACHE_HEADER.pack(cls.CACHE_MAGIC,
+            zlib.crc32(payload) & 0xFFFFFFFF,
+            *[len(products[size]) for size in cls.HAND_SIZES])
+
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(header)
+                f.write(payload)
+            os.rename(temp_path, path)
+        except (IOError, OSError):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+################################################################################
+
+# the abbreviations of the ranks and suits of cards used by parse_cards() and
+# format_cards(); for example, "As" is the ace of spades and "Td" is the ten of
+# diamonds
+RANK_ABBREVIATIONS = "A23456789TJQK"
+SUIT_ABBREVIATIONS = "cdhs"
+
+_CARD_ABBREVIATION_PATTERN = re.compile(
+    r"[\s,]*(10|[{}])([{}])[\s,]*".format(RANK_ABBREVIATIONS,
+    SUIT_ABBREVIATIONS), re.IGNORECASE)
+
+
+def parse_cards(s):
+    """
+    Returns the list of the Card objects abbreviated in the given string, such
+    as "AsKh" or "Qc, 10d"; each card is abbreviated as its rank, one of the
+    characters in RANK_ABBREVIATIONS or "10", followed by its suit, one of the
+    characters in SUIT_ABBREVIATIONS, and whitespace and commas between cards
+    are ignored.
+    Raises ValueError if the string is not a list of abbreviated cards.
+    """
+    cards = []
+    pos = 0
+    while pos < len(s):
+        match = _CARD_ABBREVIATION_PATTERN.match(s, pos)
+        if match is None:
+            raise ValueError("invalid cards: {!r}".format(s))
+        (rank, suit) = match.groups()
+        rank = 10 if rank == "10" else (
+            RANK_ABBREVIATIONS.index(rank.upper()) + 1)
+        suit = Card.SUITS[SUIT_ABBREVIATIONS.index(suit.lower())]
+        cards.append(Card(suit, rank))
+        pos = match.end()
+    return cards
+
+
+def format_cards(cards):
+    """
+    Returns the abbreviations of the given cards, as parsed by parse_cards();
+    for example, "AsKh".
+    *cards* must be an iterable of interned Card objects, or of their codes.
+    """
+    codes = (getattr(card, "code", card) for card in cards)
+    return "".join(
+        RANK_ABBREVIATIONS[code % 13] + SUIT_ABBREVIATIONS[code // 13]
+        for code in codes)
+
+
+def binomial(n, k):
+    """
+    Returns the number of combinations of k items out of n ("n choose k"),
+    which is 0 if k is negative or greater than n.
+    """
+    if k < 0 or k > n:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in xrange(1, k + 1):
+        result = result * (n - k + i) // i
+    return result
+
+
+def rank_combination(combination):
+    """
+    Returns the index of a combination in the "colexicographic" order of all of
+    the combinations of the same number of non-negative integers, as in the
+    combinatorial number system: the combination (c[0], ..., c[k-1]), with
+    c[0] < ... < c[k-1], has the index binomial(c[0], 1) + ... +
+    binomial(c[k-1], k).  The combinations of k of the integers 0 to n-1 have
+    the indexes 0 to binomial(n, k)-1, so that a range of them can be described
+    by, and processed given, just a range of indexes.
+    *combination* must be an iterable of distinct non-negative integers, in
+    any order.
+    """
+    return sum(binomial(c, i + 1)
+        for (i, c) in enumerate(sorted(combination)))
+
+
+def unrank_combination(rank, k):
+    """
+    Returns the combination of k non-negative integers with the given index,
+    which is the inverse of rank_combination(), as a list in ascending order.
+    Raises ValueError if the index is negative, or is not 0 if k is 0.
+    """
+    if rank < 0 or (k == 0 and rank != 0):
+        raise ValueError("invalid combination index: {}".format(rank))
+    combination = [0] * k
+    for i in xrange(k, 0, -1):
+        # the greatest c for which binomial(c, i) <= rank
+        c = i - 1
+        while binomial(c + 1, i) <= rank:
+            c += 1
+        combination[i - 1] = c
+        rank -= binomial(c, i)
+    return combination
+
+
+def iter_combinations(k, start, stop):
+    """
+    A generator function that yields the combinations of k non-negative
+    integers with the indexes start to stop-1 (see rank_combination()), in
+    order, as tuples in ascending order.  Only the first combination is
+    computed by unranking it; each of the others is computed from the previous
+    one in amortized constant time.
+    """
+    if start >= stop:
+        return
+    combination = unrank_combination(start, k)
+    for unused in xrange(stop - start - 1):
+        yield tuple(combination)
+        # the next combination increments the lowest element that can be
+        # incremented without reaching the next one, and resets the elements
+        # below it to their lowest values
+        i = 0
+        while i < k - 1 and combination[i] + 1 == combination[i + 1]:
+            combination[i] = i
+            i += 1
+        combination[i] += 1
+    yield tuple(combination)
+
+
+def _unrank_combinations_numpy(ranks, k, n):
+    """
+    The vectorized equivalent of unrank_combination() for a 1-dimensional
+    NumPy array of the indexes of combinations of k of the integers 0 to n-1.
+    Returns a NumPy array with one row per index, which is the combination.
+    """
+    ranks = numpy.array(ranks, dtype=numpy.int64)
+    combinations = numpy.empty((len(ranks), k), dtype=numpy.intp)
+    for i in xrange(k, 0, -1):
+        # binomial(c, i) increases with c, so the greatest c for which it is at
+        # most the index can be found by binary search
+        table = numpy.array([binomial(c, i) for c in xrange(n)],
+            dtype=numpy.int64)
+        c = numpy.searchsorted(table, ranks, side="right") - 1
+        combinations[:, i - 1] = c
+        ranks -= table[c]
+    return combinations
+
+################################################################################
+
+class EquityResult(object):
+    """
+    The outcomes of a number of trials (deals) of a game of poker, from which
+    the probability of each player winning, the probability of each player
+    sharing the pot in a tie, and the "equity" of each player, which is the
+    expected fraction of the pot that the player wins, can be estimated.
+    Results of trials run separately, such as in different processes, can be
+    combined with merge().
+    The trials may be a random sample of the possible deals, in which case the
+    probabilities are estimates, or all of them, in which case they are exact.
+    """
+
+    # the multiplier of the standard error of the mean that gives the
+    # confidence intervals of 95% confidence
+    DEFAULT_Z = 1.96
+
+    def __init__(self, num_players, total_trials=None):
+        """
+        Initializes a new instance of this class, with no trials.
+        *num_players* must be an integer whose value is the number of players.
+        *total_trials* must be an integer whose value is the number of possible
+        deals, if the trials are to be all of them; may be None (the default)
+        if the trials are a random sample.
+        """
+        self.num_players = num_players
+        self.total_trials = total_trials
+        self.trials = 0
+        # for each player, the number of trials won outright, the number of
+        # trials tied for the win, and the sums of the fraction of the pot won
+        # and of its square, from which the variance of the equity is derived
+        self.wins = [0] * num_players
+        self.ties = [0] * num_players
+        self.equity_sums = [0.0] * num_players
+        self.equity_square_sums = [0.0] * num_players
+
+
+    def add(self, values):
+        """
+        Records the outcome of one trial.
+        *values* must be a sequence of the values of the hands of the players,
+        as returned by HandEvaluator.evaluate(); the player with the lowest
+        value wins, and players with equal lowest values tie.
+        """
+        best = min(values)
+        winners = [player for (player, value) in enumerate(values)
+            if value == best]
+        self.trials += 1
+        share = 1.0 / len(winners)
+        counts = self.wins if len(winners) == 1 else self.ties
+        for player in winners:
+            counts[player] += 1
+            self.equity_sums[player] += share
+            self.equity_square_sums[player] += share * share
+
+
+    def add_batch(self, values):
+        """
+        Records the outcomes of many trials at once, using vectorized array
+        operations; this requires NumPy.
+        *values* must be a 2-dimensional NumPy array with one row per trial,
+        each of which is as described for add().
+        """
+        best = values.min(axis=1)
+        is_best = values == best[:, numpy.newaxis]
+        num_best = is_best.sum(axis=1)
+        shares = is_best / num_best[:, numpy.newaxis].astype(numpy.float64)
+        is_tie = num_best > 1
+        wins = (is_best & ~is_tie[:, numpy.newaxis]).sum(axis=0)
+        ties = (is_best & is_tie[:, numpy.newaxis]).sum(axis=0)
+        equity_sums = shares.sum(axis=0)
+        equity_square_sums = (shares * shares).sum(axis=0)
+
+        self.trials += len(values)
+        for player in xrange(self.num_players):
+            self.wins[player] += int(wins[player])
+            self.ties[player] += int(ties[player])
+            self.equity_sums[player] += float(equity_sums[player])
+            self.equity_square_sums[player] += float(
+                equity_square_sums[player])
+
+
+    def merge(self, other):
+        """
+        Adds the trials of another result, for the same players, to this
+        result.  Returns this object.
+        Raises ValueError if the other result has a different number of
+        players.
+        """
+        if other.num_players != self.num_players:
+            raise ValueError("cannot merge results for {} and {} players"
+                .format(self.num_players, other.num_players))
+        self.trials += other.trials
+        for player in xrange(self.num_players):
+            self.wins[player] += other.wins[player]
+            self.ties[player] += other.ties[player]
+            self.equity_sums[player] += other.equity_sums[player]
+            self.equity_square_sums[player] += other.equity_square_sums[player]
+        return self
+
+
+    @property
+    def exact(self):
+        """
+        Whether the trials are all of the possible deals, so that the
+        probabilities are exact.
+        """
+        return (self.total_trials is not None and
+            self.trials == self.total_trials)
+
+
+    def win_probability(self, player):
+        """
+        Returns the fraction of the trials that the given player won outright.
+        """
+        return self.wins[player] / float(self.trials) if self.trials else 0.0
+
+
+    def tie_probability(self, player):
+        """
+        Returns the fraction of the trials in which the given player tied for
+        the win.
+        """
+        return self.ties[player] / float(self.trials) if self.trials else 0.0
+
+
+    def equity(self, player):
+        """
+        Returns the mean fraction of the pot that the given player won.
+        """
+        if not self.trials:
+            return 0.0
+        return self.equity_sums[player] / self.trials
+
+
+    def half_width(self, player, z=DEFAULT_Z):
+        """
+        Returns the half-width of the confidence interval of the equity of
+        the given player; that is, z times the standard error of the mean.
+        Returns 0 if the result is exact, or infinity if there are fewer than
+        2 trials.
+        *z* must be a number whose value is the number of standard errors in
+        the half-width (default: DEFAULT_Z, for 95% confidence).
+        """
+        if self.exact:
+            return 0.0
+        if self.trials < 2:
+            return float("inf")
+        mean = self.equity(player)
+        variance = max(self.equity_square_sums[player] / self.trials -
+            mean * mean, 0.0)
+        return z * math.sqrt(variance / (self.trials - 1))
+
+
+    def confidence_interval(self, player, z=DEFAULT_Z):
+        """
+        Returns the confidence interval of the equity of the given player as a
+        tuple (low, high), clamped to the range 0 to 1.
+        *z* is as for half_width().
+        """
+        mean = self.equity(player)
+        half_width = self.half_width(player, z)
+        return (max(mean - half_width, 0.0), min(mean + half_width, 1.0))
+
+
+    def max_half_width(self, z=DEFAULT_Z):
+        """
+        Returns the greatest half_width() of the players.
+        """
+        return max(self.half_width(player, z)
+            for player in xrange(self.num_players))
+
+################################################################################
+
+class EquitySimulator(object):
+    """
+    Estimates the equity of each player in a hand of Texas hold 'em, given the
+    hole cards of some players and any community cards already dealt (the
+    "board"), by dealing the remaining cards at random many times and ranking
+    the hands of the players with HandEvaluator (a "Monte Carlo" simulation).
+    Players whose hole cards are not known ("opponents") are dealt random
+    cards in each trial.
+
+    The trials are run in chunks, each with its own CounterRandom stream of
+    the seed, so the result of a chunk depends only on the seed and the index
+    of the chunk; run() distributes the chunks across a pool of processes and
+    merges their results as they complete, stopping early once the confidence
+    intervals of the equities are narrow enough.
+
+    If the hole cards of all of the players are known, then enumerate_all() can
+    instead deal every combination of the rest of the board exactly once,
+    giving exact probabilities; this is faster than sampling when few cards
+    remain to be dealt.  Each combination is identified by its index (see
+    rank_combination()), so the combinations are split into chunks of
+    contiguous indexes that are processed in the same way as the chunks of
+    trials.
+    """
+
+    # the number of hole cards of each player and of community cards
+    NUM_HOLE_CARDS = 2
+    NUM_BOARD_CARDS = 5
+
+    # the default number of trials in each chunk, which is large enough that
+    # the cost of sending the chunk to a process and its result back is
+    # negligible, but small enough that early stopping is timely
+    DEFAULT_CHUNK_SIZE = 20000
+
+    # the default maximum and minimum numbers of trials for run()
+    DEFAULT_MAX_TRIALS = 10000000
+    DEFAULT_MIN_TRIALS = 100000
+
+    # the default half-width of the confidence intervals of the equities at
+    # which run() stops early
+    DEFAULT_PRECISION = 0.001
+
+    # the default number of combinations in each chunk of enumerate_all()
+    DEFAULT_ENUMERATION_CHUNK_SIZE = 50000
+
+    def __init__(self, hands, board=(), opponents=0, seed=None,
+            evaluator=None, use_numpy=None):
+        """
+        Initializes a new instance of this class.
+        *hands* must be an iterable of the known hands of players, each of
+        which is a sequence of NUM_HOLE_CARDS Card objects or their codes.
+        *board* must be a sequence of up to NUM_BOARD_CARDS Card objects, or
+        their codes, that are the community cards already dealt (default: no
+        cards).
+        *opponents* must be a non-negative integer whose value is the number of
+        players, after those with known hands, whose hole cards are dealt at
+        random in each trial (default: 0).
+        *seed* is the seed of the CounterRandom streams of the chunks, as for
+        CounterRandom.seed(); may be None (the default) to choose one at
+        random, which is stored in the "seed" attribute.
+        *evaluator* must be the HandEvaluator with which to rank the hands; may
+        be None (the default) to create one.
+        *use_numpy* is evaluated as a boolean to determine whether to use NumPy
+        to run the trials of each chunk together; may be None (the default)
+        to use NumPy if, and only if, it is installed.
+        Raises ValueError if there are fewer than 2 players, a hand or the
+        board has the wrong number of cards, or a card is given more than once.
+        """
+        to_codes = lambda cards: [getattr(card, "code", card) for card in cards]
+        self.hands = [to_codes(hand) for hand in hands]
+        self.board = to_codes(board)
+        self.opponents = opponents
+        self.num_players = len(self.hands) + opponents
+
+        if opponents < 0:
+            raise ValueError("invalid number of opponents: {}"
+                .format(opponents))
+        if self.num_players < 2:
+            raise ValueError("at least 2 players are required")
+        for hand in self.hands:
+            if len(hand) != self.NUM_HOLE_CARDS:
+                raise ValueError("a hand must have {} cards: {}".format(
+                    self.NUM_HOLE_CARDS, format_cards(hand)))
+        if len(self.board) > self.NUM_BOARD_CARDS:
+            raise ValueError("the board can have at most {} cards: {}"
+                .format(self.NUM_BOARD_CARDS, format_cards(self.board)))
+        known = self.board + [code for hand in self.hands for code in hand]
+        duplicates = sorted(set(code for code in known
+            if known.count(code) > 1))
+        if duplicates:
+            raise ValueError("cards given more than once: {}"
+                .format(format_cards(duplicates)))
+
+        # the codes of the cards that may be dealt, and the number of them that
+        # are dealt in each trial: first the rest of the board, then the hole
+        # cards of the opponents
+        known = set(known)
+        self.remaining = [card.code for card in Deck()
+            if card.code not in known]
+        self.num_dealt = (self.NUM_BOARD_CARDS - len(self.board) +
+            self.NUM_HOLE_CARDS * opponents)
+        if self.num_dealt > len(self.remaining):
+            raise ValueError("not enough cards for {} opponents"
+                .format(opponents))
+
+        if seed is None:
+            seed = CounterRandom().seed_value
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ValueError("NumPy is not installed")
+        self.seed = seed
+        self.use_numpy = use_numpy
+        self.evaluator = evaluator if evaluator is not None else (
+            HandEvaluator())
+
+
+    @property
+    def num_combinations(self):
+        """
+        The number of combinations of cards that enumerate_all() deals, or
+        None if there are opponents, whose cards it cannot deal.
+        """
+        if self.opponents:
+            return None
+        return binomial(len(self.remaining), self.num_dealt)
+
+
+    def simulate_chunk(self, chunk_index, num_trials):
+        """
+        Runs a chunk of trials, and returns its result.
+        *chunk_index* must be a non-negative integer whose value is the index
+        of the chunk, which is the stream of its CounterRandom.
+        *num_trials* must be an integer whose value is the number of trials to
+        run.
+        Returns an EquityResult.
+        """
+        rng = CounterRandom(self.seed, stream=chunk_index)
+        result = EquityResult(self.num_players)
+        if self.use_numpy:
+            self._simulate_chunk_numpy(rng, num_trials, result)
+        else:
+            self._simulate_chunk_python(rng, num_trials, result)
+        return result
+
+
+    def _simulate_chunk_python(self, rng, num_trials, result):
+        """
+        The pure Python implementation of simulate_chunk().
+        """
+        remaining = self.remaining
+        num_dealt = self.num_dealt
+        for unused in xrange(num_trials):
+            result.add(self._rank_deal(rng.sample(remaining, num_dealt)))
+
+
+    def _rank_deal(self, dealt):
+        """
+        Returns the list of the values of the hands of the players for a list
+        of the codes of the cards dealt: the rest of the board, followed by the
+        hole cards of the opponents.
+        """
+        evaluate = self.evaluator._evaluate_codes
+        num_dealt = self.num_dealt
+        num_board_dealt = self.NUM_BOARD_CARDS - len(self.board)
+        num_hole_cards = self.NUM_HOLE_CARDS
+        board = self.board + dealt[:num_board_dealt]
+        hands = self.hands + [dealt[i:i + num_hole_cards]
+            for i in xrange(num_board_dealt, num_dealt, num_hole_cards)]
+        return [evaluate(hand + board) for hand in hands]
+
+
+    def _simulate_chunk_numpy(self, rng, num_trials, result):
+        """
+        The NumPy implementation of simulate_chunk(), which deals the cards of
+        all of the trials as rows of arrays, and ranks them with
+        HandEvaluator.evaluate_batch().
+        """
+        random_state = numpy.random.RandomState(
+            [rng.getrandbits(32) for unused in xrange(4)])
+        num_remaining = len(self.remaining)
+
+        # deal the cards of each trial by shuffling only as many of the
+        # remaining cards as are dealt, with a Fisher-Yates shuffle of all of
+        # the trials at once
+        deck = numpy.empty((num_trials, num_remaining), dtype=numpy.uint8)
+        deck[:] = self.remaining
+        rows = numpy.arange(num_trials)
+        for i in xrange(self.num_dealt):
+            j = i + (random_state.random_sample(num_trials) *
+                (num_remaining - i)).astype(numpy.intp)
+            swapped = deck[rows, j]
+            deck[rows, j] = deck[:, i]
+            deck[:, i] = swapped
+        result.add_batch(self._rank_deals_numpy(deck[:, :self.num_dealt]))
+
+
+    def _rank_deals_numpy(self, dealt):
+        """
+        The vectorized equivalent of _rank_deal() for a 2-dimensional NumPy
+        array with one row per deal.  Returns a NumPy array with one row per
+        deal, which is the values of the hands of the players.
+        """
+        num_deals = len(dealt)
+
+        # the cards of each player in each deal: the hole cards followed by the
+        # board
+        num_board_dealt = self.NUM_BOARD_CARDS - len(self.board)
+        num_hole_cards = self.NUM_HOLE_CARDS
+        cards = numpy.empty((num_deals, self.num_players,
+            num_hole_cards + self.NUM_BOARD_CARDS), dtype=numpy.uint8)
+        cards[:, :, num_hole_cards:num_hole_cards + len(self.board)] = (
+            self.board)
+        cards[:, :, num_hole_cards + len(self.board):] = (
+            dealt[:, numpy.newaxis, :num_board_dealt])
+        for (player, hand) in enumerate(self.hands):
+            cards[:, player, :num_hole_cards] = hand
+        for opponent in xrange(self.opponents):
+            start = num_board_dealt + opponent * num_hole_cards
+            cards[:, len(self.hands) + opponent, :num_hole_cards] = (
+                dealt[:, start:start + num_hole_cards])
+
+        values = self.evaluator.evaluate_batch(
+            cards.reshape(-1, cards.shape[2]))
+        return values.reshape(num_deals, self.num_players)
+
+
+    def enumerate_chunk(self, start, stop):
+        """
+        Deals the combinations of the cards of the rest of the board with the
+        given range of indexes (see rank_combination()), one trial each, and
+        returns the result.
+        *start* and *stop* must be integers whose values are the index of the
+        first combination and one more than that of the last.
+        Returns an EquityResult.
+        Raises ValueError if there are opponents.
+        """
+        if self.opponents:
+            raise ValueError("cannot enumerate the hole cards of opponents")
+        result = EquityResult(self.num_players)
+        remaining = self.remaining
+        if self.use_numpy:
+            indexes = _unrank_combinations_numpy(numpy.arange(start, stop),
+                self.num_dealt, len(remaining))
+            dealt = numpy.array(remaining, dtype=numpy.uint8)[indexes]
+            result.add_batch(self._rank_deals_numpy(dealt))
+        else:
+            for indexes in iter_combinations(self.num_dealt, start, stop):
+                result.add(self._rank_deal([remaining[i] for i in indexes]))
+        return result
+
+
+    def run(self, max_trials=DEFAULT_MAX_TRIALS, min_trials=DEFAULT_MIN_TRIALS,
+            precision=DEFAULT_PRECISION, processes=None,
+            chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        """
+        Runs the trials in chunks, in parallel, until the equity of each
+        player is known precisely enough or the maximum number of trials is
+        reached.
+        *max_trials* must be an integer whose value is the maximum number of
+        trials to run (default: DEFAULT_MAX_TRIALS).
+        *min_trials* must be an integer whose value is the number of trials to
+        run before stopping early (default: DEFAULT_MIN_TRIALS).
+        *precision* must be a number whose value is the half-width of the
+        confidence interval of the equity of every player at which to stop
+        early (see EquityResult.half_width()); may be 0 to never stop early
+        (default: DEFAULT_PRECISION).
+        *processes* must be an integer whose value is the number of processes
+        in which to run the chunks; may be 1 to run them in this process, or
+        None (the default) to use one process per CPU.
+        *chunk_size* must be an integer whose value is the number of trials in
+        each chunk (default: DEFAULT_CHUNK_SIZE).
+        *progress* must be a callable to invoke with the result so far each
+        time that the result of a chunk is merged into it; may be None (the
+        default) to not report progress.
+        Returns an EquityResult.  If the run stops early, the trials of the
+        chunks that were merged are not necessarily those with the lowest
+        indexes, since the chunks complete in an unpredictable order.
+        """
+        chunks = [("simulate_chunk", chunk_index,
+                min(chunk_size, max_trials - start))
+            for (chunk_index, start)
+            in enumerate(xrange(0, max_trials, chunk_size))]
+        result = EquityResult(self.num_players)
+        done = lambda: (precision > 0 and result.trials >= min_trials and
+            result.max_half_width() <= precision)
+        return self._run_chunks(chunks, result, processes, progress, done)
+
+
+    def enumerate_all(self, processes=None,
+            chunk_size=DEFAULT_ENUMERATION_CHUNK_SIZE, progress=None):
+        """
+        Deals every combination of the cards of the rest of the board exactly
+        once, in chunks, in parallel.
+        *processes* and *progress* are as for run().
+        *chunk_size* must be an integer whose value is the number of
+        combinations in each chunk (default: DEFAULT_ENUMERATION_CHUNK_SIZE).
+        Returns an EquityResult whose total_trials is num_combinations, and
+        which is therefore exact.
+        Raises ValueError if there are opponents.
+        """
+        total = self.num_combinations
+        if total is None:
+            raise ValueError("cannot enumerate the hole cards of opponents")
+        chunks = [("enumerate_chunk", start, min(start + chunk_size, total))
+            for start in xrange(0, total, chunk_size)]
+        result = EquityResult(self.num_players, total_trials=total)
+        return self._run_chunks(chunks, result, processes, progress)
+
+
+    def _run_chunks(self, chunks, result, processes, progress, done=None):
+        """
+        Runs chunks in a pool of processes, merging their results into the
+        given result as they complete, and returns it.
+        *chunks* must be a list of tuples, each of which is the name of the
+        method that runs a chunk, such as "simulate_chunk", followed by its
+        arguments.
+        *processes* and *progress* are as for run().
+        *done* must be a callable that returns whether to stop early, which is
+        invoked after each result is merged; may be None (the default) to run
+        all of the chunks.
+        """
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        pool = None
+        if processes == 1:
+            chunk_results = (_run_simulation_chunk(chunk, self)
+                for chunk in chunks)
+        else:
+            pool = multiprocessing.Pool(processes, _init_simulation_worker,
+                (self,))
+            chunk_results = pool.imap_unordered(_run_simulation_chunk, chunks)
+        try:
+            for chunk_result in chunk_results:
+                result.merge(chunk_result)
+                if progress is not None:
+                    progress(result)
+                if done is not None and done():
+                    break
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+        return result
+
+
+# the EquitySimulator used by _run_simulation_chunk() in the processes of the
+# pool of EquitySimulator._run_chunks()
+_simulation_worker_simulator = None
+
+
+def _init_simulation_worker(simulator):
+    """
+    Initializes a process of the pool of EquitySimulator._run_chunks().
+    """
+    global _simulation_worker_simulator
+    _simulation_worker_simulator = simulator
+
+
+def _run_simulation_chunk(chunk, simulator=None):
+    """
+    Runs a chunk of EquitySimulator._run_chunks() and returns its result.
+    *chunk* must be a tuple of the name of the method that runs the chunk
+    followed by its arguments.
+    *simulator* must be the EquitySimulator; may be None (the default) in the
+    processes of the pool, to use the one given to _init_simulation_worker().
+    """
+    if simulator is None:
+        simulator = _simulation_worker_simulator
+    return getattr(simulator, chunk[0])(*chunk[1:])
+
+################################################################################
+
+class ResourceCache(object):
+    """
+    An in-memory cache of the files in a directory, such as the images served
+    by the HTTP server.  The files are read once, when the cache is created,
+    along with everything needed to serve them: their content type, a strong
+    entity tag, their modification time and, where it is smaller, a
+    gzip-compressed copy.  The total size of the cached data is bounded;
+    files that do not fit are not cached.
+    """
+
+    # the default maximum number of bytes of file data to cache
+    DEFAULT_MAX_SIZE = 16 * 1024 * 1024
+
+    # content types to use for file extensions unknown to the mimetypes module
+    CONTENT_TYPES = {
+        ".png": "image/png",
+        ".svg": "image/svg+xml",
+        ".txt": "text/plain",
+    }
+
+    # a compressed copy of a file is only kept if it is at most this fraction
+    # of the size of the file
+    MAX_COMPRESSION_RATIO = 0.9
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE, compress=True):
+        """
+        Initializes a new instance of this class, reading the files in the
+        given directory into memory.
+        *directory* must be a string whose value is the path of the directory
+        whose files to cache; subdirectories are not cached.
+        *max_size* must be an integer whose value is the maximum number of
+        bytes of data to cache, including compressed copies; files are cached
+        in order of name until this size is reached (default: 16 MB).
+        *compress* is evaluated as a boolean; if True (the default) then a
+        gzip-compressed copy of each file is cached if it is sufficiently
+        smaller than the file.
+        A directory that does not exist is treated as an empty one.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.compress = compress
+        self.entries = {}
+        self.size = 0
+
+        try:
+            filenames = sorted(os.listdir(directory))
+        except (IOError, OSError):
+            filenames = []
+
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if not os.path.isfile(path):
+                continue
+            entry = self.load_entry(filename)
+            if entry is None or self.size + entry.size > max_size:
+                continue
+            self.entries[filename] = entry
+            self.size += entry.size
+
+
+    def get(self, filename):
+        """
+        Returns the Entry for the file with the given name, or None if the
+        file is not cached.
+        """
+        return self.entries.get(filename)
+
+
+    def load_entry(self, filename, digest=True):
+        """
+        Reads the file with the given name from the directory and returns an
+        Entry for it, without caching it.  Returns None if the file cannot be
+        read or if the name refers to a file outside of the directory.
+        *digest* is evaluated as a boolean; if True (the default) then the
+        entity tag of the entry is the SHA-1 hash of the file and the entry
+        has a compressed copy of the file, as for the cached files; if False
+        then the entry has no compressed copy and its entity tag is derived
+        from the size and modification time of the file, which is much
+        cheaper for a file that is only read to serve one response.
+        """
+        if not self.is_safe_filename(filename):
+            return None
+
+        path = os.path.join(self.directory, filename)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+                mtime = int(os.fstat(f.fileno()).st_mtime)
+        except (IOError, OSError):
+            return None
+
+        content_type = self.guess_content_type(filename)
+        if not digest:
+            etag = '"{:x}-{:x}"'.format(mtime, len(data))
+            return self.Entry(filename, data, content_type, mtime, None, etag)
+
+        gzip_data = None
+        if self.compress:
+            gzip_data = self.gzip(data)
+            if len(gzip_data) > len(data) * self.MAX_COMPRESSION_RATIO:
+                gzip_data = None
+
+        return self.Entry(filename, data, content_type, mtime, gzip_data)
+
+
+    @staticmethod
+    def is_safe_filename(filename):
+        """
+        Returns whether the given filename is a plain file name, as opposed to
+        a path that could refer to a file outside of the cached directory.
+        """
+        return bool(filename) and filename not in (os.curdir, os.pardir) and \
+            "/" not in filename and os.sep not in filename and \
+            (os.altsep is None or os.altsep not in filename)
+
+
+    @classmethod
+    def guess_content_type(cls, filename):
+        """
+        Returns the content type with which to serve the file with the given
+        name, based on its extension.
+        """
+        (content_type, encoding) = mimetypes.guess_type(filename)
+        if content_type is None or encoding is not None:
+            extension = os.path.splitext(filename)[1].lower()
+            content_type = cls.CONTENT_TYPES.get(extension,
+                "application/octet-stream")
+        return content_type
+
+
+    @staticmethod
+    def gzip(data):
+        """
+        Compresses the given string with gzip and returns the result.
+        The timestamp in the gzip header is 0, so that the compressed data
+        only depends on the given data.
+        """
+        buf = StringIO.StringIO()
+        f = gzip.GzipFile(filename="", mode="wb", fileobj=buf, mtime=0)
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        return buf.getvalue()
+
+
+    class Entry(object):
+        """
+        A cached file.
+        """
+
+        def __init__(self, filename, data, content_type, mtime, gzip_data,
+                etag=None):
+            """
+            Initializes a new instance of this class.
+            *filename* must be a string whose value is the name of the file.
+            *data* must be a string whose value is the contents of the file.
+            *content_type* must be a string whose value is the content type of
+            the file.
+            *mtime* must be an integer whose value is the time at which the file
+            was last modified, in seconds since the epoch.
+            *gzip_data* must be a string whose value is the gzip-compressed
+            contents of the file, or None if there is no compressed copy.
+            *etag* must be a string whose value is the quoted entity tag of
+            the file; may be None (the default) to use the SHA-1 hash of its
+            contents.
+            """
+            if etag is None:
+                etag = '"{}"'.format(hashlib.sha1(data).hexdigest())
+            self.filename = filename
+            self.data = data
+            self.content_type = content_type
+            self.mtime = mtime
+            self.last_modified = email.utils.formatdate(mtime, usegmt=True)
+            self.etag = etag
+            self.gzip_data = gzip_data
+            if gzip_data is None:
+                self.gzip_etag = None
+            else:
+                self.gzip_etag = '"{}-gzip"'.format(self.etag[1:-1])
+
+
+        @property
+        def size(self):
+            """
+            The number of bytes of memory used by the data of this entry.
+            """
+            size = len(self.data)
+            if self.gzip_data is not None:
+                size += len(self.gzip_data)
+            return size
+
+
+        def is_not_modified(self, if_none_match, if_modified_since,
+                use_gzip=False):
+            """
+            Evaluates the conditional request headers, returning whether the
+            client's copy of the file is current, in which case a response of
+            304 (Not Modified) should be sent.
+            *if_none_match* must be a string whose value is the value of the
+            If-None-Match header, or None if it was not specified.
+            *if_modified_since* must be a string whose value is the value of
+            the If-Modified-Since header, or None if it was not specified;
+            it is ignored if if_none_match is not None.
+            *use_gzip* is evaluated as a boolean; if True then the compressed
+            copy of the file is being served, so only its entity tag matches
+            if_none_match; otherwise, only the entity tag of the file itself
+            does (default: False).
+            """
+            if if_none_match is not None:
+                etag = self.gzip_etag if use_gzip else self.etag
+                for tag in if_none_match.split(","):
+                    tag = tag.strip()
+                    if tag.startswith("W/"):
+                        tag = tag[2:]
+                    if tag == "*" or tag == etag:
+                        return True
+                return False
+
+            if if_modified_since is not None:
+                parsed = email.utils.parsedate_tz(if_modified_since)
+                if parsed is not None:
+                    try:
+                        since = email.utils.mktime_tz(parsed)
+                    except (OverflowError, ValueError):
+                        return False
+                    return self.mtime <= since
+
+            return False
+
+################################################################################
+
+class PageTemplate(object):
+    """
+    A web page whose static parts are encoded to UTF-8 once, when the template
+    is created, so that rendering the page only needs to encode the dynamic
+    parts and join the results.  The dynamic parts are specified in the text of
+    the template by placeholders of the form {{name}}.
+    """
+
+    PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+    def __init__(self, text):
+        """
+        Initializes a new instance of this class.
+        *text* must be a string whose value is the text of the page, including
+        any placeholders.
+        """
+        self.chunks = []
+        self.names = []
+        pos = 0
+        for match in self.PLACEHOLDER_PATTERN.finditer(text):
+            self.chunks.append(text[pos:match.start()].encode("UTF-8"))
+            self.names.append(match.group(1))
+            pos = match.end()
+        self.chunks.append(text[pos:].encode("UTF-8"))
+
+
+    def render(self, **values):
+        """
+        Renders the page, replacing each placeholder with the value of the
+        keyword argument of the same name, and returns the UTF-8 encoding of
+        the result.  The values are inserted verbatim; use escape() to insert
+        text that may contain special HTML characters.
+        Raises KeyError if a value is not specified for a placeholder.
+        """
+        chunks = self.chunks
+        parts = [chunks[0]]
+        for (index, name) in enumerate(self.names):
+            parts.append(values[name].encode("UTF-8"))
+            parts.append(chunks[index + 1])
+        return b"".join(parts)
+
+
+    @staticmethod
+    def escape(s):
+        """
+        Returns the given string with the special HTML characters escaped.
+        """
+        s = s.replace("&", "&amp;")
+        s = s.replace("'", "&apos;")
+        s = s.replace('"', "&quot;")
+        s = s.replace("<", "&lt;")
+        s = s.replace(">", "&gt;")
+        return s
+
+################################################################################
+
+class ResponseBuilder(object):
+    """
+    An HTTP response whose headers and body are accumulated in memory so that
+    its Content-Length is known before it is sent and so that the whole
+    response can be sent with a single write; see
+    MyHttpServer.MyRequestHandler.send_built_response().
+    """
+
+    def __init__(self, status=httplib.OK, reason=None):
+        """
+        Initializes a new instance of this class.
+        *status* must be an integer whose value is the HTTP status code of the
+        response (default: httplib.OK).
+        *reason* must be a string whose value is the reason phrase to send with
+        the status code; may be None (the default) to use the standard reason
+        phrase of the status code.
+        """
+        self.status = status
+        self.reason = reason
+        self.headers = []
+        self.chunks = []
+        self.size = 0
+
+
+    def add_header(self, keyword, value):
+        """
+        Adds an HTTP header to the response.
+        *keyword* and *value* must be strings whose values are the name and
+        value, respectively, of the header.
+        """
+        self.headers.append((keyword, value))
+
+
+    def write(self, s, newline=True):
+        """
+        Appends a string to the body of the response, encoding it in UTF-8
+        first.
+        *s* must be a string whose UTF-8 encoding to append to the body.
+        *newline* is evaluated as a boolean; if it evaluates to True
+        (the default) then a \n character is appended after the given string;
+        if False, then no newline character is appended.
+        """
+        s_encoded = s.encode("UTF-8")
+        if newline:
+            s_encoded += b"\n"
+        self.write_bytes(s_encoded)
+
+
+    def write_escaped(self, s, newline=True):
+        """
+        Appends a string to the body of the response, first escaping any
+        special HTML characters.  After escaping HTML characters, this method
+        invokes self.write() with the resulting string and the given newline.
+        """
+        self.write(PageTemplate.escape(s), newline=newline)
+
+
+    def write_bytes(self, data):
+        """
+        Appends bytes to the body of the response, without encoding them.
+        *data* must be a byte string whose value to append to the body.
+        """
+        self.chunks.append(data)
+        self.size += len(data)
+
+
+    def getvalue(self):
+        """
+        Returns a byte string whose value is the body of the response.
+        """
+        return b"".join(self.chunks)
+
+################################################################################
+
+class EventBroadcaster(object):
+    """
+    Delivers events to any number of subscribers, such as the clients that
+    are streaming the changes to the state of the application.  Each
+    subscriber has a bounded queue of events so that a slow subscriber cannot
+    make the publisher wait or use unbounded memory: if the queue of a
+    subscriber overflows then its events are discarded and it is instead told
+    that it missed some, so that it can catch up by getting a snapshot of the
+    current state.
+    """
+
+    # the default maximum number of events queued for each subscriber
+    DEFAULT_MAX_QUEUED_EVENTS = 64
+
+    # the number of seconds after which to send a heartbeat to an idle
+    # subscriber, to detect clients that have gone away, and the heartbeat
+    # itself, which is a server-sent events comment
+    HEARTBEAT_INTERVAL = 10
+    HEARTBEAT = b":\n\n"
+
+    def __init__(self, max_queued_events=DEFAULT_MAX_QUEUED_EVENTS):
+        """
+        Initializes a new instance of this class.
+        *max_queued_events* must be an integer whose value is the maximum
+        number of events queued for each subscriber, after which its queue
+        overflows (default: DEFAULT_MAX_QUEUED_EVENTS).
+        """
+        self.max_queued_events = max_queued_events
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+
+    def subscribe(self):
+        """
+        Creates, adds and returns a new Subscriber, which receives the events
+        published after this method is invoked.
+        """
+        subscriber = self.Subscriber(self.max_queued_events)
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+
+    def unsubscribe(self, subscriber):
+        """
+        Removes a Subscriber that was returned from subscribe(), if it has not
+        already been removed.
+        """
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+
+    def publish(self, event):
+        """
+        Queues an event for every subscriber, without waiting for any of them.
+        *event* must be a byte string whose value is the event, formatted by
+        format_event().
+        """
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+
+    def close(self):
+        """
+        Closes and removes all subscribers.
+        """
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.close()
+
+
+    @staticmethod
+    def format_event(event_type, data):
+        """
+        Returns a byte string whose value is an event in the format of
+        server-sent events ("text/event-stream"), so that an event only needs
+        to be formatted once no matter how many subscribers receive it.
+        *event_type* must be a string whose value is the type of the event.
+        *data* must be a string whose value is the data of the event, which
+        must not contain newline characters.
+        """
+        return "event: {}\ndata: {}\n\n".format(event_type, data).encode(
+            "UTF-8")
+
+
+    class Subscriber(object):
+        """
+        The queue of events of one subscriber of an EventBroadcaster.
+        """
+
+        def __init__(self, max_queued_events):
+            """
+            Initializes a new instance of this class.
+            *max_queued_events* must be an integer whose value is the maximum
+            number of events to queue, after which the queue overflows.
+            """
+            self.max_queued_events = max_queued_events
+            self.events = collections.deque()
+            self.overflowed = False
+            self.closed = False
+            self.condition = threading.Condition()
+
+
+        def put(self, event):
+            """
+            Queues an event, or discards all of the queued events and notes that
+            the queue overflowed if it is full.  Events are not queued after the
+            queue overflows until get() reports the overflow, because the
+            snapshot taken in response supersedes them.
+            """
+            with self.condition:
+                if self.closed or self.overflowed:
+                    return
+                if len(self.events) >= self.max_queued_events:
+                    self.events.clear()
+                    self.overflowed = True
+                else:
+                    self.events.append(event)
+                self.condition.notify()
+
+
+        def get(self, timeout=None):
+            """
+            Removes and returns the queued events, first waiting for one to be
+            queued if there are none.
+            *timeout* must be a number whose value is the maximum number of
+            seconds to wait; may be 0 to not wait, or None (the default) to
+            wait indefinitely.
+            Returns a tuple (events, overflowed), where events is a list of the
+            events, which is empty if the timeout elapsed, and overflowed is
+            True if events were discarded because the queue overflowed.
+            Returns None if this subscriber has been closed.
+            """
+            with self.condition:
+                if not (self.events or self.overflowed or self.closed or
+                        timeout == 0):
+                    self.condition.wait(timeout)
+                if self.closed:
+                    return None
+                events = list(self.events)
+                self.events.clear()
+                overflowed = self.overflowed
+                self.overflowed = False
+            return (events, overflowed)
+
+
+        def close(self):
+            """
+            Closes this subscriber, waking up any thread waiting in get().
+            """
+            with self.condition:
+                self.closed = True
+                self.events.clear()
+                self.condition.notify_all()
+
+################################################################################
+
+class StateSnapshot(object):
+    """
+    An immutable copy of the state of a Table.  Each change to the state of a
+    table publishes a new snapshot by replacing the table's snapshot
+    attribute, which is a single atomic assignment, so that requests that
+    only read the state can use the current snapshot without acquiring the
+    lock of the deck.
+    """
+
+    __slots__ = ("version", "num_cards", "discard", "codes", "rng_counter")
+
+    def __init__(self, version, deck, discard, codes=None, rng_counter=0):
+        """
+        Initializes a new instance of this class.
+        *version* must be an integer whose value is the version of the state,
+        which is incremented with each change.
+        *deck* must be the Deck whose cards to copy; its cards must all have
+        codes.
+        *discard* must be the Card in the discard pile, or None.
+        *codes* must be a byte string whose bytes are the codes of the cards in
+        the deck, if they are already known; may be None (the default) to
+        compute them.
+        *rng_counter* must be an integer whose value is the counter of the
+        CounterRandom with which the deck is shuffled, so that its shuffles
+        continue from the same point when the state is restored; 0 (the
+        default) if the deck is shuffled with another random number generator.
+        """
+        if codes is None:
+            codes = bytes(CompactDeck.encode(deck))
+        set_attribute = object.__setattr__
+        set_attribute(self, "version", version)
+        set_attribute(self, "num_cards", len(deck))
+        set_attribute(self, "discard", discard)
+        set_attribute(self, "codes", codes)
+        set_attribute(self, "rng_counter", rng_counter)
+
+
+    def __setattr__(self, name, value):
+        """
+        Raises AttributeError, because snapshots are immutable.
+        """
+        raise AttributeError("StateSnapshot objects are immutable")
+
+
+    def __delattr__(self, name):
+        """
+        Raises AttributeError, because snapshots are immutable.
+        """
+        raise AttributeError("StateSnapshot objects are immutable")
+
+
+    @property
+    def empty(self):
+        """
+        Whether there are no cards remaining in the deck.
+        """
+        return self.num_cards == 0
+
+################################################################################
+
+class Table(object):
+    """
+    One of the independent decks of cards of a server, with its discard pile,
+    its message and the clients streaming its events.  The state of the table
+    is protected by the lock of its deck; requests that only read it use
+    self.snapshot, the StateSnapshot of the latest state, instead.
+    """
+
+    def __init__(self, table_id, rng=None, incarnation=0):
+        """
+        Initializes a new instance of this class.
+        *table_id* must be a string whose value is the ID of the table.
+        *rng* is the random number generator with which to shuffle the deck, as
+        in Deck.__init__() (default: None).
+        *incarnation* must be an integer whose value distinguishes this table
+        from the tables with the same ID that were discarded before it was
+        created, or that will be created after it is discarded; see
+        TableRegistry (default: 0).
+        """
+        self.table_id = table_id
+        self.incarnation = incarnation
+        self.deck = Deck(rng=rng)
+        self.discard = None
+        self.message = None
+        self.events = EventBroadcaster()
+        self.snapshot = StateSnapshot(0, self.deck, self.discard,
+            FACTORY_CODES)
+        self.last_used = time.time()
+
+
+    def publish_snapshot(self, num_drawn=0):
+        """
+        Replaces self.snapshot with a snapshot of the current state of this
+        table, and returns it.  This method must be invoked while holding the
+        lock of the deck, after each change to the deck or the discard pile.
+        *num_drawn* must be an integer whose value is the number of cards that
+        were drawn from the top of the deck, if that was the change, so that
+        the codes of the remaining cards are taken from the previous snapshot
+        instead of encoding the whole deck again; or 0 (the default) if the
+        deck was otherwise changed.
+        """
+        snapshot = self.snapshot
+        codes = None
+        if num_drawn:
+            codes = snapshot.codes[:-num_drawn]
+        self.snapshot = StateSnapshot(snapshot.version + 1, self.deck,
+            self.discard, codes, getattr(self.deck.rng, "counter", 0))
+        return self.snapshot
+
+
+    def restore(self, version, codes, discard, rng_counter=0):
+        """
+        Replaces the state of this table with a saved state, such as one loaded
+        by OperationLog.
+        *version* must be an integer whose value is the version of the state.
+        *codes* must be a byte string whose bytes are the codes of the cards to
+        put in the deck.
+        *discard* must be the Card in the discard pile, or None.
+        *rng_counter* must be an integer whose value is the counter to which to
+        set the CounterRandom of the deck, if it has one, so that its shuffles
+        continue where they left off instead of repeating (default: 0).
+        """
+        with self.deck:
+            self.deck[:] = map(Card.from_code, bytearray(codes))
+            self.discard = discard
+            rng = self.deck.rng
+            if isinstance(rng, CounterRandom):
+                rng.counter = rng_counter
+            self.snapshot = StateSnapshot(version, self.deck, discard,
+                bytes(codes), getattr(rng, "counter", 0))
+
+
+    def close(self):
+        """
+        Ends the event streams of this table.
+        """
+        self.events.close()
+
+################################################################################
+
+class TableRegistry(object):
+    """
+    The tables of a server, each of which is created when it is first used.
+    To bound the memory used, tables that have not been used for a while are
+    discarded, as are the least-recently used tables when there are too many.
+    The default table, whose ID is the empty string, is never discarded.
+    Tables whose state is restored by restore() are only created when they are
+    first used, so restoring many tables is fast; until then, their states
+    count toward the maximum number of tables and are discarded by the same
+    rules, according to when the tables were last used before they were
+    saved.
+    The lock of the registry is only held while a table is looked up; the
+    state of each table is protected by the lock of its own deck, so requests
+    for different tables do not contend with each other.
+    Each table that is created, other than the default table, is given a new
+    "incarnation" number, greater than that of every table created before it,
+    so that the changes to a table that was discarded can be told apart from
+    those to a table with the same ID that was created after it.
+    """
+
+    # the default maximum number of tables, besides the default table
+    DEFAULT_MAX_TABLES = 10000
+
+    # the default number of seconds after which an unused table is discarded
+    DEFAULT_IDLE_TIMEOUT = 3600
+
+    # the ID of the default table
+    DEFAULT_TABLE_ID = ""
+
+    TABLE_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}\Z")
+
+    def __init__(self, max_tables=DEFAULT_MAX_TABLES,
+            idle_timeout=DEFAULT_IDLE_TIMEOUT, seed=None, secure=False):
+        """
+        Initializes a new instance of this class.
+        *max_tables* must be an integer whose value is the maximum number of
+        tables to keep, besides the default table (default:
+        DEFAULT_MAX_TABLES).
+        *idle_timeout* must be a number whose value is the number of seconds
+        after which an unused table is discarded; a table is in use while any
+        client is streaming its events (default: DEFAULT_IDLE_TIMEOUT).
+        *seed* must be an integer whose value is the seed from which to derive
+        the random number generator of each table, so that the shuffles of each
+        table are reproducible from the seed and the table ID; may be None (the
+        default) to use the random module.
+        *secure* is evaluated as a boolean; if True then the decks of the tables
+        are shuffled with SECURE_RANDOM; may not be combined with a seed
+        (default: False).
+        Raises ValueError if both seed and secure are given.
+        """
+        if seed is not None and secure:
+            raise ValueError("seed and secure cannot both be specified")
+        self.max_tables = max_tables
+        self.idle_timeout = idle_timeout
+        self.seed = seed
+        self.secure = secure
+        self.default_table = self.create_table(self.DEFAULT_TABLE_ID)
+        self.tables = collections.OrderedDict() # least-recently used first
+        self.lock = threading.Lock()
+
+        # the incarnation number of the table created most recently
+        self.last_incarnation = 0
+
+        # the states restored by restore() of the tables that have not been
+        # used since, which maps each table ID to a tuple (incarnation,
+        # last_used, version, codes, discard, rng_counter) of the incarnation
+        # number of the table, the time that it was last used and the
+        # arguments for Table.restore(); least-recently used first
+        self.saved_states = collections.OrderedDict()
+
+        # a function to invoke with the ID and the incarnation number of each
+        # table or saved state that is discarded, if any, while holding
+        # self.lock, so that it is invoked before a table with the same ID can
+        # be created again
+        self.on_evict = None
+
+
+    def __len__(self):
+        """
+        Returns the number of tables, not counting the default table or the
+        saved states of the tables that have not been created yet.
+        """
+        return len(self.tables)
+
+
+    def get(self, table_id):
+        """
+        Returns the Table with the given ID, creating it if it does not exist,
+        and notes that it is the most-recently used table.
+        *table_id* must be a string whose value is the ID of the table, for
+        which is_valid_table_id() returns True, or DEFAULT_TABLE_ID.
+        Raises ValueError if the ID is not valid.
+        """
+        if table_id == self.DEFAULT_TABLE_ID:
+            return self.default_table
+        if not self.is_valid_table_id(table_id):
+            raise ValueError("invalid table ID: {!r}".format(table_id))
+
+        now = time.time()
+        with self.lock:
+            table = self.tables.pop(table_id, None)
+            if table is None:
+                state = self.saved_states.pop(table_id, None)
+                if state is None:
+                    self.last_incarnation += 1
+                    table = self.create_table(table_id, self.last_incarnation)
+                else:
+                    table = self.create_table(table_id, state[0])
+                    table.restore(*state[2:])
+            table.last_used = now
+            self.tables[table_id] = table
+            evicted = self._evict(now)
+
+        for evicted_table in evicted:
+            evicted_table.close()
+        return table
+
+
+    def create_table(self, table_id, incarnation=0):
+        """
+        Creates and returns a new Table with the given ID and incarnation
+        number, whose deck is shuffled with SECURE_RANDOM if self.secure is
+        True, or with a CounterRandom whose stream is derived from the ID if
+        self.seed is not None.
+        """
+        rng = None
+        if self.secure:
+            rng = SECURE_RANDOM
+        elif self.seed is not None:
+            stream = int(table_id.encode("hex"), 16) if table_id else 0
+            rng = CounterRandom(self.seed, stream=stream)
+        return Table(table_id, rng, incarnation)
+
+
+    def _evict(self, now):
+        """
+        Removes the tables and saved states that have been idle for too long,
+        and the least-recently used of them in excess of self.max_tables,
+        invoking self.on_evict for each of them.
+        Returns the tables that were removed.
+        This method must be invoked while holding self.lock.
+        """
+        evicted = []
+        deadline = now - self.idle_timeout
+        tables = self.tables
+        saved_states = self.saved_states
+        while tables or saved_states:
+            too_many = len(tables) + len(saved_states) > self.max_tables
+            table = next(tables.itervalues()) if tables else None
+            state = next(saved_states.itervalues()) if saved_states else None
+            if state is not None and (table is None or
+                    state[1] <= table.last_used):
+                table_id = next(iter(saved_states))
+                if not too_many and state[1] >= deadline:
+                    break
+                del saved_states[table_id]
+                incarnation = state[0]
+            else:
+                table_id = table.table_id
+                if too_many:
+                    pass
+                elif table.last_used >= deadline:
+                    break
+                elif table.events.subscribers:
+                    # clients are still watching the table, so it is in use
+                    table.last_used = now
+                    tables[table_id] = tables.pop(table_id)
+                    continue
+                del tables[table_id]
+                evicted.append(table)
+                incarnation = table.incarnation
+            if self.on_evict is not None:
+                self.on_evict(table_id, incarnation)
+        return evicted
+
+
+    def close(self):
+        """
+        Ends the event streams of all tables.
+        """
+        for table in self.all_tables():
+            table.close()
+
+
+    def all_tables(self):
+        """
+        Returns a list of all of the tables, including the default table.
+        """
+        with self.lock:
+            tables = list(self.tables.values())
+        tables.append(self.default_table)
+        return tables
+
+
+    def restore(self, states, last_incarnation=0):
+        """
+        Restores the state of tables, such as those loaded by OperationLog.
+        Each table, except the default table, is created with its restored
+        state when it is first used.
+        *states* must be a dict that maps the ID of each table to a tuple
+        (incarnation, last_used, version, codes, discard, rng_counter) of the
+        incarnation number of the table, the time that it was last used and
+        the arguments for Table.restore().
+        *last_incarnation* must be an integer whose value is the greatest
+        incarnation number of any table that was ever created, including the
+        tables that were discarded, so that the tables created from now on
+        are given greater numbers (default: 0).
+        The saved states that are too old or too many are discarded as by
+        get().
+        """
+        states = dict(states)
+        state = states.pop(self.DEFAULT_TABLE_ID, None)
+        if state is not None:
+            self.default_table.restore(*state[2:])
+        now = time.time()
+        with self.lock:
+            for table_id in states:
+                self.tables.pop(table_id, None)
+            states.update(self.saved_states)
+            self.saved_states = collections.OrderedDict(sorted(
+                states.iteritems(), key=lambda item: item[1][1]))
+            self.last_incarnation = max(self.last_incarnation,
+                last_incarnation)
+            evicted = self._evict(now)
+
+        for evicted_table in evicted:
+            evicted_table.close()
+
+
+    def all_states(self):
+        """
+        Returns a list of tuples (table_id, incarnation, last_used, version,
+        codes, discard, rng_counter) of the latest state of every table,
+        including the default table and the tables restored by restore() that
+        have not yet been used; the elements are as for restore().
+        """
+        with self.lock:
+            states = [(table_id,) + state
+                for (table_id, state) in self.saved_states.iteritems()]
+            tables = list(self.tables.values())
+        tables.append(self.default_table)
+        for table in tables:
+            snapshot = table.snapshot
+            states.append((table.table_id, table.incarnation, table.last_used,
+                snapshot.version, snapshot.codes, snapshot.discard,
+                snapshot.rng_counter))
+        return states
+
+
+    @classmethod
+    def is_valid_table_id(cls, table_id):
+        """
+        Returns whether the given string is a valid ID for a table other than
+        the default table: 1 to 64 letters, digits, underscores and dashes.
+        """
+        return cls.TABLE_ID_PATTERN.match(table_id) is not None
+
+################################################################################
+
+class OperationLog(object):
+    """
+    A durable store of the state of the tables of a server, which consists of
+    a snapshot of all of the tables and an append-only log of the changes made
+    to them since the snapshot was taken, in files in a directory.
+
+    Changes are appended to the log in memory and a background thread writes
+    them to the file, waiting up to the "commit interval" to gather the
+    changes made in the meantime so that a single fsync() makes a whole group
+    of changes durable ("group commit").  After a number of changes, the
+    thread takes a new snapshot and deletes the log files that it replaces, so
+    that loading the state never needs to replay a long log.
+
+    Each record of the log contains the version of the state of the table
+    after the change, so that replaying the log skips the changes that were
+    already included in the snapshot, the incarnation number of the table
+    (see TableRegistry), so that the changes made to a table after it was
+    discarded are ignored even if a table with the same ID was created since,
+    and a CRC-32 checksum, so that a record that was only partially written
+    when the process stopped is ignored.
+    Shuffles are logged as the resulting order of the cards, so replaying the
+    log does not depend on the random number generator, along with the
+    counter of the CounterRandom of a table of a seeded server, so that the
+    shuffles after a restart continue its sequence instead of repeating it.
+    The messages of the tables are not stored.
+    """
+
+    # the kinds of records: cards were drawn from the deck, the number of which
+    # is the data of the record as an unsigned short, or 1 if there is no
+    # data; the deck and the discard pile were replaced (reset and shuffles),
+    # for which the data is the code of the card in the discard pile, the
+    # counter of the random number generator as RNG_COUNTER and the codes of
+    # the cards in the deck; the table was discarded
+    OP_DRAW = 1
+    OP_STATE = 2
+    OP_DELETE = 3
+
+    # the layout of a record: CRC-32 of the rest of the record, kind of record,
+    # incarnation number of the table, version of the state after the change,
+    # length of the table ID and length of the data, followed by the table ID
+    # and the data
+    RECORD_HEADER = struct.Struct(">IBIIBH")
+
+    # the layout of the data of an OP_DRAW record of more than one card
+    DRAW_COUNT = struct.Struct(">H")
+
+    # the layout of the counter of the random number generator of a table
+    RNG_COUNTER = struct.Struct(">Q")
+
+    # the layout of a snapshot: the magic bytes, the number of the first log
+    # file to replay, the greatest incarnation number of any table created
+    # before the snapshot was taken and the number of tables, followed by the
+    # tables, each of which is the length of the table ID, the incarnation
+    # number of the table, the time that it was last used in seconds since
+    # the epoch, the version of its state, the code of the card in the
+    # discard pile, the number of cards in the deck and the counter of its
+    # random number generator, followed by the table ID and the codes of the
+    # cards in the deck
+    SNAPSHOT_MAGIC = b"CARDSNP4"
+    SNAPSHOT_HEADER = struct.Struct(">8sIII")
+    SNAPSHOT_TABLE = struct.Struct(">BIIIBHQ")
+
+    # the card code that means that there is no card in the discard pile
+    NO_CARD = 255
+
+    SNAPSHOT_FILENAME = "tables.snapshot"
+    SEGMENT_FILENAME_PREFIX = "tables.log."
+
+    # the default number of seconds to wait to gather a group of changes
+    DEFAULT_COMMIT_INTERVAL = 0.005
+
+    # the default number of changes after which to take a new snapshot
+    DEFAULT_SNAPSHOT_INTERVAL = 10000
+
+    def __init__(self, directory, commit_interval=DEFAULT_COMMIT_INTERVAL,
+            snapshot_interval=DEFAULT_SNAPSHOT_INTERVAL):
+        """
+        Initializes a new instance of this class; load() must be invoked
+        before any changes are appended.
+        *directory* must be a string whose value is the path of the directory
+        in which to store the files, which is created if it does not exist.
+        *commit_interval* must be a number whose value is the maximum number
+        of seconds to wait to gather changes before writing them to the file
+        (default: DEFAULT_COMMIT_INTERVAL).
+        *snapshot_interval* must be an integer whose value is the number of
+        changes after which to take a new snapshot (default:
+        DEFAULT_SNAPSHOT_INTERVAL).
+        """
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.snapshot_interval = snapshot_interval
+        self.registry = None
+        self.segment_number = None
+        self.segment_file = None
+        self.condition = threading.Condition()
+        self.pending = []
+        self.appended_sequence = 0
+        self.committed_sequence = 0
+        self.num_records = 0
+        self.error = None
+        self.closed = False
+        self.thread = None
+
+
+    def load(self, registry):
+        """
+        Restores the tables of the given TableRegistry from the snapshot and
+        the log in self.directory, if any, and starts logging to a new file.
+        *registry* must be the TableRegistry into which to restore the tables,
+        and whose state to save in the snapshots.
+        Returns the number of tables restored.
+        """
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        states = {}
+        first_segment_number = 0
+        snapshot_incarnation = 0
+        path = os.path.join(self.directory, self.SNAPSHOT_FILENAME)
+        if os.path.exists(path):
+            (first_segment_number, snapshot_incarnation) = self._read_snapshot(
+                path, states)
+
+        # the greatest incarnation number of each table that was discarded
+        deleted = {}
+        segment_numbers = self._list_segment_numbers()
+        for segment_number in segment_numbers:
+            if segment_number >= first_segment_number:
+                self.num_records += self._replay_segment(
+                    self._segment_path(segment_number), states, deleted,
+                    snapshot_incarnation)
+
+        # the tables changed since the snapshot was taken count as used now
+        now = time.time()
+        saved_states = {}
+        for (table_id, (version, discard_code, codes, rng_counter,
+                incarnation, last_used)) in states.iteritems():
+            discard = None
+            if discard_code != self.NO_CARD:
+                discard = Card.from_code(discard_code)
+            if last_used is None:
+                last_used = now
+            saved_states[table_id] = (incarnation, last_used, version,
+                bytes(codes), discard, rng_counter)
+        last_incarnation = max([snapshot_incarnation] + deleted.values() +
+            [state[4] for state in states.itervalues()])
+        registry.restore(saved_states, last_incarnation)
+
+        self.registry = registry
+        registry.on_evict = self.append_delete
+        self.segment_number = max(segment_numbers + [first_segment_number]) + 1
+        self.segment_file = open(self._segment_path(self.segment_number), "ab")
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+        return len(states)
+
+
+    def append_draw(self, table, snapshot, num_cards=1):
+        """
+        Appends the record of drawing cards from the deck of a table.
+        This method, like append_state(), must be invoked while holding the
+        lock of the deck of the table, right after the change, so that the
+        changes to each table are logged in order.
+        *table* must be the Table that was changed.
+        *snapshot* must be the StateSnapshot of the table after the change.
+        *num_cards* must be an integer whose value is the number of cards that
+        were drawn at once, the last of which is in the discard pile (default:
+        1).
+        Returns an integer that may be given to wait() to wait until the
+        record has been written to the disk.
+        """
+        data = b"" if num_cards == 1 else self.DRAW_COUNT.pack(num_cards)
+        return self._append(self.OP_DRAW, table.table_id, table.incarnation,
+            snapshot.version, data)
+
+
+    def append_state(self, table, snapshot):
+        """
+        Appends the record of replacing the deck and discard pile of a table,
+        which is how resets and shuffles are logged.  The arguments and the
+        return value are the same as for append_draw().
+        """
+        discard = snapshot.discard
+        discard_code = self.NO_CARD if discard is None else discard.code
+        data = (chr(discard_code) + self.RNG_COUNTER.pack(snapshot.rng_counter)
+            + snapshot.codes)
+        return self._append(self.OP_STATE, table.table_id, table.incarnation,
+            snapshot.version, data)
+
+
+    def append_delete(self, table_id, incarnation):
+        """
+        Appends the record of discarding a table or its saved state from the
+        registry, so that it is not restored when the state is loaded.  This
+        method is invoked by the registry while holding its lock; see
+        TableRegistry.on_evict.
+        *table_id* must be a string whose value is the ID of the table.
+        *incarnation* must be an integer whose value is the incarnation number
+        of the table.
+        Returns the same as append_draw().
+        """
+        return self._append(self.OP_DELETE, table_id, incarnation, 0, b"")
+
+
+    def _append(self, op, table_id, incarnation, version, data):
+        """
+        Appends a record to the log in memory, waking up the thread that writes
+        it to the file.  If writing the log has failed then the record is
+        discarded, since it can never be written; waiting for it returns False.
+        Returns the same as append_draw().
+        """
+        record = self.RECORD_HEADER.pack(0, op, incarnation, version,
+            len(table_id), len(data))[4:] + table_id + data
+        record = struct.pack(">I", zlib.crc32(record) & 0xFFFFFFFF) + record
+        with self.condition:
+            self.appended_sequence += 1
+            if self.error is None:
+                self.pending.append(record)
+                self.condition.notify_all()
+            return self.appended_sequence
+
+
+    def wait(self, sequence, timeout=None):
+        """
+        Waits until the record appended with the given sequence number, as
+        returned by the "append" methods, has been written to the disk.
+        *timeout* must be a number whose value is the maximum number of seconds
+        to wait, or None (the default) to wait indefinitely.
+        Returns True if the record has been written to the disk, or False if
+        writing it failed, the log was closed, or the timeout elapsed.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while (self.committed_sequence < sequence and self.error is None
+                    and not self.closed):
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+            return self.committed_sequence >= sequence
+
+
+    def close(self):
+        """
+        Writes the records that have not yet been written, takes a final
+        snapshot and stops the thread that writes the log.
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            if self.error is None:
+                self._write_snapshot()
+            self.segment_file.close()
+
+
+    def _run(self):
+        """
+        The main loop of the thread that writes the log, which writes the
+        records appended in each commit interval with a single write and a
+        single fsync(), and takes snapshots when enough records are written.
+        If writing the log or a snapshot fails then the error is stored in
+        self.error, which wakes up the threads waiting in wait(), and the
+        thread stops.
+        """
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    break
+                closed = self.closed
+            if not closed:
+                # gather the records appended while the first one waits
+                time.sleep(self.commit_interval)
+
+            with self.condition:
+                records = self.pending
+                self.pending = []
+                sequence = self.appended_sequence
+            try:
+                self.segment_file.write(b"".join(records))
+                self.segment_file.flush()
+                os.fsync(self.segment_file.fileno())
+                with self.condition:
+                    self.committed_sequence = sequence
+                    self.condition.notify_all()
+
+                self.num_records += len(records)
+                if self.num_records >= self.snapshot_interval:
+                    self._write_snapshot()
+            except (IOError, OSError) as e:
+                with self.condition:
+                    self.error = e
+                    self.pending = []
+                    self.condition.notify_all()
+                break
+
+
+    def _write_snapshot(self):
+        """
+        Starts a new log file, takes a snapshot of all of the tables, and
+        deletes the log files whose changes are included in the snapshot.
+        This method must only be invoked by the thread that writes the log.
+        """
+        # every change in the old log files is already in the snapshots of
+        # the tables, and any change logged in the new file that is also in
+        # them is skipped when it is replayed, because of its version
+        self.segment_file.close()
+        self.segment_number += 1
+        self.segment_file = open(self._segment_path(self.segment_number),
+            "ab")
+        self.num_records = 0
+
+        # every table with a smaller incarnation number that is not in the
+        # snapshot was discarded before it was taken
+        last_incarnation = self.registry.last_incarnation
+        states = self.registry.all_states()
+        parts = [self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC,
+            self.segment_number, last_incarnation, len(states))]
+        for (table_id, incarnation, last_used, version, codes, discard,
+                rng_counter) in states:
+            discard_code = self.NO_CARD if discard is None else discard.code
+            parts.append(self.SNAPSHOT_TABLE.pack(len(table_id), incarnation,
+                int(last_used), version, discard_code, len(codes),
+                rng_counter))
+            parts.append(table_id)
+            parts.append(codes)
+
+        path = os.path.join(self.directory, self.SNAPSHOT_FILENAME)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"".join(parts))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temp_path, path)
+        self._fsync_directory()
+
+        for segment_number in self._list_segment_numbers():
+            if segment_number < self.segment_number:
+                os.remove(self._segment_path(segment_number))
+
+
+    def _read_snapshot(self, path, states):
+        """
+        Reads a snapshot into the given dict, which maps each table ID to a
+        list [version, discard code, bytearray of the codes of the cards,
+        counter of the random number generator, incarnation number, time
+        that the table was last used, or None if it was changed since the
+        snapshot was taken].
+        Returns a tuple (first_segment_number, last_incarnation) of the number
+        of the first log file to replay and the greatest incarnation number of
+        any table created before the snapshot was taken.
+        Raises ValueError if the file is not a valid snapshot.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        header = self.SNAPSHOT_HEADER
+        table_header = self.SNAPSHOT_TABLE
+        if len(data) < header.size:
+            raise ValueError("invalid snapshot: {}".format(path))
+        (magic, first_segment_number, last_incarnation, num_tables) = (
+            header.unpack_from(data))
+        if magic != self.SNAPSHOT_MAGIC:
+            raise ValueError("invalid snapshot: {}".format(path))
+
+        pos = header.size
+        for unused in xrange(num_tables):
+            (id_length, incarnation, last_used, version, discard_code,
+                num_cards, rng_counter) = table_header.unpack_from(data, pos)
+            pos += table_header.size
+            table_id = data[pos:pos + id_length]
+            pos += id_length
+            codes = bytearray(data[pos:pos + num_cards])
+            pos += num_cards
+            states[table_id] = [version, discard_code, codes, rng_counter,
+                incarnation, last_used]
+        return (first_segment_number, last_incarnation)
+
+
+    def _replay_segment(self, path, states, deleted, snapshot_incarnation):
+        """
+        Applies the changes in a log file to the given dict, which is as for
+        _read_snapshot().  Replaying stops at the first record that is
+        incomplete or whose checksum does not match.
+        *deleted* must be a dict that maps the ID of each table that was
+        discarded to its greatest incarnation number that was discarded,
+        which is updated with the tables discarded by the log file.
+        *snapshot_incarnation* must be an integer whose value is the greatest
+        incarnation number of any table created before the snapshot was
+        taken, or 0 if there is no snapshot.
+        Returns the number of records replayed.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        header = self.RECORD_HEADER
+        pos = 0
+        num_records = 0
+        while pos + header.size <= len(data):
+            (crc, op, incarnation, version, id_length, data_length) = (
+                header.unpack_from(data, pos))
+            start = pos + header.size
+            end = start + id_length + data_length
+            if end > len(data):
+                break
+            if zlib.crc32(data[pos + 4:end]) & 0xFFFFFFFF != crc:
+                break
+            table_id = data[start:start + id_length]
+            pos = end
+            num_records += 1
+
+            state = states.get(table_id)
+            if state is not None and incarnation < state[4]:
+                continue # a change to a table that was discarded since
+            if op == self.OP_DELETE:
+                states.pop(table_id, None)
+                deleted[table_id] = max(deleted.get(table_id, 0), incarnation)
+                continue
+            if state is None or incarnation > state[4]:
+                # the first change to a table since it was created, unless it
+                # was made by a request that still had the table after it was
+                # discarded; the default table is never discarded
+                if table_id != TableRegistry.DEFAULT_TABLE_ID and (
+                        incarnation <= snapshot_incarnation or
+                        incarnation <= deleted.get(table_id, 0)):
+                    continue
+                state = [0, self.NO_CARD, self._new_deck_codes(), 0,
+                    incarnation, None]
+                states[table_id] = state
+            if version <= state[0]:
+                continue # already included in the snapshot
+            state[5] = None
+            if op == self.OP_DRAW:
+                num_cards = 1
+                if data_length == self.DRAW_COUNT.size:
+                    (num_cards,) = self.DRAW_COUNT.unpack_from(data,
+                        start + id_length)
+                codes = state[2]
+                if version == state[0] + 1 and 0 < num_cards <= len(codes):
+                    state[0] = version
+                    state[1] = codes[-num_cards]
+                    del codes[-num_cards:]
+            elif op == self.OP_STATE:
+                record_data = data[start + id_length:end]
+                codes_start = 1 + self.RNG_COUNTER.size
+                state[0] = version
+                state[1] = ord(record_data[0])
+                state[2] = bytearray(record_data[codes_start:])
+                (state[3],) = self.RNG_COUNTER.unpack(
+                    record_data[1:codes_start])
+        return num_records
+
+
+    @staticmethod
+    def _new_deck_codes():
+        """
+        Returns a bytearray whose bytes are the codes of the cards of a new
+        deck, which is the state of a table before any changes.
+        """
+        return bytearray(FACTORY_CODES)
+
+
+    def _list_segment_numbers(self):
+        """
+        Returns a sorted list of the numbers of the log files in the directory.
+        """
+        prefix = self.SEGMENT_FILENAME_PREFIX
+        segment_numbers = []
+        for filename in os.listdir(self.directory):
+            if filename.startswith(prefix) and filename[len(prefix):].isdigit():
+                segment_numbers.append(int(filename[len(prefix):]))
+        segment_numbers.sort()
+        return segment_numbers
+
+
+    def _segment_path(self, segment_number):
+        """
+        Returns the path of the log file with the given number.
+        """
+        return os.path.join(self.directory, "{}{:08d}".format(
+            self.SEGMENT_FILENAME_PREFIX, segment_number))
+
+
+    def _fsync_directory(self):
+        """
+        Flushes the directory to the disk, so that a renamed file is durable.
+        This is not possible on all platforms, in which case it does nothing.
+        """
+        try:
+            fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+################################################################################
+
+class MyHttpServer(BaseHTTPServer.HTTPServer):
+    """
+    The HTTP server that provides the user interface for this application.
+    The server has any number of independent tables, each with its own deck,
+    which are kept in a TableRegistry.  By default, requests are handled one
+    at a time by the thread that calls serve_forever().  If a number of
+    "workers" is specified, then accepted connections are instead put into a
+    bounded queue from which that many worker threads take them and handle
+    them concurrently; the state of the application is protected by the locks
+    of the decks of the tables.  A kept-alive connection only occupies a
+    worker thread while one of its requests is handled: between requests, a
+    single thread watches all of the idle connections and queues each one
+    for the workers again when its next request arrives.
+    The changes to the state of a table are streamed to the clients of its
+    "events" request, each of which occupies a worker thread for as long
+    as it is connected; the number of streams is therefore limited to fewer
+    than the number of worker threads, so that the other requests are still
+    handled, and the "events" request is only supported if there are worker
+    threads.
+    """
+
+    # the maximum number of connections that the operating system will queue
+    # while waiting for them to be accepted
+    request_queue_size = 128
+
+    # the number of seconds that an idle kept-alive connection is kept open
+    KEEP_ALIVE_TIMEOUT = 15
+
+    def __init__(self, tcp_port, num_workers=0, keep_alive=False,
+            max_queued_connections=None,
+            resource_cache_size=ResourceCache.DEFAULT_MAX_SIZE, sprites=False,
+            max_tables=TableRegistry.DEFAULT_MAX_TABLES,
+            table_idle_timeout=TableRegistry.DEFAULT_IDLE_TIMEOUT,
+            state_dir=None, seed=None, secure=False, max_event_streams=None):
+        """
+        Initializes a new instance of this class.
+        *tcp_port* must be an integer whose value is the TCP port to which the
+        HTTP server will bind and to which it will listen for and handle
+        requests.
+        *num_workers* must be an integer whose value is the number of worker
+        threads with which to handle requests; may be 0 (the default) to
+        handle requests in the thread that calls serve_forever().
+        *keep_alive* is evaluated as a boolean; if True then HTTP/1.1 is used
+        and connections are kept open between requests for responses whose
+        length is known in advance (default: False).
+        *max_queued_connections* must be an integer whose value is the maximum
+        number of accepted connections waiting for a worker thread, after which
+        accepting connections blocks until a worker thread is available; may
+        be None (the default) to allow 16 per worker thread.  This argument is
+        ignored if num_workers is 0.
+        *resource_cache_size* must be an integer whose value is the maximum
+        number of bytes of the files in the "res" directory to cache in memory
+        (default: ResourceCache.DEFAULT_MAX_SIZE).
+        *sprites* is evaluated as a boolean; if True then the web pages show
+        the images of the cards as regions of the single image res/cards.png
+        instead of as separate images, so that browsers only need to download
+        one image for all of the cards (default: False).
+        *max_tables* must be an integer whose value is the maximum number of
+        tables, besides the default table, to keep in memory, after which the
+        least-recently used tables are discarded (default:
+        TableRegistry.DEFAULT_MAX_TABLES).
+        *table_idle_timeout* must be a number whose value is the number of
+        seconds after which an unused table is discarded (default:
+        TableRegistry.DEFAULT_IDLE_TIMEOUT).
+        *seed* must be an integer whose value is the seed from which to derive
+        the random number generator of each table, so that the shuffles are
+        reproducible; may be None (the default) to use the random module.
+        *secure* is evaluated as a boolean; if True then the decks are shuffled
+        with SECURE_RANDOM instead (default: False).
+        *state_dir* must be a string whose value is the path of the directory
+        in which to store the state of the tables with an OperationLog, so that
+        it survives restarts; may be None (the default) to not store it.  The
+        response to a request that changes the state of a table is sent once
+        the change has been written to the disk.
+        *max_event_streams* must be an integer whose value is the maximum number
+        of clients of the "events" request to serve at once, each of which
+        occupies a worker thread, and which must be less than num_workers; the
+        "events" request is answered with an error while there are that many
+        (default: half of num_workers, rounded down).
+        Raises ValueError if max_event_streams is not less than num_workers.
+        """
+        if max_event_streams is None:
+            max_event_streams = num_workers // 2
+        elif max_event_streams > 0 and max_event_streams >= num_workers:
+            raise ValueError("max_event_streams must be less than num_workers")
+        self.tables = TableRegistry(max_tables=max_tables,
+            idle_timeout=table_idle_timeout, seed=seed, secure=secure)
+        self.oplog = None
+        if state_dir is not None:
+            self.oplog = OperationLog(state_dir)
+            self.oplog.load(self.tables)
+        self.keep_alive = keep_alive
+        self.sprites = sprites
+        self.main_page = self.MyRequestHandler.create_main_page(sprites)
+        self.find_page = self.MyRequestHandler.create_find_page(sprites)
+        self.resources = ResourceCache("res", max_size=resource_cache_size)
+        address = ("", tcp_port)
         BaseHTTPServer.HTTPServer.__init__(self, server_address=address,
             RequestHandlerClass=self.MyRequestHandler)
 
+        self.max_event_streams = max(max_event_streams, 0)
+        self.event_stream_slots = threading.BoundedSemaphore(
+            self.max_event_streams)
+        self.connection_queue = None
+        self.workers = []
+        # the idle kept-alive connections, which maps the socket of each one
+        # to a tuple (handler, deadline) of its MyRequestHandler and the time
+        # at which to close it, or None once the server is closed
+        self.idle_connections = {}
+        self.idle_lock = threading.Lock()
+        if num_workers > 0:
+            if max_queued_connections is None:
+                max_queued_connections = num_workers * 16
+            self.connection_queue = Queue.Queue(max_queued_connections)
+            for unused in xrange(num_workers):
+                worker = threading.Thread(target=self._run_worker)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+            # a byte written to one socket of the pair wakes up the thread
+            # watching the idle connections, to watch a new one or to stop
+            (self.idle_wakeup_reader, self.idle_wakeup_writer) = (
+                socket.socketpair())
+            self.idle_watcher = threading.Thread(target=self._run_idle_watcher)
+            self.idle_watcher.daemon = True
+            self.idle_watcher.start()
+
+
+    def process_request(self, request, client_address):
+        """
+        Handles a newly-accepted connection.
+        If there are worker threads then the connection is queued for them to
+        handle; otherwise, it is handled by the superclass' implementation.
+        """
+        if self.connection_queue is None:
+            BaseHTTPServer.HTTPServer.process_request(self, request,
+                client_address)
+        else:
+            self.connection_queue.put((request, client_address, None))
+
+
+    def finish_request(self, request, client_address):
+        """
+        Handles the requests of a connection by creating an instance of the
+        request handler class, and returns it.
+        """
+        return self.RequestHandlerClass(request, client_address, self)
+
+
+    def _run_worker(self):
+        """
+        The main loop of the worker threads, which handles the connections in
+        self.connection_queue until None is taken from it.  Each item of the
+        queue is a tuple (request, client_address, handler) of a connection
+        and, if it was idle, the MyRequestHandler with which to resume
+        handling its requests, or None if it was just accepted.  Connections
+        that become idle are given to the thread that watches them, and the
+        others are closed.
+        """
+        while True:
+            item = self.connection_queue.get()
+            if item is None:
+                break
+            (request, client_address, handler) = item
+            idle = False
+            try:
+                if handler is None:
+                    handler = self.finish_request(request, client_address)
+                else:
+                    handler.resume()
+                idle = handler.idle
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                if idle:
+                    self._watch_idle_connection(handler)
+                else:
+                    self.shutdown_request(request)
+
+
+    def _watch_idle_connection(self, handler):
+        """
+        Gives an idle kept-alive connection to the thread that watches them,
+        which queues it for the worker threads when its next request arrives
+        or closes it after KEEP_ALIVE_TIMEOUT seconds.
+        *handler* must be the MyRequestHandler of the connection.
+        """
+        deadline = time.time() + self.KEEP_ALIVE_TIMEOUT
+        with self.idle_lock:
+            if self.idle_connections is not None:
+                self.idle_connections[handler.request] = (handler, deadline)
+                handler = None
+        if handler is None:
+            self.idle_wakeup_writer.send(b"x")
+        else:
+            # the server was closed
+            self._close_idle_connection(handler)
+
+
+    def _run_idle_watcher(self):
+        """
+        The main loop of the thread that watches the idle kept-alive
+        connections, until the server is closed.
+        """
+        wakeup = self.idle_wakeup_reader
+        while True:
+            with self.idle_lock:
+                if self.idle_connections is None:
+                    break
+                connections = self.idle_connections.items()
+            timeout = None
+            if connections:
+                deadline = min(deadline for (unused, (unused, deadline)) in
+                    connections)
+                timeout = max(deadline - time.time(), 0)
+            readable = self._wait_readable(
+                [wakeup] + [connection for (connection, unused) in connections],
+                timeout)
+            if wakeup in readable:
+                wakeup.recv(4096)
+
+            now = time.time()
+            ready = []
+            expired = []
+            with self.idle_lock:
+                if self.idle_connections is None:
+                    break
+                for (connection, (handler, deadline)) in connections:
+                    if connection in readable:
+                        ready.append(handler)
+                    elif deadline <= now:
+                        expired.append(handler)
+                    else:
+                        continue
+                    del self.idle_connections[connection]
+            for handler in ready:
+                self.connection_queue.put((handler.request,
+                    handler.client_address, handler))
+            for handler in expired:
+                self._close_idle_connection(handler)
+        wakeup.close()
+
+
+    @staticmethod
+    def _wait_readable(sockets, timeout):
+        """
+        Waits until any of the given sockets is readable, or closed by the
+        other end, and returns a list of those that are.
+        *sockets* must be a list of the sockets to wait for.
+        *timeout* must be a number whose value is the maximum number of seconds
+        to wait, or None to wait indefinitely.
+        poll() is used where it is available, because select() only supports
+        file descriptors below FD_SETSIZE.
+        """
+        if not hasattr(select, "poll"):
+            return select.select(sockets, [], [], timeout)[0]
+        poller = select.poll()
+        sockets_by_fd = {}
+        for sock in sockets:
+            sockets_by_fd[sock.fileno()] = sock
+            poller.register(sock, select.POLLIN)
+        if timeout is not None:
+            timeout = int(math.ceil(timeout * 1000))
+        try:
+            events = poller.poll(timeout)
+        except select.error:
+            return [] # interrupted by a signal
+        return [sockets_by_fd[fd] for (fd, unused) in events]
+
+
+    def _close_idle_connection(self, handler):
+        """
+        Closes an idle kept-alive connection.
+        *handler* must be the MyRequestHandler of the connection.
+        """
+        handler.idle = False
+        handler.finish()
+        self.shutdown_request(handler.request)
+
+
+    def start_event_stream(self):
+        """
+        Reserves one of the self.max_event_streams event streams, without
+        waiting, for a client of the "events" request.
+        Returns True if one was reserved, in which case end_event_stream()
+        must be invoked when the stream ends, or False if there are already
+        that many streams.
+        """
+        return self.event_stream_slots.acquire(False)
+
+
+    def end_event_stream(self):
+        """
+        Releases an event stream reserved by start_event_stream().
+        """
+        self.event_stream_slots.release()
+
+
+    def server_close(self):
+        """
+        Ends the event streams, stops the worker threads, if any, closes the
+        idle kept-alive connections and the listening socket, and closes the
+        OperationLog, if any.
+        """
+        self.tables.close()
+        for unused in self.workers:
+            self.connection_queue.put(None)
+        if self.workers:
+            with self.idle_lock:
+                connections = self.idle_connections
+                self.idle_connections = None
+            if connections is not None:
+                self.idle_wakeup_writer.send(b"x")
+                self.idle_watcher.join()
+                self.idle_wakeup_writer.close()
+                for (handler, unused) in connections.itervalues():
+                    self._close_idle_connection(handler)
+        del self.workers[:]
+        BaseHTTPServer.HTTPServer.server_close(self)
+        if self.oplog is not None:
+            self.oplog.close()
+
 
     class MyRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
         """
         The HTTP request handler used by run().
         """
 
+        # buffer the writes to the connection so that the status line, the
+        # headers and the body of a response are sent together; the buffer is
+        # flushed by send_built_response() and after each request
+        wbufsize = -1
+
+        def setup(self):
+            """
+            Prepares to handle the requests of the connection.
+            If the server keeps connections alive then HTTP/1.1 is used and
+            idle connections are closed after the server's KEEP_ALIVE_TIMEOUT.
+            """
+            if self.server.keep_alive:
+                self.protocol_version = "HTTP/1.1"
+                self.timeout = self.server.KEEP_ALIVE_TIMEOUT
+            self.content_length_sent = False
+            # whether handle() returned because the connection is idle
+            self.idle = False
+            BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+
+
+        def handle(self):
+            """
+            Handles the requests of the connection until it is to be closed.
+            If the server has worker threads, this method instead returns
+            between requests, setting self.idle to True, once the next request
+            has not been received yet, so that the worker thread is free while
+            the connection is idle; resume() then continues where it left off.
+            """
+            self.close_connection = 1
+            self.handle_one_request()
+            while not self.close_connection:
+                if (self.server.connection_queue is not None and
+                        not self.has_buffered_input()):
+                    self.idle = True
+                    return
+                self.handle_one_request()
+
+
+        def resume(self):
+            """
+            Continues handling the requests of an idle connection, once its
+            next request has been received.
+            """
+            self.idle = False
+            try:
+                self.handle()
+            finally:
+                self.finish()
+
+
+        def has_buffered_input(self):
+            """
+            Returns whether any data received from the connection, such as a
+            pipelined request, is buffered in self.rfile, in which case the
+            socket will not become readable for it.  Returns True if that
+            cannot be determined.
+            """
+            buffer = getattr(self.rfile, "_rbuf", None)
+            return buffer is None or buffer.tell() > 0
+
+
+        def finish(self):
+            """
+            Flushes and closes self.wfile and self.rfile, unless the connection
+            is idle, in which case they are kept open for resume().
+            """
+            if not self.idle:
+                BaseHTTPServer.BaseHTTPRequestHandler.finish(self)
+
+
+        def send_header(self, keyword, value):
+            """
+            Sends an HTTP header, noting whether it was Content-Length.
+            """
+            if keyword.lower() == "content-length":
+                self.content_length_sent = True
+            BaseHTTPServer.BaseHTTPRequestHandler.send_header(self, keyword,
+                value)
+
+
+        def end_headers(self):
+            """
+            Ends the HTTP headers.
+            If no Content-Length header was sent then the end of the response
+            is indicated by closing the connection, so this method first sends
+            a "Connection: close" header in that case, as it does if the
+            connection of an HTTP/1.1 response is to be closed anyway.
+            """
+            if self.protocol_version == "HTTP/1.1" and (
+                    self.close_connection or not self.content_length_sent):
+                self.send_header("Connection", "close")
+            self.content_length_sent = False
+            BaseHTTPServer.BaseHTTPRequestHandler.end_headers(self)
+
+
+        def send_built_response(self, response):
+            """
+            Sends a complete response with a single write to the connection.
+            *response* must be a ResponseBuilder whose status, headers and body
+            to send; a Content-Length header is added for its body, so that the
+            connection can be kept alive after the response.
+            """
+            self.send_response(response.status, response.reason)
+            for (keyword, value) in response.headers:
+                self.send_header(keyword, value)
+            if response.status in (httplib.NO_CONTENT, httplib.NOT_MODIFIED):
+                # these responses never have a body, so their length is known
+                self.content_length_sent = True
+            else:
+                self.send_header("Content-Length", str(response.size))
+            self.end_headers()
+            for chunk in response.chunks:
+                self.wfile.write(chunk)
+            self.wfile.flush()
+
+
+        def send_error(self, code, message=None):
+            """
+            Sends an error response, like the superclass' implementation, but
+            with a Content-Length header so that the connection does not need
+            to be closed after the response.
+            *code* must be an integer whose value is the HTTP status code.
+            *message* must be a string whose value is the reason phrase to send
+            with the status code; may be None (the default) to use the standard
+            reason phrase of the status code.
+            """
+            try:
+                (short, explain) = self.responses[code]
+            except KeyError:
+                (short, explain) = ("???", "???")
+            if message is None:
+                message = short
+            self.log_error("code %d, message %s", code, message)
+
+            response = ResponseBuilder(code, message)
+            response.add_header("Content-Type", self.error_content_type)
+            if self.command != "HEAD" and code >= httplib.OK:
+                response.write_bytes(self.error_message_format % {
+                    "code": code,
+                    "message": PageTemplate.escape(message),
+                    "explain": explain,
+                })
+            self.send_built_response(response)
+
+
         def do_GET(self):
             """
             Handles GET requests.
             """
+            self.handle_path(b"")
+
+
+        def do_POST(self):
+            """
+            Handles POST requests, by reading the body of the request and then
+            handling it like a GET request.
+            The body is read even if the request does not use it so that it is
+            not mistaken for the next request on a kept-alive connection.
+            """
+            try:
+                content_length = int(self.headers.get("Content-Length", "0"))
+            except ValueError:
+                content_length = -1
+            if content_length < 0:
+                self.close_connection = 1
+                self.send_error(httplib.BAD_REQUEST, "Bad Content-Length")
+                return
+            self.handle_path(self.rfile.read(content_length))
+
+
+        def handle_path(self, request_body):
+            """
+            Handles a GET or POST request by invoking the method for its path.
+            *request_body* must be a string whose value is the body of the
+            request, which is stored in self.request_body; it is empty except
+            for POST requests.
+            """
+            self.request_body = request_body
+            # the sequence number of the log record of the latest change made
+            # by this request, if any; see wait_for_log()
+            self.log_sequence = None
+            # the StateSnapshot published by the latest change made by this
+            # request, if any, which is the state sent in the response
+            self.response_snapshot = None
+
             parsed_url = urlparse.urlparse(self.path)
             path = parsed_url.path
 
+            # the URLs of a table other than the default table are those of
+            # the default table prefixed with /t/<table_id>
+            table_id = TableRegistry.DEFAULT_TABLE_ID
+            if path.startswith("/t/"):
+                (table_id, sep, path) = path[3:].partition("/")
+                if not TableRegistry.is_valid_table_id(table_id):
+                    self.send_error(httplib.NOT_FOUND)
+                    return
+                elif not sep:
+                    # the page of the table uses relative URLs, so it must be
+                    # requested with the trailing slash
+                    self.send_redirect("/t/{}/".format(table_id))
+                    return
+                path = "/" + path
+            # the table is only looked up, which creates it if it does not
+            # exist, by the requests that use it; see the "table" property
+            self.table_id = table_id
+            self._table = None
+            # the query parameters of the request, as returned by parse_qs()
+            self.query = urlparse.parse_qs(parsed_url.query)
+
             if path == "/":
                 self.do_send_html()
             elif path == "/draw":
                 self.do_draw()
+            elif path == "/deal":
+                self.do_deal()
+            elif path == "/state":
+                self.send_ajax_response()
+            elif path == "/events":
+                self.do_events()
             elif path == "/reset":
                 self.do_reset()
             elif path == "/shuffle_random":
@@ -417,127 +5871,239 @@ class MyHttpServer(BaseHTTPServer.HTTPServer):
                 self.send_error(httplib.NOT_FOUND)
 
 
-        def do_POST(self):
+        @property
+        def table(self):
+            """
+            The Table of the request, which is looked up in the server's
+            TableRegistry the first time that it is used, creating it if it
+            does not exist.
+            """
+            if self._table is None:
+                self._table = self.server.tables.get(self.table_id)
+            return self._table
+
+
+        def get_int_param(self, name, default, minimum, maximum):
+            """
+            Returns the value of an integer query parameter of the request.
+            *name* must be a string whose value is the name of the parameter;
+            if it is given more than once, the last value is used.
+            *default* is the value to return if the parameter is not given.
+            *minimum* and *maximum* must be integers whose values are the
+            smallest and largest valid values, inclusive.
+            Raises ValueError if the value is not an integer in the range.
+            """
+            values = self.query.get(name)
+            if not values:
+                return default
+            try:
+                value = int(values[-1])
+            except ValueError:
+                raise ValueError("Invalid {}: {}".format(name, values[-1]))
+            if not minimum <= value <= maximum:
+                raise ValueError("{} must be between {} and {}".format(name,
+                    minimum, maximum))
+            return value
+
+
+        def send_redirect(self, location):
             """
-            Handles POST requests, by simply calling self.do_GET().
+            Sends a response that redirects the client to another URL.
+            *location* must be a string whose value is the URL.
             """
-            return self.do_GET()
+            response = ResponseBuilder(httplib.MOVED_PERMANENTLY)
+            response.add_header("Location", location)
+            response.add_header("Content-Type", "text/html; charset=UTF-8")
+            response.write('<a href="{}">{}</a>'.format(location,
+                PageTemplate.escape(location)))
+            self.send_built_response(response)
 
 
         def do_send_html(self):
             """
             Responds to the default request.
             """
-            self.send_response(httplib.OK)
-
-            self.send_header("Content-Type", "text/html; charset=UTF-8")
-            self.send_header("Cache-Control", "no-cache")
-            self.end_headers()
-            self.write("<html>")
-            self.write("<head>")
-            self.write('<script type="text/javascript">')
-            self.write(self.DEFAULT_JAVASCRIPT)
-            self.write("</script>")
-            self.write("<title>", newline=False)
-            self.write_escaped("Cards")
-            self.write("</title>")
-            self.write("</head>")
-            self.write('<body>')
-            self.write('<h2>Deck of Cards</h2>')
-            self.write('<p>Click on the deck to draw a card</p>')
-
-            with self.server.deck:
-                deck_filename = self.get_deck_filename()
-                discard_filename = self.get_discard_filename()
-                cards_remaining_html = self.get_cards_remaining_html()
-                message = self.server.message
-                self.server.message = None
-
-            self.write("<div>")
-            self.write('<img id="deck" src="{}" '
-                'onclick=\'sendRequest("draw")\' width="212" height="287" />'
-                .format(deck_filename))
-            self.write('<img id="discard" src="{}" '
-                'width="212" height="287" />'
-                .format(discard_filename))
-            self.write("</div>")
+            table = self.table
+            snapshot = table.snapshot
+            deck_filename = self.get_deck_filename(snapshot)
+            discard_filename = self.get_discard_filename(snapshot)
+            discard_position = self.get_discard_position(snapshot)
+            cards_remaining_html = self.get_cards_remaining_html(snapshot)
+            num_cards = snapshot.num_cards
+
+            # the message is shown once, so taking it is a change to the state;
+            # the lock is only needed in the uncommon case that there is one
+            message = None
+            if table.message is not None:
+                with table.deck:
+                    message = table.message
+                    table.message = None
 
-            self.write('<div id="cards_remaining">')
-            self.write(cards_remaining_html)
-            self.write("</div>")
-            self.write('<div id="message">')
             if message:
-                self.write_escaped(message)
+                message_html = PageTemplate.escape(message)
             else:
-                self.write("&nbsp;")
-            self.write("</div>")
+                message_html = "&nbsp;"
+
+            body = self.server.main_page.render(
+                deck_filename=deck_filename,
+                discard_filename=discard_filename,
+                discard_position=discard_position,
+                cards_remaining=cards_remaining_html,
+                num_cards=str(num_cards),
+                message=message_html,
+            )
+            self.send_page(body, "no-cache")
 
-            self.write('<form name="find" action="find" />')
 
-            self.write('<input type="button" value="Reset" '
-                'onclick=\'sendRequest("reset")\'/><br/>')
-            self.write('<input type="button" value="Shuffle (Random)" '
-                'onclick=\'sendRequest("shuffle_random")\'/><br/>')
-            self.write('<input type="button" value="Shuffle (3-way-cut)" '
-                'onclick=\'sendRequest("shuffle_3waycut")\'/><br/>')
-            self.write('<input type="button" value="Shuffle (Riffle)" '
-                'onclick=\'sendRequest("shuffle_riffle")\'/><br/>')
-            self.write('<input type="submit" value="Find Card" '
-                'onclick=\'document.forms["find"].submit()\' /><br/>')
-            self.write('<input type="button" value="Shutdown" '
-                'onclick=\'sendRequest("shutdown")\'/><br/>')
+        def do_find(self):
+            """
+            Responds to the "find" request.
+            """
+            self.send_page(self.server.find_page, "public")
 
-            self.write("</body>")
-            self.write("</html>")
 
+        def send_page(self, body, cache_control):
+            """
+            Sends a complete HTML page as the response, in a single write.
+            *body* must be a string whose value is the UTF-8-encoded page.
+            *cache_control* must be a string whose value is the value of the
+            Cache-Control header.
+            """
+            response = ResponseBuilder()
+            response.add_header("Content-Type", "text/html; charset=UTF-8")
+            response.add_header("Cache-Control", cache_control)
+            response.write_bytes(body)
+            self.send_built_response(response)
 
-        def do_find(self):
+
+        @classmethod
+        def create_main_page(cls, sprites):
             """
-            Responds to the "find" request.
+            Creates and returns the PageTemplate for the default request.
+            *sprites* is evaluated as a boolean to determine whether the page
+            shows the discard pile using the sprite sheet.
             """
-            self.send_response(httplib.OK)
-
-            self.send_header("Content-Type", "text/html; charset=UTF-8")
-            self.send_header("Cache-Control", "public")
-            self.end_headers()
-            self.write("<html>")
-            self.write("<head>")
-            self.write("<title>", newline=False)
-            self.write_escaped("Find a Card")
-            self.write("</title>")
-            self.write("</head>")
-            self.write('<body>')
-            self.write("<h2>Find a Card</h2>")
-
-            self.write_escaped("Click on the card to find:")
-            self.write('<form action="findimpl" method="post">')
-            deck = Deck()
-            for (index, card) in enumerate(reversed(deck)):
+            if sprites:
+                discard_html = ('<div id="discard" style="display: '
+                    'inline-block; width: 212px; height: 287px; '
+                    'background-image: url({{discard_filename}}); '
+                    'background-position: {{discard_position}}" ></div>')
+            else:
+                discard_html = ('<img id="discard" src="{{discard_filename}}" '
+                    'width="212" height="287" />')
+
+            # the images of the cards, indexed by card code, from which the
+            # script shows the discard pile described by the state of the
+            # application
+            if sprites:
+                sprite_sheet_filename = cls.SPRITE_SHEET_FILENAME
+                card_images = [
+                    cls.get_card_sprite_position(Card.from_code(code))
+                    for code in xrange(Card.NUM_CODES)]
+            else:
+                sprite_sheet_filename = None
+                card_images = [cls.get_card_filename(Card.from_code(code))
+                    for code in xrange(Card.NUM_CODES)]
+
+            lines = [
+                "<html>",
+                "<head>",
+                '<script type="text/javascript">',
+                "var SPRITE_SHEET_FILENAME = {};".format(
+                    json.dumps(sprite_sheet_filename)),
+                "var serverRemaining = {{num_cards}};",
+                "var CARD_IMAGES = {};".format(json.dumps(card_images)),
+                cls.DEFAULT_JAVASCRIPT,
+                "</script>",
+                "<title>" + PageTemplate.escape("Cards"),
+                "</title>",
+                "</head>",
+                "<body>",
+                "<h2>Deck of Cards</h2>",
+                "<p>Click on the deck to draw a card</p>",
+                "<div>",
+                '<img id="deck" src="{{deck_filename}}" '
+                    'onclick=\'sendRequest("draw")\' width="212" '
+                    'height="287" />',
+                discard_html,
+                "</div>",
+                '<div id="cards_remaining">',
+                "{{cards_remaining}}",
+                "</div>",
+                '<div id="message">',
+                "{{message}}",
+                "</div>",
+                '<form name="find" action="find" />',
+                '<input type="button" value="Reset" '
+                    'onclick=\'sendRequest("reset")\'/><br/>',
+                '<input type="button" value="Shuffle (Random)" '
+                    'onclick=\'sendRequest("shuffle_random")\'/><br/>',
+                '<input type="button" value="Shuffle (3-way-cut)" '
+                    'onclick=\'sendRequest("shuffle_3waycut")\'/><br/>',
+                '<input type="button" value="Shuffle (Riffle)" '
+                    'onclick=\'sendRequest("shuffle_riffle")\'/><br/>',
+                '<input type="submit" value="Find Card" '
+                    'onclick=\'document.forms["find"].submit()\' /><br/>',
+                '<input type="button" value="Shutdown" '
+                    'onclick=\'sendRequest("shutdown")\'/><br/>',
+                "</body>",
+                "</html>",
+                "",
+            ]
+            return PageTemplate("\n".join(lines))
+
+
+        @classmethod
+        def create_find_page(cls, sprites):
+            """
+            Creates and returns the UTF-8-encoded page for the "find" request,
+            which is the same for every request.
+            *sprites* is evaluated as a boolean to determine whether the page
+            shows the cards using the sprite sheet.
+            """
+            lines = [
+                "<html>",
+                "<head>",
+                "<title>" + PageTemplate.escape("Find a Card"),
+                "</title>",
+                "</head>",
+                "<body>",
+                "<h2>Find a Card</h2>",
+                PageTemplate.escape("Click on the card to find:"),
+                '<form action="findimpl" method="post">',
+            ]
+
+            cards = list(Deck.iter_cards())
+            cards.reverse()
+            for (index, card) in enumerate(cards):
                 if index % 13 == 0:
-                    self.write("<div/>")
-                filename = self.get_card_filename(card)
-                self.write('<input type="image" width="71" height="96" '
-                    'src="{}" name="{}" />'.format(filename, card))
-            self.write("</form>")
+                    lines.append("<div/>")
+                if sprites:
+                    # a button named like the coordinates posted by an image
+                    # input, so that find_card() handles both the same way
+                    lines.append('<button type="submit" name="{}.x" value="0" '
+                        'style="width: 71px; height: 96px; border: 0; '
+                        'padding: 0; background-image: url({}); '
+                        'background-position: {}; background-size: {}" >'
+                        '</button>'.format(card, cls.SPRITE_SHEET_FILENAME,
+                        cls.get_card_sprite_position(card, 71, 96),
+                        cls.get_sprite_sheet_size(71, 96)))
+                else:
+                    filename = cls.get_card_filename(card)
+                    lines.append('<input type="image" width="71" height="96" '
+                        'src="{}" name="{}" />'.format(filename, card))
 
-            self.write("</body>")
-            self.write("</html>")
+            lines.extend(["</form>", "</body>", "</html>", ""])
+            return "\n".join(lines).encode("UTF-8")
 
 
         def do_findimpl(self):
             """
             Responds to the "findimpl" request.
             """
-            self.send_response(httplib.OK)
-            self.send_header("Content-Type", "text/html; charset=UTF-8")
-            self.send_header("Cache-Control", "no-cache")
-            self.end_headers()
-
             # parse the key/value pairs from the POST message
-            content_length_str = self.headers["content-length"]
-            content_length = int(content_length_str)
-            line = self.rfile.read(content_length)
-            params = urlparse.parse_qs(line, keep_blank_values=True)
+            params = urlparse.parse_qs(self.request_body,
+                keep_blank_values=True)
 
             # find the card and store the message
             (card_index, card) = self.find_card(params)
@@ -549,16 +6115,21 @@ class MyHttpServer(BaseHTTPServer.HTTPServer):
                 message = "{} found in deck at position {}".format(card,
                     card_index)
 
-            with self.server.deck:
-                self.server.message = message
+            with self.table.deck:
+                self.table.message = message
 
             # send a quick JavaScript trick to redirect back to the main page
-            self.write("<html>")
-            self.write('<body onload=\'document.forms["redirect"].submit()\'>')
-            self.write('<form name="redirect" action="/">')
-            self.write("</form>")
-            self.write("</body>")
-            self.write("</html>")
+            response = ResponseBuilder()
+            response.add_header("Content-Type", "text/html; charset=UTF-8")
+            response.add_header("Cache-Control", "no-cache")
+            response.write("<html>")
+            response.write(
+                '<body onload=\'document.forms["redirect"].submit()\'>')
+            response.write('<form name="redirect" action="./">')
+            response.write("</form>")
+            response.write("</body>")
+            response.write("</html>")
+            self.send_built_response(response)
 
 
 
@@ -566,292 +6137,1137 @@ class MyHttpServer(BaseHTTPServer.HTTPServer):
             """
             Responds to a request to shut down the HTTP server.
             """
-            self.send_ajax_response(message="HTTP server shut down")
+            message = "HTTP server shut down"
+            self.publish_event(self.table.snapshot, "message", message)
+            self.send_ajax_response(message=message)
 
             # must call shutdown in a separate thread to avoid deadlock
             threading.Thread(target=self.server.shutdown).start()
 
 
+        # the maximum number of hands that may be dealt and of cards in each
+        # hand, which are limited by the binary format of the state
+        MAX_HANDS = 255
+        MAX_HAND_SIZE = 255
+
         def do_draw(self):
             """
-            Responds to a request to draw a card.
+            Responds to a request to draw cards: one card, or the number of
+            cards given by the "n" query parameter, or all of the remaining
+            cards if there are fewer.  The cards are drawn together while
+            holding the lock of the deck once, and the last of them is put in
+            the discard pile.  If "n" is given, the drawn cards are included in
+            the response as a single hand.
             """
-            deck = self.server.deck
+            try:
+                num_cards = self.get_int_param("n", None, 1,
+                    self.MAX_HAND_SIZE)
+            except ValueError as e:
+                self.send_error(httplib.BAD_REQUEST, str(e))
+                return
+
+            deck = self.table.deck
             with deck:
-                if len(deck) > 0:
-                    discard = deck.draw()
-                    self.server.discard = discard
-                self.send_ajax_response()
+                cards = deck.draw_many(min(num_cards or 1, len(deck)))
+                if cards:
+                    self.table.discard = cards[-1]
+                    self.publish_state("draw", num_drawn=len(cards))
+            hands = None if num_cards is None else [cards]
+            self.send_ajax_response(hands=hands)
+
+
+        def do_deal(self):
+            """
+            Responds to a request to deal hands of cards, whose number is given
+            by the "players" query parameter (default: 2), with the number of
+            cards given by the "cards" query parameter (default: 5) in each
+            hand, in the pattern given by the "pattern" query parameter, which
+            is one of Deck.DEAL_PATTERNS (default: "round-robin").  The cards
+            are drawn together while holding the lock of the deck once, and the
+            last card dealt is put in the discard pile.  The hands are included
+            in the response.  If there are not enough cards in the deck then
+            no cards are dealt and the response says so.
+            """
+            try:
+                players = self.get_int_param("players", 2, 1, self.MAX_HANDS)
+                cards_each = self.get_int_param("cards", 5, 1,
+                    self.MAX_HAND_SIZE)
+            except ValueError as e:
+                self.send_error(httplib.BAD_REQUEST, str(e))
+                return
+            pattern = self.query.get("pattern", ["round-robin"])[-1]
+            if pattern not in Deck.DEAL_PATTERNS:
+                self.send_error(httplib.BAD_REQUEST,
+                    "Invalid pattern: {}".format(pattern))
+                return
+
+            num_cards = players * cards_each
+            deck = self.table.deck
+            with deck:
+                if num_cards > len(deck):
+                    hands = None
+                    message = ("Not enough cards to deal {} cards to each of "
+                        "{} players".format(cards_each, players))
+                else:
+                    hands = deck.deal(players, cards_each, pattern)
+                    self.table.discard = hands[-1][-1]
+                    message = "Dealt {} cards to each of {} players".format(
+                        cards_each, players)
+                    self.publish_state("deal", message, num_drawn=num_cards)
+            self.send_ajax_response(message, hands=hands)
 
 
         def do_reset(self):
             """
             Responds to a request to reset the deck.
             """
-            deck = self.server.deck
+            deck = self.table.deck
             with deck:
                 deck.reset()
                 deck.shuffle()
-                self.server.discard = None
-                self.send_ajax_response("Deck has been reset and shuffled")
+                self.table.discard = None
+                message = "Deck has been reset and shuffled"
+                self.publish_state("reset", message)
+            self.send_ajax_response(message)
 
 
         def do_shuffle_random(self):
             """
             Responds to a request to do a "random" shuffle.
             """
-            deck = self.server.deck
+            deck = self.table.deck
             with deck:
                 deck.shuffle()
-                self.send_ajax_response("Shuffled using \"random\" algorithm")
+                message = "Shuffled using \"random\" algorithm"
+                self.publish_state("shuffle", message)
+            self.send_ajax_response(message)
 
 
         def do_shuffle_3waycut(self):
             """
             Responds to a request to do a "3-way-cut" shuffle.
             """
-            deck = self.server.deck
+            deck = self.table.deck
             with deck:
                 deck.shuffle_3waycut()
-                self.send_ajax_response("Shuffled using \"3-way-cut\" algorithm")
+                message = "Shuffled using \"3-way-cut\" algorithm"
+                self.publish_state("shuffle", message)
+            self.send_ajax_response(message)
+
+
+        def do_shuffle_riffle(self):
+            """
+            Responds to a request to do a "riffle" shuffle.
+            """
+            deck = self.table.deck
+            with deck:
+                deck.shuffle_riffle()
+                message = "Shuffled using \"Riffle\" algorithm"
+                self.publish_state("shuffle", message)
+            self.send_ajax_response(message)
+
+
+        def do_events(self):
+            """
+            Responds to the "events" request by streaming the changes to the
+            state of the application as server-sent events, starting with a
+            "snapshot" event with the current state.  The data of each event is
+            the state of the application after the change, in the JSON format
+            described by encode_state_json(); the type of the event is the kind
+            of change ("draw", "deal", "reset", "shuffle" or "message"), or
+            "snapshot" if the client fell too far behind and missed some
+            events.  If the server cannot serve another stream then an error
+            is sent instead; see MyHttpServer.start_event_stream().
+            """
+            if not self.server.start_event_stream():
+                # the client gives up on the stream, so the connection is not
+                # kept open, which would occupy a worker thread
+                self.close_connection = 1
+                self.send_error(httplib.SERVICE_UNAVAILABLE,
+                    "No more event streams can be served")
+                return
+
+            try:
+                # subscribe before taking the snapshot so that no change is
+                # missed
+                subscriber = self.table.events.subscribe()
+                self.send_response(httplib.OK)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(self.create_state_event(self.table.snapshot,
+                    "snapshot"))
+                self.stream_events(subscriber)
+            finally:
+                self.server.end_event_stream()
+
+
+        def stream_events(self, subscriber):
+            """
+            Writes the events received by the given EventBroadcaster.Subscriber
+            to the client as they are published, until the client disconnects
+            or the subscriber is closed.
+            """
+            try:
+                self.wfile.flush()
+                while True:
+                    result = subscriber.get(EventBroadcaster.HEARTBEAT_INTERVAL)
+                    if result is None:
+                        break
+                    (events, overflowed) = result
+                    if overflowed:
+                        events = [self.create_state_event(self.table.snapshot,
+                            "snapshot")]
+                    self.wfile.write(b"".join(events) or
+                        EventBroadcaster.HEARTBEAT)
+                    self.wfile.flush()
+            except socket.error:
+                pass
+            finally:
+                self.table.events.unsubscribe(subscriber)
+
+
+        def publish_state(self, event_type, message=None, num_drawn=0):
+            """
+            Publishes a new snapshot of the state of the table, logs the change
+            if the server stores its state, and sends the new state to the
+            clients of the table's "events" request.  This method must be
+            invoked while holding the lock of the deck, right after changing
+            the state, so that the snapshots, log records and events are in
+            the order of the changes.
+            *event_type* must be a string whose value is the type of the event:
+            "draw", "deal", "reset" or "shuffle".
+            *message* must be a string whose value is a message to display on
+            the clients, or None (the default).
+            *num_drawn* must be an integer whose value is the number of cards
+            that were drawn from the top of the deck, the last of which was put
+            in the discard pile, if that was the change; or 0 (the default) if
+            the deck and discard pile were replaced.
+            """
+            table = self.table
+            snapshot = table.publish_snapshot(num_drawn)
+            self.response_snapshot = snapshot
+            oplog = self.server.oplog
+            if oplog is not None:
+                if num_drawn:
+                    self.log_sequence = oplog.append_draw(table, snapshot,
+                        num_drawn)
+                else:
+                    self.log_sequence = oplog.append_state(table, snapshot)
+            self.publish_event(snapshot, event_type, message)
+
+
+        def publish_event(self, snapshot, event_type, message=None):
+            """
+            Sends the state of the table to the clients of its "events" request.
+            *snapshot* must be the StateSnapshot of the state to send.
+            *event_type* and *message* are as in publish_state().
+            """
+            events = self.table.events
+            if events.subscribers:
+                events.publish(self.create_state_event(snapshot, event_type,
+                    message))
+
+
+        def wait_for_log(self):
+            """
+            Waits until the changes made by this request, if any, have been
+            written to the disk by the server's OperationLog, so that the
+            response is only sent for changes that will survive a restart.
+            Returns True if there were no changes or they were written, or
+            False if the OperationLog failed to write them.
+            """
+            sequence = self.log_sequence
+            self.log_sequence = None
+            if sequence is None:
+                return True
+            return self.server.oplog.wait(sequence)
+
+
+        @classmethod
+        def create_state_event(cls, snapshot, event_type, message=None):
+            """
+            Returns the event, formatted by EventBroadcaster.format_event(),
+            whose data is the state of a table.
+            *snapshot* must be the StateSnapshot of the state.
+            *event_type* and *message* are as in publish_state().
+            """
+            data = cls.encode_state_json(snapshot.discard, snapshot.num_cards,
+                message)
+            return EventBroadcaster.format_event(event_type, data)
+
+
+        def do_resource(self, filename):
+            """
+            Responds to a request to serve a file from the "res" directory.
+            *filename* must be a string whose value is the path of the file
+            whose contents to respond with.
+            The file is served from the server's ResourceCache, honoring
+            conditional requests and serving the compressed copy of the file
+            to clients that accept gzip encoding.  Files that are not cached
+            are read from disk and served uncompressed, with an entity tag
+            derived from the size and modification time of the file.
+            """
+            resources = self.server.resources
+            entry = resources.get(filename)
+            if entry is None:
+                entry = resources.load_entry(filename, digest=False)
+                if entry is None:
+                    self.send_error(httplib.NOT_FOUND)
+                    return
+
+            accept_encoding = self.headers.get("Accept-Encoding", "")
+            use_gzip = entry.gzip_data is not None and "gzip" in [
+                token.split(";")[0].strip()
+                for token in accept_encoding.lower().split(",")]
+            if use_gzip:
+                data = entry.gzip_data
+                etag = entry.gzip_etag
+            else:
+                data = entry.data
+                etag = entry.etag
+
+            not_modified = entry.is_not_modified(
+                self.headers.get("If-None-Match"),
+                self.headers.get("If-Modified-Since"), use_gzip)
+
+            response = ResponseBuilder(httplib.NOT_MODIFIED if not_modified
+                else httplib.OK)
+            response.add_header("ETag", etag)
+            response.add_header("Last-Modified", entry.last_modified)
+            response.add_header("Cache-Control", "public, max-age=3600")
+            if entry.gzip_data is not None:
+                response.add_header("Vary", "Accept-Encoding")
+
+            if not not_modified:
+                response.add_header("Content-Type", entry.content_type)
+                if use_gzip:
+                    response.add_header("Content-Encoding", "gzip")
+                response.write_bytes(data)
+
+            self.send_built_response(response)
+
+
+        def find_card(self, params):
+            """
+            Finds a card in the deck and returns its index.
+            *params* must be a dict that was specified to do_send_html().
+            """
+            card = None
+            for key in params:
+                if key.endswith(".x"):
+                    try:
+                        card = Card.from_string(key[:-2])
+                    except ValueError:
+                        pass
+                    else:
+                        break
+
+            if card is None:
+                return (-1, card)
+
+            # Deck.index() finds the card in constant time from its index of
+            # the positions of the cards
+            deck = self.table.deck
+            with deck:
+                try:
+                    index = len(deck) - deck.index(card)
+                except ValueError:
+                    index = -1
+
+            return (index, card)
+
+
+        def get_discard_filename(self, snapshot):
+            """
+            Returns the filename of the card image in the discard pile of the
+            given StateSnapshot.
+            If the server uses sprites, then this is the filename of the
+            sprite sheet if there is a card in the discard pile; see also
+            get_discard_position().
+            """
+            discard = snapshot.discard
+            if discard is None:
+                filename = "res/deck_blank.png"
+            elif self.server.sprites:
+                filename = self.SPRITE_SHEET_FILENAME
+            else:
+                filename = self.get_card_filename(discard)
+            return filename
+
+
+        def get_discard_position(self, snapshot):
+            """
+            Returns the CSS background-position of the image of the card in the
+            discard pile of the given StateSnapshot within the image returned
+            by get_discard_filename(), for use when the server uses sprites.
+            """
+            discard = snapshot.discard
+            if discard is None:
+                return "0px 0px"
+            return self.get_card_sprite_position(discard)
+
+
+        def get_cards_remaining_html(self, snapshot):
+            """
+            Returns a string whose value is valid HTML that specifies how many
+            cards are left in the deck of the given StateSnapshot.
+            """
+            return "Cards Remaining: {}".format(snapshot.num_cards)
+
+
+        def get_deck_filename(self, snapshot):
+            """
+            Returns the filename of the image of the deck of the given
+            StateSnapshot.
+            """
+            if snapshot.empty:
+                return "res/deck_empty.png"
+            return "res/deck.png"
+
+
+        @staticmethod
+        def get_card_filename(card):
+            """
+            Returns the filename of the resource image for the given card.
+            *card* must be a Card object whose image filename to return.
+            Returns a string whose value is the path of the image to embed in
+            the HTML document for the given card.
+            """
+            suit = card.suit
+            if suit == Card.DIAMOND:
+                suit_id = "diamonds"
+            elif suit == Card.HEART:
+                suit_id = "hearts"
+            elif suit == Card.CLUB:
+                suit_id = "clubs"
+            elif suit == Card.SPADE:
+                suit_id = "spades"
+            else:
+                suit_id = "{}".format(suit)
+
+            rank = card.rank
+            if rank == 1:
+                rank_id = "ace"
+            elif rank == 11:
+                rank_id = "jack"
+            elif rank == 12:
+                rank_id = "queen"
+            elif rank == 13:
+                rank_id = "king"
+            else:
+                rank_id = "{}".format(rank)
+
+            filename = "res/card_{}_{}.png".format(suit_id, rank_id)
+            return filename
+
+
+        # the layout of the cards in the sprite sheet, res/cards.png, which is
+        # the image from which res/split_cards_png.py creates the card images
+        SPRITE_SHEET_FILENAME = "res/cards.png"
+        SPRITE_SHEET_WIDTH = 2808
+        SPRITE_SHEET_HEIGHT = 1152
+        SPRITE_WIDTH = 212
+        SPRITE_HEIGHT = 287
+        SPRITE_COLUMN_SPACING = 216
+        SPRITE_ROW_SPACING = 288
+        SPRITE_SUITS = (Card.SPADE, Card.HEART, Card.CLUB, Card.DIAMOND)
+        SPRITE_RANKS = (1, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+
+        @classmethod
+        def get_card_sprite_position(cls, card, width=SPRITE_WIDTH,
+                height=SPRITE_HEIGHT):
+            """
+            Returns the CSS background-position that shows the given card when
+            the sprite sheet is the background image of an element.
+            *card* must be a Card object with one of the standard suits and
+            ranks.
+            *width* and *height* must be integers whose values are the size at
+            which to show the card, in pixels, for which the sprite sheet must
+            be scaled to the size returned by get_sprite_sheet_size() (default:
+            the size of the card in the sprite sheet).
+            """
+            column = cls.SPRITE_RANKS.index(card.rank)
+            row = cls.SPRITE_SUITS.index(card.suit)
+            x = column * cls.SPRITE_COLUMN_SPACING * width / float(
+                cls.SPRITE_WIDTH)
+            y = row * cls.SPRITE_ROW_SPACING * height / float(
+                cls.SPRITE_HEIGHT)
+            # "or 0" turns -0.0 into 0 so that it is not formatted as "-0"
+            return "{:g}px {:g}px".format(-round(x, 1) or 0,
+                -round(y, 1) or 0)
+
+
+        @classmethod
+        def get_sprite_sheet_size(cls, width, height):
+            """
+            Returns the CSS background-size to which to scale the sprite sheet
+            so that each card is shown with the given width and height, in
+            pixels.
+            """
+            sheet_width = cls.SPRITE_SHEET_WIDTH * width / float(
+                cls.SPRITE_WIDTH)
+            sheet_height = cls.SPRITE_SHEET_HEIGHT * height / float(
+                cls.SPRITE_HEIGHT)
+            return "{:g}px {:g}px".format(round(sheet_width, 1),
+                round(sheet_height, 1))
+
+
+        # the version of the JSON and binary formats of the state of the
+        # application; incremented whenever either format changes
+        STATE_VERSION = 2
+
+        # the content types of the formats of the state of the application,
+        # and the formats requested by each media type of the Accept header
+        STATE_CONTENT_TYPES = {
+            "xml": "text/xml; charset=UTF-8",
+            "json": "application/json",
+            "binary": "application/octet-stream",
+        }
+        STATE_MEDIA_TYPES = {
+            "text/xml": "xml",
+            "application/xml": "xml",
+            "application/json": "json",
+            "application/octet-stream": "binary",
+        }
+
+        # the layout of the binary format of the state of the application: the
+        # version, the code of the card in the discard pile (STATE_NO_CARD if
+        # none), the number of cards remaining in the deck, and the index of
+        # the message in STATE_MESSAGES (STATE_OTHER_MESSAGE if not there);
+        # the responses that include hands of cards are followed by a byte
+        # with the number of hands, and for each hand a byte with the number of
+        # cards in it followed by the codes of the cards
+        STATE_STRUCT = struct.Struct(">BBHB")
+        STATE_NO_CARD = 255
+        STATE_OTHER_MESSAGE = 255
+        STATE_MESSAGES = (
+            None,
+            "Deck has been reset and shuffled",
+            "Shuffled using \"random\" algorithm",
+            "Shuffled using \"3-way-cut\" algorithm",
+            "Shuffled using \"Riffle\" algorithm",
+            "HTTP server shut down",
+        )
+        STATE_MESSAGE_IDS = dict((message, index)
+            for (index, message) in enumerate(STATE_MESSAGES))
+
+        @classmethod
+        def choose_state_format(cls, accept):
+            """
+            Returns the format in which to send the state of the application,
+            which is one of the keys of STATE_CONTENT_TYPES.
+            *accept* must be a string whose value is the Accept header of the
+            request; the first media type in it that names a format, and that
+            does not have a quality of 0, determines the format.  The XML
+            format is returned if there is no such media type, for
+            compatibility with clients that predate the other formats.
+            """
+            for media_range in accept.split(","):
+                params = media_range.split(";")
+                state_format = cls.STATE_MEDIA_TYPES.get(
+                    params[0].strip().lower())
+                if state_format is None:
+                    continue
+                quality = 1.0
+                for param in params[1:]:
+                    (name, unused, value) = param.partition("=")
+                    if name.strip().lower() == "q":
+                        try:
+                            quality = float(value)
+                        except ValueError:
+                            pass
+                if quality > 0:
+                    return state_format
+            return "xml"
+
+
+        @classmethod
+        def encode_state_json(cls, discard, num_cards, message, hands=None):
+            """
+            Returns the JSON format of the state of the application, which is
+            an object with the keys "version" (STATE_VERSION), "discard" (the
+            code of the card in the discard pile, or null), "remaining" (the
+            number of cards in the deck) and "message" (a message to display,
+            or null), and "hands" (an array of arrays of the codes of the cards
+            in each hand) if there are hands.
+            *discard* must be the Card in the discard pile, or None.
+            *num_cards* must be an integer whose value is the number of cards
+            remaining in the deck.
+            *message* must be a string whose value is a message to display on
+            the client, or None.
+            *hands* must be a list of lists of the Card objects in the hands
+            dealt by the request, or None (the default) if it dealt none.
+            """
+            state = {
+                "version": cls.STATE_VERSION,
+                "discard": None if discard is None else discard.code,
+                "remaining": num_cards,
+                "message": message,
+            }
+            if hands is not None:
+                state["hands"] = [[card.code for card in hand]
+                    for hand in hands]
+            return json.dumps(state, separators=(",", ":"), sort_keys=True)
+
+
+        @classmethod
+        def encode_state_binary(cls, discard, num_cards, message, hands=None):
+            """
+            Returns the binary format of the state of the application described
+            by STATE_STRUCT.
+            The arguments have the same meaning as for encode_state_json().
+            """
+            if discard is None or discard.code is None:
+                card_code = cls.STATE_NO_CARD
+            else:
+                card_code = discard.code
+            message_id = cls.STATE_MESSAGE_IDS.get(message,
+                cls.STATE_OTHER_MESSAGE)
+            data = cls.STATE_STRUCT.pack(cls.STATE_VERSION, card_code,
+                min(num_cards, 0xFFFF), message_id)
+            if hands is None:
+                return data
+            codes = bytearray([len(hands)])
+            for hand in hands:
+                codes.append(len(hand))
+                codes.extend(CompactDeck.encode(hand))
+            return data + bytes(codes)
+
+
+        def send_ajax_response(self, message=None, hands=None):
+            """
+            Writes the state of the application for XMLHttpRequest responses,
+            including the HTTP response code, HTTP headers, and body, after
+            waiting for the changes made by the request to be stored; an error
+            is sent instead if they could not be stored.
+            The state is written in the format requested by the Accept header
+            of the request; see choose_state_format().
+            *message* must be a string whose value is a message to display on
+            the client; may be None (the default) to not display a message.
+            *hands* must be a list of lists of the Card objects in the hands
+            dealt by the request, or None (the default) if it dealt none.
+            The state sent is the one published by the change made by the
+            request, even if other requests have changed the state since, or
+            the current state if the request made no change.
+            """
+            if not self.wait_for_log():
+                self.send_error(httplib.INTERNAL_SERVER_ERROR,
+                    "The change could not be stored")
+                return
+            state_format = self.choose_state_format(
+                self.headers.get("Accept", ""))
+            response = ResponseBuilder()
+            response.add_header("Content-Type",
+                self.STATE_CONTENT_TYPES[state_format])
+            # the state changes with every action, so it must never be reused
+            response.add_header("Cache-Control", "no-store")
+            response.add_header("Vary", "Accept")
+
+            snapshot = self.response_snapshot
+            if snapshot is None:
+                snapshot = self.table.snapshot
+            if state_format != "xml":
+                if state_format == "json":
+                    response.write(self.encode_state_json(snapshot.discard,
+                        snapshot.num_cards, message, hands), newline=False)
+                else:
+                    response.write_bytes(self.encode_state_binary(
+                        snapshot.discard, snapshot.num_cards, message, hands))
+                self.send_built_response(response)
+                return
+
+            deck_filename = self.get_deck_filename(snapshot)
+            discard_filename = self.get_discard_filename(snapshot)
+            discard_position = self.get_discard_position(snapshot)
+            cards_remaining_html = self.get_cards_remaining_html(snapshot)
+
+            response.write("<state>")
+            response.write("<deck-filename>{0}</deck-filename>"
+                .format(deck_filename))
+            response.write("<discard-filename>{0}</discard-filename>"
+                .format(discard_filename))
+            if self.server.sprites:
+                response.write("<discard-position>{0}</discard-position>"
+                    .format(discard_position))
+            response.write("<cards-remaining>{0}</cards-remaining>"
+                .format(cards_remaining_html))
+            if message is not None:
+                response.write("<message>{}</message>".format(message))
+            if hands is not None:
+                response.write("<hands>")
+                for hand in hands:
+                    response.write("<hand>")
+                    for card in hand:
+                        response.write('<card code="{}">{}</card>'.format(
+                            card.code, card))
+                    response.write("</hand>")
+                response.write("</hands>")
+            response.write("</state>")
+            self.send_built_response(response)
+
+
+        DEFAULT_JAVASCRIPT = ur"""
+            var STATE_VERSION = 2;
+
+            // the actions waiting to be sent to the server; only one request
+            // is sent at a time so that the server performs the actions in the
+            // order in which they were clicked
+            var pendingActions = [];
+            var requestInFlight = false;
+
+            // the number of "draw" actions that were clicked but whose
+            // responses have not yet been received; the page shows the deck as
+            // if they were already done, and serverRemaining, which is the
+            // number of cards remaining according to the latest state received
+            // from the server, is reconciled with it as the responses arrive
+            var pendingDraws = 0;
+
+            function sendRequest(action) {
+                if (action == "draw") {
+                    pendingDraws++;
+                    showRemaining();
+                }
+                pendingActions.push(action);
+                sendNextRequest();
+            }
+
+            function sendNextRequest() {
+                if (requestInFlight || pendingActions.length == 0) {
+                    return;
+                }
+
+                var action = pendingActions.shift();
+                var request = new XMLHttpRequest();
+                requestInFlight = true;
+
+                request.onreadystatechange = function handleOnReadyStateChange() {
+                    if (request.readyState != 4) {
+                        return;
+                    }
+                    requestInFlight = false;
+                    if (action == "draw") {
+                        pendingDraws--;
+                    }
+
+                    var state = null;
+                    if (request.status == 200) {
+                        state = JSON.parse(request.responseText);
+                    }
+                    if (state !== null && state.version == STATE_VERSION) {
+                        showState(state);
+                    } else if (action != "state" && pendingActions.length == 0) {
+                        // the action failed; fetch the state of the server to
+                        // undo any updates that were shown in anticipation
+                        pendingActions.push("state");
+                    }
+                    sendNextRequest();
+                }
+
+                // the server marks the responses as not to be stored, so no
+                // data needs to be sent to defeat client-side caching
+                request.open("POST", action, true);
+                request.setRequestHeader("Accept", "application/json");
+                request.send(null);
+            }
+
+            // show the changes made by other clients as they happen, if the
+            // browser and the server support server-sent events
+            function listenForEvents() {
+                if (typeof EventSource == "undefined") {
+                    return;
+                }
+                var eventSource = new EventSource("events");
+                var eventTypes = ["snapshot", "draw", "deal", "reset", "shuffle", "message"];
+                for (var i=0; i<eventTypes.length; i++) {
+                    eventSource.addEventListener(eventTypes[i], handleEvent);
+                }
+            }
+
+            function handleEvent(event) {
+                // the response to an outstanding request will bring the page up
+                // to date, and may not yet be reflected in the event
+                if (requestInFlight || pendingActions.length > 0) {
+                    return;
+                }
+                var state = JSON.parse(event.data);
+                if (state.version == STATE_VERSION) {
+                    showState(state);
+                }
+            }
+
+            window.addEventListener("load", listenForEvents);
+
+            function showRemaining() {
+                var remaining = Math.max(serverRemaining - pendingDraws, 0);
+                var deckElement = document.getElementById("deck");
+                var deckFilename = (remaining > 0) ? "res/deck.png" : "res/deck_empty.png";
+                deckElement.setAttribute("src", deckFilename);
+                var divElement = document.getElementById("cards_remaining");
+                divElement.innerHTML = "Cards Remaining: " + remaining;
+            }
+
+            function showState(state) {
+                var messageDivElement = document.getElementById("message");
+                if (state.message === null) {
+                    messageDivElement.innerHTML = "&nbsp;";
+                } else {
+                    messageDivElement.textContent = state.message;
+                }
+
+                serverRemaining = state.remaining;
+                showRemaining();
+
+                var discardElement = document.getElementById("discard");
+                if (SPRITE_SHEET_FILENAME === null) {
+                    var discardFilename = (state.discard === null) ? "res/deck_blank.png" : CARD_IMAGES[state.discard];
+                    discardElement.setAttribute("src", discardFilename);
+                } else if (state.discard === null) {
+                    discardElement.style.backgroundImage = "url(res/deck_blank.png)";
+                    discardElement.style.backgroundPosition = "0px 0px";
+                } else {
+                    // sprites: the discard is a region of the background image
+                    discardElement.style.backgroundImage = "url(" + SPRITE_SHEET_FILENAME + ")";
+                    discardElement.style.backgroundPosition = CARD_IMAGES[state.discard];
+                }
+            }
+        """
+
+################################################################################
+
+class AsyncHttpServer(asyncore.dispatcher):
+    """
+    An alternative to MyHttpServer that handles all connections in a single
+    thread, using non-blocking sockets and the asyncore event loop.  Each
+    connection costs a little memory rather than a thread, so the server can
+    hold a very large number of idle kept-alive connections.  The requests
+    themselves are handled by MyHttpServer.MyRequestHandler, so the two servers
+    behave identically.  Because only one thread ever handles requests, the
+    lock of the deck is never contended.  The clients of the "events" request
+    are also served by the event loop, so they cost no threads either.
+    """
+
+
+    # the number of seconds after which idle connections are closed
+    KEEP_ALIVE_TIMEOUT = 15
+
+    # the maximum number of bytes in the request line and headers of a request
+    MAX_REQUEST_HEAD_SIZE = 65536
+
+    def __init__(self, tcp_port,
+            resource_cache_size=ResourceCache.DEFAULT_MAX_SIZE, sprites=False,
+            max_tables=TableRegistry.DEFAULT_MAX_TABLES,
+            table_idle_timeout=TableRegistry.DEFAULT_IDLE_TIMEOUT,
+            state_dir=None, seed=None, secure=False):
+        """
+        Initializes a new instance of this class.
+        *tcp_port* must be an integer whose value is the TCP port to which the
+        HTTP server will bind and to which it will listen for and handle
+        requests.
+        *resource_cache_size*, *sprites*, *max_tables*, *table_idle_timeout*,
+        *state_dir*, *seed* and *secure* are as in MyHttpServer, except that
+        the responses to requests that change the state of a table do not wait
+        for the change to be written to the disk, which would stall the event
+        loop; the changes are instead written within
+        OperationLog.DEFAULT_COMMIT_INTERVAL.
+        """
+        self.tables = TableRegistry(max_tables=max_tables,
+            idle_timeout=table_idle_timeout, seed=seed, secure=secure)
+        self.oplog = None
+        if state_dir is not None:
+            self.oplog = OperationLog(state_dir)
+            self.oplog.load(self.tables)
+        self.keep_alive = True
+        self.sprites = sprites
+        self.main_page = self.AsyncRequestHandler.create_main_page(sprites)
+        self.find_page = self.AsyncRequestHandler.create_find_page(sprites)
+        self.resources = ResourceCache("res", max_size=resource_cache_size)
+        self.event_channels = {}
+        self.RequestHandlerClass = self.AsyncRequestHandler
+        self.socket_map = {}
+        self._shutdown_requested = False
+        self._serving = threading.Event()
+        self._stopped = threading.Event()
+        self._stopped.set()
+
+        asyncore.dispatcher.__init__(self, map=self.socket_map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(("", tcp_port))
+        self.listen(MyHttpServer.request_queue_size)
+        self.server_address = self.socket.getsockname()
+
+
+    def serve_forever(self, poll_interval=0.5):
+        """
+        Handles requests until shutdown() is called.
+        *poll_interval* is the number of seconds between checks for shutdown
+        and for idle connections to close (default: 0.5).
+        """
+        use_poll = hasattr(select, "poll")
+        self._shutdown_requested = False
+        self._stopped.clear()
+        self._serving.set()
+        try:
+            while not self._shutdown_requested:
+                asyncore.loop(timeout=poll_interval, use_poll=use_poll,
+                    map=self.socket_map, count=1)
+                self._send_events()
+                self._close_idle_channels()
+        finally:
+            self._serving.clear()
+            self._stopped.set()
+
+
+    def shutdown(self):
+        """
+        Stops the serve_forever() loop and waits until it has stopped.
+        This method must be called from a thread other than the one running
+        serve_forever(), or it will deadlock.
+        """
+        self._shutdown_requested = True
+        self._stopped.wait()
+
+
+    def server_close(self):
+        """
+        Closes the listening socket, all connections, and the OperationLog, if
+        any.
+        """
+        self.tables.close()
+        for channel in list(self.socket_map.values()):
+            channel.close()
+        if self.oplog is not None:
+            self.oplog.close()
+
+
+    def start_event_stream(self):
+        """
+        Returns True, because the clients of the "events" request are served
+        by the event loop without occupying a thread, so their number is not
+        limited; see MyHttpServer.start_event_stream().
+        """
+        return True
+
+
+    def end_event_stream(self):
+        """
+        Does nothing; see start_event_stream().
+        """
+        pass
+
+
+    def _send_events(self):
+        """
+        Queues the events published since the last invocation to be sent to
+        the connections that are streaming events, or a heartbeat to those
+        that have been idle for EventBroadcaster.HEARTBEAT_INTERVAL seconds.
+        """
+        now = time.time()
+        for (channel, (table, subscriber)) in list(
+                self.event_channels.items()):
+            result = subscriber.get(0)
+            if result is None:
+                channel.close_when_done()
+                continue
+            (events, overflowed) = result
+            if overflowed:
+                events = [self.RequestHandlerClass.create_state_event(
+                    table.snapshot, "snapshot")]
+            elif not events:
+                if now - channel.last_activity < (
+                        EventBroadcaster.HEARTBEAT_INTERVAL):
+                    continue
+                events = [EventBroadcaster.HEARTBEAT]
+            channel.push(b"".join(events))
+            channel.last_activity = now
+
+
+    def _close_idle_channels(self):
+        """
+        Closes the connections that have been idle for longer than
+        KEEP_ALIVE_TIMEOUT seconds.
+        """
+        deadline = time.time() - self.KEEP_ALIVE_TIMEOUT
+        for channel in list(self.socket_map.values()):
+            last_activity = getattr(channel, "last_activity", None)
+            if last_activity is not None and last_activity < deadline:
+                channel.close()
 
 
-        def do_shuffle_riffle(self):
-            """
-            Responds to a request to do a "riffle" shuffle.
-            """
-            deck = self.server.deck
-            with deck:
-                deck.shuffle_riffle()
-                self.send_ajax_response("Shuffled using \"Riffle\" algorithm")
+    def handle_accept(self):
+        """
+        Accepts a new connection.
+        """
+        pair = self.accept()
+        if pair is not None:
+            (sock, client_address) = pair
+            self.AsyncHttpChannel(self, sock, client_address)
 
 
-        def do_resource(self, filename):
+    class AsyncHttpChannel(asynchat.async_chat):
+        """
+        A connection to a client of AsyncHttpServer, which reads requests
+        without blocking and writes the responses without blocking.
+        """
+
+        def __init__(self, server, sock, client_address):
             """
-            Responds to a request to serve a file from the "res" directory.
-            *filename* must be a string whose value is the path of the file
-            whose contents to respond with.
+            Initializes a new instance of this class.
+            *server* must be the AsyncHttpServer that accepted the connection.
+            *sock* must be the socket of the connection.
+            *client_address* must be the address of the client.
             """
-            path = os.path.join("res", filename)
-            try:
-                f = open(path, "rb")
-            except (IOError, OSError):
-                self.send_error(httplib.NOT_FOUND)
-            else:
-                self.send_response(httplib.OK)
-                self.send_header("Content-Type", "application/octet-stream")
-                self.send_header("Cache-Control", "public")
-                self.end_headers()
-                while True:
-                    data = f.read(16384)
-                    if not data:
-                        break
-                    self.wfile.write(data)
+            asynchat.async_chat.__init__(self, sock, map=server.socket_map)
+            self.server = server
+            self.client_address = client_address
+            self.incoming = []
+            self.incoming_size = 0
+            self.request_head = None
+            self.last_activity = time.time()
+            self.set_terminator("\r\n\r\n")
 
 
-        def find_card(self, params):
+        def collect_incoming_data(self, data):
             """
-            Finds a card in the deck and returns its index.
-            *params* must be a dict that was specified to do_send_html().
+            Buffers data received from the client.
             """
-            deck = Deck()
-            card = None
-            for cur_card in deck:
-                key = "{}.x".format(cur_card)
-                if key in params:
-                    card = cur_card
-                    break
-
-            deck = self.server.deck
-            with deck:
-                if not card:
-                    index = -1
-                else:
-                    try:
-                        index = deck.index(card)
-                        index = len(deck) - index
-                    except ValueError:
-                        index = -1
-
-            return (index, card)
+            self.last_activity = time.time()
+            self.incoming.append(data)
+            self.incoming_size += len(data)
+            if (self.request_head is None and
+                    self.incoming_size > self.server.MAX_REQUEST_HEAD_SIZE):
+                self.close()
 
 
-        def get_discard_filename(self):
+        def found_terminator(self):
             """
-            Returns the filename of the card image in the discard pile.
+            Invoked when the end of the headers of a request, or the end of
+            the body of a request, has been received.
             """
-            with self.server.deck:
-                discard = self.server.discard
-            if discard is None:
-                filename = "res/deck_blank.png"
+            data = "".join(self.incoming)
+            self.incoming = []
+            self.incoming_size = 0
+
+            if self.request_head is None:
+                head = data + "\r\n\r\n"
+                content_length = self._parse_content_length(head)
+                if content_length > 0:
+                    # wait for the body before handling the request
+                    self.request_head = head
+                    self.set_terminator(content_length)
+                    return
+                request = head
             else:
-                filename = self.get_card_filename(discard)
-            return filename
+                request = self.request_head + data
+                self.request_head = None
+                self.set_terminator("\r\n\r\n")
 
+            self.handle_request(request)
 
-        def get_cards_remaining_html(self):
+
+        def handle_request(self, request):
             """
-            Returns a string whose value is valid HTML that specifies how many
-            cards are left in the deck.
+            Handles a request and queues the response to be sent.
+            *request* must be a string whose value is the complete request,
+            including the request line, headers and body.
             """
-            with self.server.deck:
-                num_cards = len(self.server.deck)
-            return "Cards Remaining: {}".format(num_cards)
-
-
-        def get_deck_filename(self):
+            handler = self.server.RequestHandlerClass(request,
+                self.client_address, self.server)
+            self.push(handler.wfile.getvalue())
+            if handler.event_subscriber is not None:
+                # the connection now streams events; see _send_events()
+                self.server.event_channels[self] = (handler.table,
+                    handler.event_subscriber)
+            elif handler.close_connection:
+                self.close_when_done()
+
+
+        def close(self):
             """
-            Returns the filename of the deck image.
+            Closes the connection, ending its stream of events, if any.
             """
-            with self.server.deck:
-                deck_len = len(self.server.deck)
-            filename = "res/deck.png" if deck_len else "res/deck_empty.png"
-            return filename
+            item = self.server.event_channels.pop(self, None)
+            if item is not None:
+                (table, subscriber) = item
+                table.events.unsubscribe(subscriber)
+            asynchat.async_chat.close(self)
 
 
         @staticmethod
-        def get_card_filename(card):
+        def _parse_content_length(head):
             """
-            Returns the filename of the resource image for the given card.
-            *card* must be a Card object whose image filename to return.
-            Returns a string whose value is the path of the image to embed in
-            the HTML document for the given card.
+            Returns the value of the Content-Length header in the given request
+            head, or 0 if it is missing or invalid.
             """
-            suit = card.suit
-            if suit == Card.DIAMOND:
-                suit_id = "diamonds"
-            elif suit == Card.HEART:
-                suit_id = "hearts"
-            elif suit == Card.CLUB:
-                suit_id = "clubs"
-            elif suit == Card.SPADE:
-                suit_id = "spades"
-            else:
-                suit_id = "{}".format(suit)
-
-            rank = card.rank
-            if rank == 1:
-                rank_id = "ace"
-            elif rank == 11:
-                rank_id = "jack"
-            elif rank == 12:
-                rank_id = "queen"
-            elif rank == 13:
-                rank_id = "king"
-            else:
-                rank_id = "{}".format(rank)
+            for line in head.split("\r\n")[1:]:
+                (name, sep, value) = line.partition(":")
+                if sep and name.strip().lower() == "content-length":
+                    try:
+                        return max(int(value.strip()), 0)
+                    except ValueError:
+                        return 0
+            return 0
 
-            filename = "res/card_{}_{}.png".format(suit_id, rank_id)
-            return filename
 
+    class AsyncRequestHandler(MyHttpServer.MyRequestHandler):
+        """
+        The request handler used by AsyncHttpServer, which handles one
+        complete request that has already been read from the connection and
+        buffers the response in memory instead of writing it to the socket.
+        """
 
-        def send_ajax_response(self, message=None):
+        def setup(self):
             """
-            Writes the state of the application for XMLHttpRequest responses,
-            including the HTTP response code, HTTP headers, and body.
-            *message* must be a string whose value is a message to display on
-            the client; may be None (the default) to not display a message.
+            Reads the request from self.request, which is a string, instead of
+            from a socket, and buffers the response in memory.
             """
-            self.send_response(httplib.OK)
-            self.send_header("Content-Type", "text/xml; charset=UTF-8")
-            self.send_header("Cache-Control", "no-cache")
-            self.end_headers()
+            self.connection = None
+            self.rfile = StringIO.StringIO(self.request)
+            self.wfile = StringIO.StringIO()
+            self.protocol_version = "HTTP/1.1"
+            self.content_length_sent = False
+            self.event_subscriber = None
 
-            with self.server.deck:
-                deck_filename = self.get_deck_filename()
-                discard_filename = self.get_discard_filename()
-                cards_remaining_html = self.get_cards_remaining_html()
 
-            self.write("<state>")
-            self.write("<deck-filename>{0}</deck-filename>"
-                .format(deck_filename))
-            self.write("<discard-filename>{0}</discard-filename>"
-                .format(discard_filename))
-            self.write("<cards-remaining>{0}</cards-remaining>"
-                .format(cards_remaining_html))
-            if message is not None:
-                self.write("<message>{}</message>".format(message))
-            self.write("</state>")
+        def handle(self):
+            """
+            Handles the one request that was read from the connection.
+            """
+            self.handle_one_request()
 
 
-        def write(self, s, newline=True):
+        def wait_for_log(self):
             """
-            Writes a string to self.wfile, encoding it in UTF-8 first.
-            *s* must be a string whose UTF-8 encoding to write to the output
-            file.
-            *newline* is evaluated as a boolean; if it evaluates to True
-            (the default) then a \n character is written after the given string;
-            if False, then no newline character is printed.
+            Returns True without waiting, because waiting for the disk would
+            stall the event loop; see AsyncHttpServer.__init__().
             """
-            s_encoded = s.encode("UTF-8")
-            self.wfile.write(s_encoded)
-            if newline:
-                self.wfile.write("\n".encode("UTF-8"))
+            return True
 
 
-        def write_escaped(self, s, newline=True):
+        def stream_events(self, subscriber):
             """
-            Writes a string to self.wfile, first escaping any special HTML
-            characters.  After escaping HTMl characters, this method invokes
-            self.write() with the resulting string and the given newline.
+            Leaves the given subscriber in self.event_subscriber for the
+            AsyncHttpChannel, which streams its events from the event loop
+            instead of blocking it.
             """
-            s = s.replace("&", "&amp;")
-            s = s.replace("'", "&apos;")
-            s = s.replace('"', "&quot;")
-            s = s.replace("<", "&lt;")
-            s = s.replace(">", "&gt;")
-            self.write(s, newline=newline)
+            self.event_subscriber = subscriber
 
 
-        DEFAULT_JAVASCRIPT = ur"""
-            function sendRequest(action) {
-                var request = new XMLHttpRequest();
+        def finish(self):
+            """
+            Does nothing, leaving the buffered response in self.wfile for the
+            AsyncHttpChannel to send.
+            """
+            pass
 
-                request.onreadystatechange = function handleOnReadyStateChange() {
-                    if (request.readyState == 4) {
-                        var doc = request.responseXML;
-
-                        var messageDivElement = document.getElementById("message");
-                        messageDivElement.innerHTML = "&nbsp;";
-                        var messageElements = doc.getElementsByTagName("message");
-                        for (var i=0; i<messageElements.length; i++) {
-                            var messageElement = messageElements[i];
-                            var message = messageElement.childNodes[0].nodeValue
-                            messageDivElement.innerHTML = message;
-                        }
-
-                        var deckFilenameElements = doc.getElementsByTagName("deck-filename");
-                        if (deckFilenameElements.length > 0) {
-                            var deckFilenameElement = deckFilenameElements[0];
-                            var deckFilename = deckFilenameElement.childNodes[0].nodeValue;
-                            var deckElement = document.getElementById("deck");
-                            deckElement.setAttribute("src", deckFilename);
-                        }
-
-                        var discardFilenameElements = doc.getElementsByTagName("discard-filename");
-                        if (discardFilenameElements.length > 0) {
-                            var discardFilenameElement = discardFilenameElements[0];
-                            var discardFilename = discardFilenameElement.childNodes[0].nodeValue;
-                            var discardElement = document.getElementById("discard");
-                            discardElement.setAttribute("src", discardFilename);
-                        }
-
-                        var cardsRemainingElements = doc.getElementsByTagName("cards-remaining");
-                        if (cardsRemainingElements.length > 0) {
-                            var cardsRemainingElement = cardsRemainingElements[0];
-                            var cardsRemainingTxt = cardsRemainingElement.childNodes[0].nodeValue;
-                            var divElement = document.getElementById("cards_remaining");
-                            divElement.innerHTML = cardsRemainingTxt
-                        }
-                    }
-                }
 
-                // to prevent client-side caching (such as in Internet Explorer)
-                // use POST instead of GET and send some ever-changing data
-                request.open("POST", action, false);
-                request.send("cache-killer=" + new Date());
-            }
-        """
+        def address_string(self):
+            """
+            Returns the IP address of the client, for logging; the superclass
+            looks up the host name, which would block the event loop.
+            """
+            return self.client_address[0]
 
 ################################################################################
 
@@ -860,7 +7276,9 @@ class MyArgumentParser(argparse.ArgumentParser):
     The command-line argument parser for the cards application.
     """
 
-    USAGE = "%(prog)s [options]"
+    USAGE = ("%(prog)s [options]\n"
+        "       %(prog)s simulate [options] hand [hand ...]\n"
+        "       %(prog)s analyze [options]")
 
     def __init__(self, prog):
         """
@@ -884,17 +7302,112 @@ class MyArgumentParser(argparse.ArgumentParser):
             (default: %(default)i)"""
         )
 
+        self.add_argument("-w", "--workers",
+            type=int,
+            default=0,
+            help="""The number of threads with which to handle HTTP requests
+            concurrently; if 0, requests are handled one at a time.
+            (default: %(default)i)"""
+        )
+
+        self.add_argument("--keep-alive",
+            action="store_true",
+            default=False,
+            help="""Use HTTP/1.1 and keep connections open between requests;
+            most useful together with --workers."""
+        )
+
+        self.add_argument("--resource-cache-size",
+            type=int,
+            default=ResourceCache.DEFAULT_MAX_SIZE,
+            help="""The maximum number of bytes of the files in the "res"
+            directory to cache in memory; files that do not fit are read from
+            disk when requested. (default: %(default)i)"""
+        )
+
+        self.add_argument("--sprites",
+            action="store_true",
+            default=False,
+            help="""Show the cards in the web pages as regions of the single
+            image res/cards.png instead of as separate images, reducing the
+            number of images that browsers need to download."""
+        )
+
+        self.add_argument("--async",
+            dest="asynchronous",
+            action="store_true",
+            default=False,
+            help="""Handle all connections in a single thread using
+            non-blocking sockets, instead of a thread per connection; HTTP/1.1
+            keep-alive is always used.  Cannot be combined with --workers."""
+        )
+
+        self.add_argument("--max-tables",
+            type=int,
+            default=TableRegistry.DEFAULT_MAX_TABLES,
+            help="""The maximum number of tables, each with its own deck at
+            the URLs starting with /t/<table_id>/, to keep in memory; the
+            least-recently used tables are discarded to make room for new
+            ones. (default: %(default)i)"""
+        )
+
+        self.add_argument("--table-idle-timeout",
+            type=float,
+            default=TableRegistry.DEFAULT_IDLE_TIMEOUT,
+            help="""The number of seconds after which an unused table is
+            discarded. (default: %(default)g)"""
+        )
+
+        self.add_argument("--state-dir",
+            default=None,
+            help="""The directory in which to store the state of the tables,
+            which is restored from it when the HTTP server starts; if not
+            specified, the state is lost when the HTTP server stops."""
+        )
+
+        self.add_argument("--seed",
+            type=int,
+            default=None,
+            help="""The seed from which to derive the random number generator
+            of each table, so that the same sequence of requests to a table
+            always shuffles its deck the same way; if not specified, the
+            shuffles are unpredictable."""
+        )
+
+        self.add_argument("--secure",
+            action="store_true",
+            default=False,
+            help="""Shuffle the decks with the cryptographically secure random
+            number generator of the operating system.  Cannot be combined with
+            --seed."""
+        )
+
 
     def parse_args(self, args):
         """
         Parses the given arguments.
         *args* must be an iterable of strings, the arguments to parse.
-        Returns a newly-created CardsApplication object if parsing is
-        successful.  Otherwise, raises self.Error if parsing fails.
+        Returns a newly-created CardsApplication object, or the application
+        of a command such as SimulationApplication if the first argument is
+        the name of the command, if parsing is successful.  Otherwise, raises
+        self.Error if parsing fails.
         """
         args = tuple(args) # create a local copy for safety
+        for parser_class in (SimulationArgumentParser, AnalysisArgumentParser):
+            if args and args[0] == parser_class.COMMAND:
+                return parser_class(self.prog).parse_args(args[1:])
         namespace = self.MyNamespace()
         argparse.ArgumentParser.parse_args(self, args=args, namespace=namespace)
+        if namespace.workers < 0:
+            self.error("invalid number of workers: {}"
+                .format(namespace.workers))
+        if namespace.asynchronous and namespace.workers:
+            self.error("--async cannot be combined with --workers")
+        if namespace.secure and namespace.seed is not None:
+            self.error("--secure cannot be combined with --seed")
+        if namespace.max_tables < 1:
+            self.error("invalid maximum number of tables: {}"
+                .format(namespace.max_tables))
         app = namespace.create_application()
         return app
 
@@ -934,7 +7447,17 @@ class MyArgumentParser(argparse.ArgumentParser):
             in parse_args().
             """
             http_server_port = self.port
-            return CardsApplication(http_server_port)
+            return CardsApplication(http_server_port,
+                num_workers=self.workers,
+                keep_alive=self.keep_alive,
+                asynchronous=self.asynchronous,
+                resource_cache_size=self.resource_cache_size,
+                sprites=self.sprites,
+                max_tables=self.max_tables,
+                table_idle_timeout=self.table_idle_timeout,
+                state_dir=self.state_dir,
+                seed=self.seed,
+                secure=self.secure)
 
 
     class Error(Exception):
@@ -955,6 +7478,288 @@ class MyArgumentParser(argparse.ArgumentParser):
 
 ################################################################################
 
+class SimulationArgumentParser(MyArgumentParser):
+    """
+    The command-line argument parser for the "simulate" command of the cards
+    application, whose arguments follow the name of the command.
+    """
+
+    COMMAND = "simulate"
+    USAGE = "%(prog)s simulate [options] hand [hand ...]"
+
+    def _add_arguments(self):
+        """
+        Adds the arguments to this ArgumentParser.
+        This method is called by __init__() and is not normally called from
+        any other context.
+        """
+
+        self.add_argument("hands",
+            nargs="*",
+            type=parse_cards,
+            metavar="hand",
+            help="""The hole cards of a player, such as AsKs for the ace and
+            king of spades; the ranks are A, 2 to 9, T (or 10), J, Q and K and
+            the suits are c, d, h and s."""
+        )
+
+        self.add_argument("-b", "--board",
+            type=parse_cards,
+            default=[],
+            help="""The community cards already dealt, such as Ah7c2d."""
+        )
+
+        self.add_argument("-o", "--opponents",
+            type=int,
+            default=0,
+            help="""The number of additional players whose hole cards are dealt
+            at random. (default: %(default)i)"""
+        )
+
+        self.add_argument("-n", "--trials",
+            type=int,
+            default=EquitySimulator.DEFAULT_MAX_TRIALS,
+            help="""The maximum number of deals to simulate.
+            (default: %(default)i)"""
+        )
+
+        self.add_argument("--min-trials",
+            type=int,
+            default=EquitySimulator.DEFAULT_MIN_TRIALS,
+            help="""The number of deals to simulate before stopping early.
+            (default: %(default)i)"""
+        )
+
+        self.add_argument("--precision",
+            type=float,
+            default=EquitySimulator.DEFAULT_PRECISION,
+            help="""Stop early once the 95%% confidence interval of the equity
+            of every player is within this distance of the estimate; 0 to
+            never stop early. (default: %(default)g)"""
+        )
+
+        self.add_argument("-j", "--processes",
+            type=int,
+            default=None,
+            help="""The number of processes in which to simulate the deals.
+            (default: the number of CPUs)"""
+        )
+
+        self.add_argument("--chunk-size",
+            type=int,
+            default=None,
+            help="""The number of deals that a process simulates at a time.
+            (default: {} when sampling, {} when enumerating)""".format(
+                EquitySimulator.DEFAULT_CHUNK_SIZE,
+                EquitySimulator.DEFAULT_ENUMERATION_CHUNK_SIZE)
+        )
+
+        mode_group = self.add_mutually_exclusive_group()
+
+        mode_group.add_argument("--exhaustive",
+            dest="exhaustive",
+            action="store_const",
+            const=True,
+            default=None,
+            help="""Enumerate every possible deal of the rest of the board,
+            giving exact probabilities; the hole cards of all of the players
+            must be given.  By default, the deals are enumerated if they can be
+            and there are at most --trials of them, and sampled otherwise."""
+        )
+
+        mode_group.add_argument("--sample",
+            dest="exhaustive",
+            action="store_const",
+            const=False,
+            help="""Always sample the deals at random, even if they could be
+            enumerated."""
+        )
+
+        self.add_argument("--progress",
+            action="store_true",
+            default=False,
+            help="""Print the progress of the simulation to standard error."""
+        )
+
+        self.add_argument("--seed",
+            type=int,
+            default=None,
+            help="""The seed of the random number generators, so that a
+            simulation that does not stop early is reproducible; if not
+            specified, one is chosen at random and printed."""
+        )
+
+
+    def parse_args(self, args):
+        """
+        Parses the given arguments, which follow the name of the command.
+        *args* must be an iterable of strings, the arguments to parse.
+        Returns a newly-created SimulationApplication object if parsing is
+        successful.  Otherwise, raises self.Error if parsing fails.
+        """
+        args = tuple(args) # create a local copy for safety
+        namespace = self.MyNamespace()
+        argparse.ArgumentParser.parse_args(self, args=args, namespace=namespace)
+        for hand in namespace.hands:
+            if len(hand) != EquitySimulator.NUM_HOLE_CARDS:
+                self.error("a hand must have {} cards: {}".format(
+                    EquitySimulator.NUM_HOLE_CARDS, format_cards(hand)))
+        if namespace.opponents < 0:
+            self.error("invalid number of opponents: {}"
+                .format(namespace.opponents))
+        if len(namespace.hands) + namespace.opponents < 2:
+            self.error("at least 2 players are required; specify more hands "
+                "or --opponents")
+        if namespace.trials < 1:
+            self.error("invalid number of trials: {}".format(namespace.trials))
+        if namespace.processes is not None and namespace.processes < 1:
+            self.error("invalid number of processes: {}"
+                .format(namespace.processes))
+        if namespace.chunk_size is not None and namespace.chunk_size < 1:
+            self.error("invalid chunk size: {}".format(namespace.chunk_size))
+        if namespace.exhaustive and namespace.opponents:
+            self.error("--exhaustive cannot be combined with --opponents")
+        app = namespace.create_application()
+        return app
+
+
+    class MyNamespace(argparse.Namespace):
+        """
+        The namespace used by parse_args() when parsing args.
+        """
+
+        def create_application(self):
+            """
+            Creates and returns a new instance of SimulationApplication based
+            on this object's attributes.
+            This method is intended to be called after parsing the arguments
+            in parse_args().
+            """
+            return SimulationApplication(self.hands,
+                board=self.board,
+                opponents=self.opponents,
+                max_trials=self.trials,
+                min_trials=self.min_trials,
+                precision=self.precision,
+                processes=self.processes,
+                chunk_size=self.chunk_size,
+                seed=self.seed,
+                exhaustive=self.exhaustive,
+                progress=self.progress)
+
+################################################################################
+
+class AnalysisArgumentParser(MyArgumentParser):
+    """
+    The command-line argument parser for the "analyze" command of the cards
+    application, whose arguments follow the name of the command.
+    """
+
+    COMMAND = "analyze"
+    USAGE = "%(prog)s analyze [options]"
+
+    def _add_arguments(self):
+        """
+        Adds the arguments to this ArgumentParser.
+        This method is called by __init__() and is not normally called from
+        any other context.
+        """
+
+        self.add_argument("-m", "--method",
+            dest="methods",
+            action="append",
+            choices=SHUFFLE_METHODS,
+            default=None,
+            help="""A shuffle method to analyze; may be specified more than
+            once. (default: all of them)"""
+        )
+
+        self.add_argument("-n", "--decks",
+            type=int,
+            default=AnalysisApplication.DEFAULT_NUM_DECKS,
+            help="""The number of decks to shuffle with each method.
+            (default: %(default)i)"""
+        )
+
+        self.add_argument("-t", "--times",
+            type=int,
+            default=AnalysisApplication.DEFAULT_TIMES,
+            help="""The number of times to shuffle each deck, reporting the
+            statistics after each shuffle. (default: %(default)i)"""
+        )
+
+        self.add_argument("--cards",
+            type=int,
+            default=52,
+            help="""The number of cards in each deck. (default: %(default)i)"""
+        )
+
+        self.add_argument("--seed",
+            type=int,
+            default=None,
+            help="""The seed of the random number generator, so that the
+            analysis is reproducible."""
+        )
+
+        self.add_argument("--matrix-file",
+            default=None,
+            help="""A CSV file to which to write the probability of each card
+            ending at each position, for each method and number of shuffles."""
+        )
+
+        self.add_argument("--progress",
+            action="store_true",
+            default=False,
+            help="""Print the progress of the analysis to standard error."""
+        )
+
+
+    def parse_args(self, args):
+        """
+        Parses the given arguments, which follow the name of the command.
+        *args* must be an iterable of strings, the arguments to parse.
+        Returns a newly-created AnalysisApplication object if parsing is
+        successful.  Otherwise, raises self.Error if parsing fails.
+        """
+        args = tuple(args) # create a local copy for safety
+        namespace = self.MyNamespace()
+        argparse.ArgumentParser.parse_args(self, args=args, namespace=namespace)
+        if namespace.decks < 1:
+            self.error("invalid number of decks: {}".format(namespace.decks))
+        if namespace.times < 1:
+            self.error("invalid number of times: {}".format(namespace.times))
+        if namespace.cards < 1:
+            self.error("invalid number of cards: {}".format(namespace.cards))
+        if namespace.cards < 3 and "3waycut" in (namespace.methods or
+                SHUFFLE_METHODS):
+            self.error("a 3-way cut needs at least 3 cards")
+        app = namespace.create_application()
+        return app
+
+
+    class MyNamespace(argparse.Namespace):
+        """
+        The namespace used by parse_args() when parsing args.
+        """
+
+        def create_application(self):
+            """
+            Creates and returns a new instance of AnalysisApplication based on
+            this object's attributes.
+            This method is intended to be called after parsing the arguments
+            in parse_args().
+            """
+            return AnalysisApplication(
+                methods=self.methods,
+                num_decks=self.decks,
+                times=self.times,
+                num_cards=self.cards,
+                seed=self.seed,
+                matrix_path=self.matrix_file,
+                progress=self.progress)
+
+################################################################################
+
 if __name__ == "__main__":
     try:
         retval = main()
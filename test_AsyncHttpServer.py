@@ -0,0 +1,60 @@
+import httplib
+import json
+import threading
+import unittest
+
+from cards import AsyncHttpServer
+
+################################################################################
+
+class QuietAsyncHttpServer(AsyncHttpServer):
+    """
+    An AsyncHttpServer whose request handler does not log the requests.
+    """
+
+    class AsyncRequestHandler(AsyncHttpServer.AsyncRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+################################################################################
+
+class Test_round_trip(unittest.TestCase):
+    """
+    Tests of requests sent to a running AsyncHttpServer
+    """
+
+    def setUp(self):
+        self.server = QuietAsyncHttpServer(0)
+        thread = threading.Thread(target=self.server.serve_forever,
+            kwargs={"poll_interval": 0.05})
+        thread.daemon = True
+        thread.start()
+        self.connection = httplib.HTTPConnection("localhost",
+            self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request_state(self, method, path, body=None):
+        """
+        Sends a request for the JSON state and returns a tuple (response,
+        state).
+        """
+        self.connection.request(method, path, body,
+            {"Accept": "application/json"})
+        response = self.connection.getresponse()
+        return (response, json.loads(response.read()))
+
+    def test_keep_alive(self):
+        (response, state) = self.request_state("POST", "/draw",
+            "cache-killer=1")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertFalse(response.will_close)
+        self.assertEqual(state["remaining"], 51)
+
+        (response, state) = self.request_state("GET", "/state")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(state["remaining"], 51)
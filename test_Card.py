@@ -1,4 +1,5 @@
 import copy
+import pickle
 import unittest
 
 from cards import Card
@@ -61,6 +62,179 @@ class Test__init__(unittest.TestCase):
         self.assertIs(x.suit, suit)
         self.assertIs(x.rank, rank)
 
+    def test_interned(self):
+        for suit in (Card.SPADE, Card.HEART, Card.CLUB, Card.DIAMOND):
+            for rank in range(1, 14):
+                x1 = Card(suit, rank)
+                x2 = Card(suit, rank)
+                self.assertIs(x1, x2)
+                self.assertEqual(x1.suit, suit)
+                self.assertEqual(x1.rank, rank)
+
+    def test_not_interned(self):
+        x1 = Card("a", "b")
+        x2 = Card("a", "b")
+        self.assertIsNot(x1, x2)
+        self.assertIsNone(x1.code)
+
+    def test_unhashable(self):
+        x = Card([], 1)
+        self.assertEqual(x.suit, [])
+        self.assertIsNone(x.code)
+
+################################################################################
+
+class Test_immutable(unittest.TestCase):
+    """
+    Unit tests for Card.__setattr__() and Card.__delattr__()
+    """
+
+    def test_set_suit(self):
+        x = Card(Card.SPADE, 1)
+        with self.assertRaises(AttributeError):
+            x.suit = Card.HEART
+        self.assertEqual(x.suit, Card.SPADE)
+
+    def test_set_rank(self):
+        x = Card(Card.SPADE, 1)
+        with self.assertRaises(AttributeError):
+            x.rank = 2
+        self.assertEqual(x.rank, 1)
+
+    def test_set_new_attribute(self):
+        x = Card("a", "b")
+        with self.assertRaises(AttributeError):
+            x.foo = 1
+
+    def test_del_suit(self):
+        x = Card("a", "b")
+        with self.assertRaises(AttributeError):
+            del x.suit
+        self.assertEqual(x.suit, "a")
+
+################################################################################
+
+class Test_code(unittest.TestCase):
+    """
+    Unit tests for Card.code and Card.from_code()
+    """
+
+    def test_unique_and_in_range(self):
+        codes = set()
+        for suit in (Card.SPADE, Card.HEART, Card.CLUB, Card.DIAMOND):
+            for rank in range(1, 14):
+                code = Card(suit, rank).code
+                self.assertGreaterEqual(code, 0)
+                self.assertLess(code, Card.NUM_CODES)
+                codes.add(code)
+        self.assertEqual(len(codes), 52)
+
+    def test_values(self):
+        self.assertEqual(Card(Card.CLUB, 1).code, 0)
+        self.assertEqual(Card(Card.CLUB, 13).code, 12)
+        self.assertEqual(Card(Card.DIAMOND, 1).code, 13)
+        self.assertEqual(Card(Card.SPADE, 13).code, 51)
+
+    def test_from_code(self):
+        for code in range(Card.NUM_CODES):
+            x = Card.from_code(code)
+            self.assertEqual(x.code, code)
+            self.assertIs(x, Card(x.suit, x.rank))
+
+    def test_from_code_out_of_range(self):
+        with self.assertRaises(IndexError):
+            Card.from_code(52)
+        with self.assertRaises(IndexError):
+            Card.from_code(-1)
+
+################################################################################
+
+class Test_from_string(unittest.TestCase):
+    """
+    Unit tests for Card.from_string()
+    """
+
+    def test_all_cards(self):
+        for code in range(Card.NUM_CODES):
+            x = Card.from_code(code)
+            self.assertIs(Card.from_string(str(x)), x)
+
+    def test_ace_of_spades(self):
+        x = Card.from_string("ace of spades")
+        self.assertIs(x, Card(Card.SPADE, 1))
+
+    def test_invalid(self):
+        for s in ("", "ace of", "b of a", "1 of spades", None):
+            with self.assertRaises(ValueError):
+                Card.from_string(s)
+
+################################################################################
+
+class Test__hash__(unittest.TestCase):
+    """
+    Unit tests for Card.__hash__()
+    """
+
+    def test_interned(self):
+        x = Card(Card.HEART, 5)
+        self.assertEqual(hash(x), x.code)
+
+    def test_not_interned_equal(self):
+        x1 = Card("a", "b")
+        x2 = Card("a", "b")
+        self.assertEqual(hash(x1), hash(x2))
+
+    def test_set(self):
+        x = set([Card("a", "b"), Card("a", "b"), Card(Card.CLUB, 1)])
+        self.assertEqual(len(x), 2)
+
+################################################################################
+
+class Test_ordering(unittest.TestCase):
+    """
+    Unit tests for Card.__lt__(), __le__(), __gt__() and __ge__()
+    """
+
+    def test_by_code(self):
+        x1 = Card.from_code(3)
+        x2 = Card.from_code(40)
+        self.assertTrue(x1 < x2)
+        self.assertTrue(x1 <= x2)
+        self.assertFalse(x1 > x2)
+        self.assertFalse(x1 >= x2)
+        self.assertTrue(x1 <= x1)
+        self.assertTrue(x1 >= x1)
+
+    def test_sorted(self):
+        cards = [Card.from_code(code) for code in (51, 0, 27, 13)]
+        actual = [card.code for card in sorted(cards)]
+        self.assertListEqual(actual, [0, 13, 27, 51])
+
+################################################################################
+
+class Test_copy(unittest.TestCase):
+    """
+    Unit tests for copying and pickling Card objects.
+    """
+
+    def test_copy(self):
+        x = Card(Card.CLUB, 7)
+        self.assertIs(copy.copy(x), x)
+
+    def test_deepcopy(self):
+        x = Card("a", "b")
+        self.assertIs(copy.deepcopy(x), x)
+
+    def test_pickle_interned(self):
+        x = Card(Card.CLUB, 7)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertIs(pickle.loads(pickle.dumps(x, protocol)), x)
+
+    def test_pickle_not_interned(self):
+        x = Card("a", "b")
+        actual = pickle.loads(pickle.dumps(x))
+        self.assertEqual(actual, x)
+
 ################################################################################
 
 class Test__eq__(unittest.TestCase):
@@ -95,22 +269,35 @@ class Test__eq__(unittest.TestCase):
 
     def test_missing_suit(self):
         x1 = Card("a", "b")
-        x2 = Card("a", "b")
-        del x2.suit
+        x2 = SuitAndRank(rank="b")
         self.assertFalse(x1 == x2)
 
     def test_missing_rank(self):
         x1 = Card("a", "b")
-        x2 = Card("a", "b")
-        del x2.rank
+        x2 = SuitAndRank(suit="a")
         self.assertFalse(x1 == x2)
 
     def test_missing_suit_and_rank(self):
         x1 = Card("a", "b")
-        x2 = Card("a", "b")
-        del x2.suit
-        del x2.rank
+        x2 = SuitAndRank()
+        self.assertFalse(x1 == x2)
+
+    def test_duck_typed(self):
+        x1 = Card("a", "b")
+        x2 = SuitAndRank(suit="a", rank="b")
+        self.assertTrue(x1 == x2)
+
+    def test_interned(self):
+        x1 = Card(Card.SPADE, 1)
+        x2 = Card(Card.SPADE, 1)
+        self.assertTrue(x1 == x2)
+        self.assertFalse(x1 != x2)
+
+    def test_different_interned(self):
+        x1 = Card(Card.SPADE, 1)
+        x2 = Card(Card.HEART, 1)
         self.assertFalse(x1 == x2)
+        self.assertTrue(x1 != x2)
 
     def test_None(self):
         x = Card("a", "b")
@@ -253,3 +440,15 @@ class Test__repr__(unittest.TestCase):
             actual = repr(x)
             expected = "Card('club', {})".format(rank)
             self.assertEqual(actual, expected)
+
+################################################################################
+
+class SuitAndRank(object):
+    """
+    An object that optionally has "suit" and "rank" attributes, for testing
+    Card.__eq__() with objects other than Card.
+    """
+
+    def __init__(self, **kwargs):
+        for (name, value) in kwargs.items():
+            setattr(self, name, value)
@@ -0,0 +1,278 @@
+import pickle
+import sys
+import threading
+import unittest
+
+from cards import Card
+from cards import CompactDeck
+from cards import Deck
+
+################################################################################
+
+class Test__init__(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.__init__()
+    """
+
+    def test_noargs(self):
+        x = CompactDeck()
+        self.assertEqual(len(x), 52)
+        self.assertListEqual(list(x), list(Deck.iter_cards()))
+        rlock_type = type(threading.RLock())
+        self.assertIs(type(x.lock), rlock_type)
+
+    def test_1arg(self):
+        cards = [Card(Card.SPADE, 2), Card(Card.DIAMOND, 3)]
+        x = CompactDeck(cards)
+        self.assertEqual(len(x), 2)
+        self.assertListEqual(list(x), cards)
+
+    def test_empty(self):
+        x = CompactDeck([])
+        self.assertEqual(len(x), 0)
+        self.assertListEqual(list(x), [])
+
+    def test_card_without_code(self):
+        with self.assertRaises(ValueError):
+            CompactDeck([Card("a", "b")])
+
+    def test_one_byte_per_card(self):
+        x = CompactDeck()
+        self.assertIsInstance(x.codes, bytearray)
+        self.assertEqual(len(x.codes), 52)
+
+    def test_from_codes(self):
+        x = CompactDeck.from_codes([0, 51])
+        self.assertListEqual(list(x), [Card.from_code(0), Card.from_code(51)])
+
+################################################################################
+
+class Test_lock(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.lock
+    """
+
+    def test_same_lock(self):
+        x = CompactDeck()
+        self.assertIs(x.lock, x.lock)
+
+    def test_different_decks(self):
+        self.assertIsNot(CompactDeck().lock, CompactDeck().lock)
+
+################################################################################
+
+class Test_reset(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.reset()
+    """
+
+    def test_empty_deck(self):
+        x = CompactDeck([])
+        x.reset()
+        self.assertListEqual(list(x), list(Deck.iter_cards()))
+
+    def test_shuffled_deck(self):
+        x = CompactDeck()
+        x.shuffle()
+        x.reset()
+        self.assertListEqual(list(x), list(Deck.iter_cards()))
+
+################################################################################
+
+class Test_draw(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.draw()
+    """
+
+    def test_empty_deck(self):
+        x = CompactDeck([])
+        with self.assertRaises(IndexError):
+            x.draw()
+
+    def test_deck_full(self):
+        x = CompactDeck()
+        expected_state_after = list(x)[:-1]
+        expected_card = list(x)[-1]
+        actual_card = x.draw()
+        self.assertIs(actual_card, expected_card)
+        self.assertListEqual(list(x), expected_state_after)
+
+    def test_draw_many(self):
+        x = CompactDeck()
+        x.shuffle()
+        y = x.to_deck()
+        self.assertListEqual(x.draw_many(7), y.draw_many(7))
+        self.assertListEqual(list(x), y)
+
+    def test_draw_many_too_many(self):
+        x = CompactDeck()
+        with self.assertRaises(IndexError):
+            x.draw_many(53)
+        with self.assertRaises(ValueError):
+            x.draw_many(-1)
+        self.assertEqual(len(x), 52)
+
+    def test_deal(self):
+        x = CompactDeck()
+        x.shuffle()
+        y = x.to_deck()
+        self.assertListEqual(x.deal(4, 3, "block"), y.deal(4, 3, "block"))
+        self.assertListEqual(x.deal(4, 3), y.deal(4, 3))
+        self.assertListEqual(list(x), y)
+
+################################################################################
+
+class Test_shuffle(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.shuffle(), shuffle_3waycut() and
+    shuffle_riffle()
+    """
+
+    def test_shuffle(self):
+        x = CompactDeck()
+        before = list(x)
+        x.shuffle()
+        self.assertNotEqual(list(x), before)
+        self.assertSetEqual(set(x), set(before))
+
+    def test_shuffle_3waycut(self):
+        x = CompactDeck()
+        before = list(x)
+        x.shuffle_3waycut(split_index_1=20, split_index_2=30)
+        self.assertSetEqual(set(x), set(before))
+        chunks = [before[:20], before[20:30], before[30:]]
+        after = list(x)
+        for chunk in chunks:
+            index = after.index(chunk[0])
+            self.assertListEqual(after[index:index+len(chunk)], chunk)
+
+    def test_shuffle_3waycut_small(self):
+        card1 = Card(Card.SPADE, 1)
+        card2 = Card(Card.HEART, 1)
+        x = CompactDeck([card1, card2])
+        x.shuffle_3waycut()
+        self.assertSetEqual(set(x), set([card1, card2]))
+
+    def test_shuffle_riffle(self):
+        x = CompactDeck()
+        before = list(x)
+        x.shuffle_riffle()
+        self.assertEqual(len(x), 52)
+        self.assertSetEqual(set(x), set(before))
+
+    def test_shuffle_riffle_empty(self):
+        x = CompactDeck([])
+        x.shuffle_riffle()
+        self.assertEqual(len(x), 0)
+
+################################################################################
+
+class Test_index(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.index() and __contains__()
+    """
+
+    def test_found(self):
+        x = CompactDeck()
+        for (index, card) in enumerate(Deck.iter_cards()):
+            self.assertEqual(x.index(card), index)
+            self.assertIn(card, x)
+
+    def test_not_found(self):
+        x = CompactDeck()
+        card = x.draw()
+        with self.assertRaises(ValueError):
+            x.index(card)
+        self.assertNotIn(card, x)
+
+    def test_card_without_code(self):
+        x = CompactDeck()
+        with self.assertRaises(ValueError):
+            x.index(Card("a", "b"))
+        self.assertNotIn(Card("a", "b"), x)
+
+################################################################################
+
+class Test_encode(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.encode()
+    """
+
+    def test_codes(self):
+        cards = [Card(Card.SPADE, 2), Card(Card.DIAMOND, 3)]
+        self.assertEqual(CompactDeck.encode(cards),
+            bytearray(card.code for card in cards))
+
+    def test_card_without_code(self):
+        with self.assertRaises(ValueError):
+            CompactDeck.encode([Card("a", "b")])
+
+################################################################################
+
+class Test_sequence(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.__getitem__(), __eq__(), to_deck() and pickling
+    """
+
+    def test_getitem(self):
+        x = CompactDeck()
+        self.assertIs(x[0], Card.from_code(x.codes[0]))
+        self.assertIs(x[-1], Card.from_code(x.codes[-1]))
+
+    def test_getitem_slice(self):
+        x = CompactDeck()
+        actual = x[:2]
+        self.assertIsInstance(actual, CompactDeck)
+        self.assertListEqual(list(actual), list(x)[:2])
+
+    def test_eq(self):
+        self.assertTrue(CompactDeck() == CompactDeck())
+        self.assertFalse(CompactDeck() != CompactDeck())
+        self.assertFalse(CompactDeck() == CompactDeck([]))
+
+    def test_to_deck(self):
+        x = CompactDeck()
+        x.shuffle()
+        actual = x.to_deck()
+        self.assertIsInstance(actual, Deck)
+        self.assertListEqual(actual, list(x))
+
+    def test_pickle(self):
+        x = CompactDeck()
+        x.shuffle()
+        actual = pickle.loads(pickle.dumps(x, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(actual, x)
+
+    def test_pickle_rng(self):
+        x = CompactDeck(seed=1)
+        x.shuffle()
+        actual = pickle.loads(pickle.dumps(x, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(actual, x)
+        actual.shuffle()
+        x.shuffle()
+        self.assertEqual(actual, x)
+
+################################################################################
+
+class Test_context_manager(unittest.TestCase):
+    """
+    Unit tests for CompactDeck.__enter__() and __exit__()
+    """
+
+    def test(self):
+        deck = CompactDeck()
+        with deck as cm:
+            self.assertIs(cm, deck)
+            # the lock is reentrant
+            with deck:
+                pass
+
+    def test_exit_exception(self):
+        deck = CompactDeck()
+        deck.__enter__()
+        try:
+            raise Exception()
+        except:
+            (exc_type, exc_value, traceback) = sys.exc_info()
+        result = deck.__exit__(exc_type, exc_value, traceback)
+        self.assertIsNone(result)
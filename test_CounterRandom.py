@@ -0,0 +1,156 @@
+import pickle
+import random
+import unittest
+
+from cards import CounterRandom
+
+################################################################################
+
+class Test__init__(unittest.TestCase):
+    """
+    Unit tests for CounterRandom.__init__() and seed()
+    """
+
+    def test_same_seed(self):
+        x1 = CounterRandom(1234)
+        x2 = CounterRandom(1234)
+        self.assertListEqual([x1.random() for unused in range(10)],
+            [x2.random() for unused in range(10)])
+
+    def test_different_seeds(self):
+        self.assertNotEqual(CounterRandom(1).random(), CounterRandom(2).random())
+
+    def test_large_seeds(self):
+        values = set(CounterRandom(seed).random()
+            for seed in (0, 1 << 64, 1 << 128, (1 << 64) + 1))
+        self.assertEqual(len(values), 4)
+
+    def test_different_streams(self):
+        x1 = CounterRandom(1, stream=1)
+        x2 = CounterRandom(1, stream=2)
+        self.assertNotEqual([x1.random() for unused in range(10)],
+            [x2.random() for unused in range(10)])
+        self.assertEqual(x1.stream, 1)
+
+    def test_no_seed(self):
+        self.assertNotEqual(CounterRandom().random(), CounterRandom().random())
+
+    def test_string_seed(self):
+        self.assertEqual(CounterRandom("abc").random(),
+            CounterRandom("abc").random())
+
+    def test_reseed(self):
+        x = CounterRandom(5)
+        first = x.random()
+        x.seed(5)
+        self.assertEqual(x.counter, 0)
+        self.assertEqual(x.random(), first)
+
+################################################################################
+
+class Test_random(unittest.TestCase):
+    """
+    Unit tests for CounterRandom.random() and getrandbits()
+    """
+
+    def test_range(self):
+        x = CounterRandom(1)
+        for unused in range(1000):
+            value = x.random()
+            self.assertGreaterEqual(value, 0.0)
+            self.assertLess(value, 1.0)
+
+    def test_counter(self):
+        x = CounterRandom(1)
+        x.random()
+        x.random()
+        self.assertEqual(x.counter, 2)
+
+    def test_getrandbits(self):
+        x = CounterRandom(1)
+        for k in (1, 7, 64, 65, 200):
+            value = x.getrandbits(k)
+            self.assertGreaterEqual(value, 0)
+            self.assertLess(value, 1 << k)
+
+    def test_getrandbits_zero(self):
+        with self.assertRaises(ValueError):
+            CounterRandom(1).getrandbits(0)
+
+    def test_randint(self):
+        x = CounterRandom(1)
+        values = set(x.randint(1, 3) for unused in range(100))
+        self.assertSetEqual(values, set([1, 2, 3]))
+
+################################################################################
+
+class Test_shuffle(unittest.TestCase):
+    """
+    Unit tests for CounterRandom.shuffle()
+    """
+
+    def test_same_as_random_shuffle(self):
+        x1 = CounterRandom(99)
+        x2 = CounterRandom(99)
+        list1 = range(52)
+        list2 = range(52)
+        x1.shuffle(list1)
+        random.Random.shuffle(x2, list2)
+        self.assertListEqual(list1, list2)
+        self.assertEqual(x1.counter, x2.counter)
+        self.assertEqual(x1.random(), x2.random())
+
+    def test_empty(self):
+        x = CounterRandom(1)
+        values = []
+        x.shuffle(values)
+        self.assertListEqual(values, [])
+        self.assertEqual(x.counter, 0)
+
+    def test_random_argument(self):
+        values = range(10)
+        CounterRandom(1).shuffle(values, lambda: 0.0)
+        self.assertListEqual(values, range(1, 10) + [0])
+
+################################################################################
+
+class Test_state(unittest.TestCase):
+    """
+    Unit tests for CounterRandom.getstate(), setstate(), jumpahead() and
+    spawn()
+    """
+
+    def test_getstate_setstate(self):
+        x = CounterRandom(7, stream=3)
+        x.random()
+        state = x.getstate()
+        expected = [x.random() for unused in range(5)]
+        y = CounterRandom()
+        y.setstate(state)
+        self.assertListEqual([y.random() for unused in range(5)], expected)
+        self.assertEqual(y.stream, 3)
+
+    def test_setstate_invalid(self):
+        with self.assertRaises(ValueError):
+            CounterRandom().setstate(random.Random(1).getstate())
+
+    def test_pickle(self):
+        x = CounterRandom(7)
+        x.random()
+        y = pickle.loads(pickle.dumps(x))
+        self.assertEqual(y.random(), x.random())
+
+    def test_jumpahead(self):
+        x1 = CounterRandom(7)
+        x2 = CounterRandom(7)
+        for unused in range(5):
+            x1.random()
+        x2.jumpahead(5)
+        self.assertEqual(x1.random(), x2.random())
+
+    def test_spawn(self):
+        x = CounterRandom(7)
+        x.random()
+        y = x.spawn(4)
+        self.assertEqual(y.counter, 0)
+        self.assertEqual(y.random(), CounterRandom(7, stream=4).random())
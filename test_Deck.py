@@ -1,3 +1,4 @@
+import random
 import sys
 import threading
 import unittest
@@ -31,6 +32,63 @@ class Test__init__(unittest.TestCase):
         rlock_type = type(threading.RLock())
         self.assertIs(type(x.lock), rlock_type)
 
+    def test_default_rng(self):
+        self.assertIs(Deck().rng, random)
+
+    def test_rng(self):
+        rng = random.Random(1)
+        x = Deck([Card(Card.SPADE, 2)], rng=rng)
+        self.assertIs(x.rng, rng)
+        self.assertEqual(len(x), 1)
+
+    def test_seed(self):
+        x = Deck(seed=1)
+        self.assertEqual(len(x), 52)
+        self.assertEqual(x.rng.seed_value, 1)
+
+    def test_rng_and_seed(self):
+        with self.assertRaises(ValueError):
+            Deck(rng=random.Random(), seed=1)
+
+################################################################################
+
+class Test_rng(unittest.TestCase):
+    """
+    Unit tests for the shuffles of a Deck with its own random number generator
+    """
+
+    def shuffle_all(self, x):
+        x.shuffle()
+        x.shuffle_3waycut()
+        x.shuffle_riffle(times=3)
+
+    def test_reproducible(self):
+        x1 = Deck(seed=1234)
+        x2 = Deck(seed=1234)
+        self.shuffle_all(x1)
+        self.shuffle_all(x2)
+        self.assertListEqual(x1, x2)
+
+    def test_independent_of_random_module(self):
+        x1 = Deck(seed=1234)
+        self.shuffle_all(x1)
+        state = random.getstate()
+        try:
+            x2 = Deck(seed=1234)
+            random.shuffle(range(10))
+            self.shuffle_all(x2)
+        finally:
+            random.setstate(state)
+        self.assertListEqual(x1, x2)
+
+    def test_uses_rng(self):
+        rng = random.Random(5)
+        x1 = Deck(rng=rng)
+        x1.shuffle()
+        x2 = Deck()
+        random.Random(5).shuffle(x2)
+        self.assertListEqual(x1, x2)
+
 ################################################################################
 
 class Test_reset(unittest.TestCase):
@@ -104,6 +162,100 @@ class Test_pop(unittest.TestCase):
 
 ################################################################################
 
+class Test_draw_many(unittest.TestCase):
+    """
+    Unit tests for Deck.draw_many()
+    """
+
+    def test_same_as_draw(self):
+        x1 = Deck()
+        x2 = Deck()
+        x1.shuffle()
+        x2[:] = x1
+        actual = x1.draw_many(10)
+        expected = [x2.draw() for unused in range(10)]
+        self.assertListEqual(actual, expected)
+        self.assertListEqual(x1, x2)
+
+    def test_zero(self):
+        x = Deck()
+        self.assertListEqual(x.draw_many(0), [])
+        self.assertEqual(len(x), 52)
+
+    def test_all(self):
+        x = Deck()
+        before = list(x)
+        actual = x.draw_many(52)
+        self.assertListEqual(actual, before[::-1])
+        self.assertEqual(len(x), 0)
+
+    def test_too_many(self):
+        x = Deck()
+        with self.assertRaises(IndexError):
+            x.draw_many(53)
+        self.assertEqual(len(x), 52)
+
+    def test_negative(self):
+        with self.assertRaises(ValueError):
+            Deck().draw_many(-1)
+
+    def test_keeps_index(self):
+        x = Deck()
+        x.shuffle()
+        x.index(x[0])
+        x.draw_many(5)
+        for (index, card) in enumerate(x):
+            self.assertEqual(x.index(card), index)
+
+################################################################################
+
+class Test_deal(unittest.TestCase):
+    """
+    Unit tests for Deck.deal()
+    """
+
+    def test_round_robin(self):
+        x = Deck()
+        drawn = list(x)[::-1]
+        actual = x.deal(3, 2)
+        self.assertListEqual(actual, [[drawn[0], drawn[3]],
+            [drawn[1], drawn[4]], [drawn[2], drawn[5]]])
+        self.assertEqual(len(x), 46)
+
+    def test_block(self):
+        x = Deck()
+        drawn = list(x)[::-1]
+        actual = x.deal(3, 2, pattern="block")
+        self.assertListEqual(actual, [drawn[0:2], drawn[2:4], drawn[4:6]])
+
+    def test_eight_players(self):
+        x = Deck()
+        x.shuffle()
+        actual = x.deal(8, 5)
+        self.assertEqual(len(actual), 8)
+        for hand in actual:
+            self.assertEqual(len(hand), 5)
+        self.assertEqual(len(set(card for hand in actual for card in hand)), 40)
+        self.assertEqual(len(x), 12)
+
+    def test_not_enough_cards(self):
+        x = Deck()
+        with self.assertRaises(IndexError):
+            x.deal(11, 5)
+        self.assertEqual(len(x), 52)
+
+    def test_invalid_arguments(self):
+        x = Deck()
+        with self.assertRaises(ValueError):
+            x.deal(-1, 5)
+        with self.assertRaises(ValueError):
+            x.deal(2, -1)
+        with self.assertRaises(ValueError):
+            x.deal(2, 5, pattern="spiral")
+        self.assertEqual(len(x), 52)
+
+################################################################################
+
 class Test_shuffle(unittest.TestCase):
     """
     Unit tests for Deck.shuffle()
@@ -241,6 +393,136 @@ class Test_shuffle_riffle(unittest.TestCase):
         x.shuffle_riffle()
         self.assertSetEqual(before, after)
 
+    def test_times(self):
+        x = Deck()
+        before = list(x)
+        x.shuffle_riffle(times=7)
+        self.assertEqual(len(x), 52)
+        self.assertSetEqual(set(x), set(before))
+
+    def test_times_zero(self):
+        x = Deck()
+        before = list(x)
+        x.shuffle_riffle(times=0)
+        self.assertListEqual(x, before)
+
+    def test_times_same_as_repeated(self):
+        state = random.getstate()
+        try:
+            x1 = Deck()
+            random.seed(1234)
+            x1.shuffle_riffle(times=3)
+            x2 = Deck()
+            random.seed(1234)
+            for unused in range(3):
+                x2.shuffle_riffle()
+        finally:
+            random.setstate(state)
+        self.assertListEqual(x1, x2)
+
+    def test_multiple_decks(self):
+        x = Deck(list(Deck.iter_cards()) * 8)
+        before = sorted(x)
+        x.shuffle_riffle()
+        self.assertEqual(len(x), 416)
+        self.assertListEqual(sorted(x), before)
+
+    def test_piles_keep_their_order(self):
+        x = Deck()
+        before = list(x)
+        x.shuffle_riffle()
+        # interleaving 2 piles that each keep their order yields at most 2
+        # "rising sequences" of consecutive cards of the original deck
+        positions = [x.index(card) for card in before]
+        descents = sum(1 for (a, b) in zip(positions, positions[1:]) if b < a)
+        self.assertLessEqual(descents, 1)
+
+################################################################################
+
+class Test_index(unittest.TestCase):
+    """
+    Unit tests for Deck.index()
+    """
+
+    def test_full(self):
+        x = Deck()
+        x.shuffle()
+        for (index, card) in enumerate(list(x)):
+            self.assertEqual(x.index(card), index)
+
+    def test_not_found(self):
+        x = Deck()
+        card = x.draw()
+        with self.assertRaises(ValueError):
+            x.index(card)
+
+    def test_after_draw(self):
+        x = Deck()
+        x.shuffle()
+        x.index(x[0]) # build the index
+        for unused in range(10):
+            card = x.draw()
+            with self.assertRaises(ValueError):
+                x.index(card)
+        for (index, card) in enumerate(list(x)):
+            self.assertEqual(x.index(card), index)
+
+    def test_after_modification(self):
+        x = Deck()
+        x.index(x[0]) # build the index
+        modifications = [
+            lambda: x.shuffle(),
+            lambda: x.shuffle_3waycut(),
+            lambda: x.shuffle_riffle(),
+            lambda: x.reset(),
+            lambda: x.reverse(),
+            lambda: x.sort(),
+            lambda: x.insert(0, x.pop()),
+            lambda: x.append(x.pop(0)),
+            lambda: x.__setitem__(slice(None), list(reversed(x))),
+            lambda: x.__setslice__(0, 2, [x[1], x[0]]),
+            lambda: x.__delitem__(0),
+            lambda: x.__delslice__(0, 1),
+            lambda: x.extend([x.pop(0)]),
+            lambda: x.remove(x[0]),
+        ]
+        for modification in modifications:
+            modification()
+            for (index, card) in enumerate(list(x)):
+                self.assertEqual(x.index(card), index)
+
+    def test_slice_assignment(self):
+        x = Deck()
+        x.index(x[0]) # build the index
+        x[:] = x[10:]
+        card = Card(Card.CLUB, 13)
+        with self.assertRaises(ValueError):
+            x.index(card)
+        self.assertEqual(x.index(x[0]), 0)
+
+    def test_duplicates(self):
+        x = Deck(list(Deck.iter_cards()) * 2)
+        card = x[-1]
+        self.assertEqual(x.index(card), 51)
+        x.draw()
+        self.assertEqual(x.index(card), 51)
+        x.draw()
+        self.assertEqual(x.index(x[-1]), 49)
+
+    def test_cards_without_codes(self):
+        card1 = Card("a", "b")
+        card2 = Card(Card.SPADE, 1)
+        x = Deck([card1, card2])
+        self.assertEqual(x.index(card1), 0)
+        self.assertEqual(x.index(card2), 1)
+
+    def test_start_and_stop(self):
+        x = Deck(list(Deck.iter_cards()) * 2)
+        card = x[0]
+        self.assertEqual(x.index(card, 1), 52)
+        with self.assertRaises(ValueError):
+            x.index(card, 1, 52)
+
 ################################################################################
 
 class Test_iter_cards(unittest.TestCase):
@@ -0,0 +1,171 @@
+import unittest
+
+from cards import EquityResult
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+################################################################################
+
+class Test_add(unittest.TestCase):
+    """
+    Unit tests for EquityResult.add()
+    """
+
+    def test_win(self):
+        x = EquityResult(3)
+        x.add([5, 3, 9])
+        self.assertEqual(x.trials, 1)
+        self.assertListEqual(x.wins, [0, 1, 0])
+        self.assertListEqual(x.ties, [0, 0, 0])
+        self.assertListEqual(x.equity_sums, [0.0, 1.0, 0.0])
+
+    def test_tie(self):
+        x = EquityResult(3)
+        x.add([3, 3, 9])
+        self.assertListEqual(x.wins, [0, 0, 0])
+        self.assertListEqual(x.ties, [1, 1, 0])
+        self.assertListEqual(x.equity_sums, [0.5, 0.5, 0.0])
+        self.assertListEqual(x.equity_square_sums, [0.25, 0.25, 0.0])
+
+    def test_probabilities(self):
+        x = EquityResult(2)
+        for values in ([1, 2], [1, 2], [2, 1], [1, 1]):
+            x.add(values)
+        self.assertEqual(x.win_probability(0), 0.5)
+        self.assertEqual(x.tie_probability(1), 0.25)
+        self.assertEqual(x.equity(0), 0.625)
+        self.assertEqual(x.equity(1), 0.375)
+
+    def test_no_trials(self):
+        x = EquityResult(2)
+        self.assertEqual(x.win_probability(0), 0.0)
+        self.assertEqual(x.equity(0), 0.0)
+        self.assertEqual(x.half_width(0), float("inf"))
+
+################################################################################
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class Test_add_batch(unittest.TestCase):
+    """
+    Unit tests for EquityResult.add_batch()
+    """
+
+    def test_same_as_add(self):
+        rows = [[5, 3, 9], [3, 3, 9], [1, 1, 1], [7, 8, 6]]
+        expected = EquityResult(3)
+        for values in rows:
+            expected.add(values)
+        x = EquityResult(3)
+        x.add_batch(numpy.array(rows, dtype=numpy.uint16))
+        self.assertEqual(x.trials, expected.trials)
+        self.assertListEqual(x.wins, expected.wins)
+        self.assertListEqual(x.ties, expected.ties)
+        for player in range(3):
+            self.assertAlmostEqual(x.equity_sums[player],
+                expected.equity_sums[player])
+            self.assertAlmostEqual(x.equity_square_sums[player],
+                expected.equity_square_sums[player])
+
+################################################################################
+
+class Test_merge(unittest.TestCase):
+    """
+    Unit tests for EquityResult.merge()
+    """
+
+    def test_merge(self):
+        rows = [[5, 3], [3, 3], [1, 2], [7, 6], [2, 2]]
+        expected = EquityResult(2)
+        for values in rows:
+            expected.add(values)
+        x = EquityResult(2)
+        y = EquityResult(2)
+        for values in rows[:2]:
+            x.add(values)
+        for values in rows[2:]:
+            y.add(values)
+        self.assertIs(x.merge(y), x)
+        self.assertEqual(x.trials, expected.trials)
+        self.assertListEqual(x.wins, expected.wins)
+        self.assertListEqual(x.ties, expected.ties)
+        self.assertListEqual(x.equity_sums, expected.equity_sums)
+        self.assertListEqual(x.equity_square_sums, expected.equity_square_sums)
+
+    def test_different_players(self):
+        with self.assertRaises(ValueError):
+            EquityResult(2).merge(EquityResult(3))
+
+################################################################################
+
+class Test_confidence_interval(unittest.TestCase):
+    """
+    Unit tests for EquityResult.half_width() and confidence_interval()
+    """
+
+    def test_half_width(self):
+        x = EquityResult(2)
+        for unused in range(50):
+            x.add([1, 2])
+            x.add([2, 1])
+        # the equity of each trial is 0 or 1, with a standard deviation of 0.5
+        expected = EquityResult.DEFAULT_Z * 0.5 / 99 ** 0.5
+        self.assertAlmostEqual(x.half_width(0), expected)
+        self.assertAlmostEqual(x.max_half_width(), expected)
+        (low, high) = x.confidence_interval(0)
+        self.assertAlmostEqual(low, 0.5 - expected)
+        self.assertAlmostEqual(high, 0.5 + expected)
+
+    def test_narrows(self):
+        x = EquityResult(2)
+        half_widths = []
+        for unused in range(3):
+            for unused in range(100):
+                x.add([1, 2])
+                x.add([2, 1])
+            half_widths.append(x.half_width(0))
+        self.assertListEqual(half_widths, sorted(half_widths, reverse=True))
+
+    def test_clamped(self):
+        x = EquityResult(2)
+        for values in ([1, 2], [1, 2], [2, 1]):
+            x.add(values)
+        (low, high) = x.confidence_interval(0)
+        self.assertGreaterEqual(low, 0.0)
+        self.assertLessEqual(high, 1.0)
+
+    def test_constant(self):
+        x = EquityResult(2)
+        for unused in range(10):
+            x.add([1, 2])
+        self.assertEqual(x.half_width(0), 0.0)
+        self.assertEqual(x.confidence_interval(0), (1.0, 1.0))
+
+################################################################################
+
+class Test_exact(unittest.TestCase):
+    """
+    Unit tests for EquityResult.exact
+    """
+
+    def test_sampled(self):
+        x = EquityResult(2)
+        x.add([1, 2])
+        self.assertFalse(x.exact)
+
+    def test_enumerated(self):
+        x = EquityResult(2, total_trials=3)
+        part = EquityResult(2)
+        for values in ([1, 2], [2, 1]):
+            part.add(values)
+        x.merge(part)
+        self.assertFalse(x.exact)
+        self.assertGreater(x.half_width(0), 0.0)
+        part = EquityResult(2)
+        part.add([1, 2])
+        x.merge(part)
+        self.assertTrue(x.exact)
+        self.assertEqual(x.half_width(0), 0.0)
+        self.assertEqual(x.total_trials, 3)
@@ -0,0 +1,295 @@
+import itertools
+import unittest
+
+from cards import Card
+from cards import EquityResult
+from cards import EquitySimulator
+from cards import HandEvaluator
+from cards import _unrank_combinations_numpy
+from cards import binomial
+from cards import format_cards
+from cards import iter_combinations
+from cards import parse_cards
+from cards import rank_combination
+from cards import unrank_combination
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+################################################################################
+
+class Test_parse_cards(unittest.TestCase):
+    """
+    Unit tests for parse_cards() and format_cards()
+    """
+
+    def test_parse(self):
+        self.assertListEqual(parse_cards("AsKh"),
+            [Card(Card.SPADE, 1), Card(Card.HEART, 13)])
+        self.assertListEqual(parse_cards(" 10d, tc 2C "),
+            [Card(Card.DIAMOND, 10), Card(Card.CLUB, 10), Card(Card.CLUB, 2)])
+        self.assertListEqual(parse_cards(""), [])
+
+    def test_invalid(self):
+        for s in ("A", "As K", "1s", "Ax", "As;Kh"):
+            with self.assertRaises(ValueError):
+                parse_cards(s)
+
+    def test_round_trip(self):
+        cards = [Card.from_code(code) for code in range(Card.NUM_CODES)]
+        self.assertListEqual(parse_cards(format_cards(cards)), cards)
+        self.assertEqual(format_cards([Card(Card.DIAMOND, 10).code]), "Td")
+
+################################################################################
+
+class Test_combinations(unittest.TestCase):
+    """
+    Unit tests for binomial(), rank_combination(), unrank_combination() and
+    iter_combinations()
+    """
+
+    def colex_combinations(self, n, k):
+        return sorted(itertools.combinations(range(n), k),
+            key=lambda combination: combination[::-1])
+
+    def test_binomial(self):
+        self.assertEqual(binomial(52, 5), 2598960)
+        self.assertEqual(binomial(5, 0), 1)
+        self.assertEqual(binomial(5, 6), 0)
+        self.assertEqual(binomial(5, -1), 0)
+
+    def test_rank_and_unrank(self):
+        for (n, k) in ((10, 3), (8, 5), (6, 1), (4, 4)):
+            combinations = self.colex_combinations(n, k)
+            self.assertEqual(len(combinations), binomial(n, k))
+            for (rank, combination) in enumerate(combinations):
+                self.assertEqual(rank_combination(combination), rank)
+                self.assertEqual(rank_combination(reversed(combination)), rank)
+                self.assertEqual(tuple(unrank_combination(rank, k)),
+                    combination)
+
+    def test_unrank_invalid(self):
+        with self.assertRaises(ValueError):
+            unrank_combination(-1, 2)
+        with self.assertRaises(ValueError):
+            unrank_combination(1, 0)
+        self.assertListEqual(unrank_combination(0, 0), [])
+
+    def test_iter_combinations(self):
+        combinations = self.colex_combinations(9, 4)
+        self.assertListEqual(list(iter_combinations(4, 0, len(combinations))),
+            combinations)
+        self.assertListEqual(list(iter_combinations(4, 17, 60)),
+            combinations[17:60])
+        self.assertListEqual(list(iter_combinations(4, 5, 5)), [])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_unrank_numpy(self):
+        combinations = self.colex_combinations(9, 4)
+        actual = _unrank_combinations_numpy(numpy.arange(10, 90), 4, 9)
+        self.assertListEqual([tuple(row) for row in actual.tolist()],
+            combinations[10:90])
+
+################################################################################
+
+class EquitySimulatorTestCase(unittest.TestCase):
+    """
+    Base class for the unit tests of EquitySimulator, which shares one
+    HandEvaluator that does not use a cache file.
+    """
+
+    evaluator = None
+
+    @classmethod
+    def setUpClass(cls):
+        if EquitySimulatorTestCase.evaluator is None:
+            EquitySimulatorTestCase.evaluator = HandEvaluator(cache_path=None)
+
+    def create(self, hands, board="", **kwargs):
+        return EquitySimulator([parse_cards(hand) for hand in hands],
+            board=parse_cards(board), evaluator=self.evaluator, **kwargs)
+
+################################################################################
+
+class Test__init__(EquitySimulatorTestCase):
+    """
+    Unit tests for EquitySimulator.__init__()
+    """
+
+    def test_remaining(self):
+        x = self.create(["AsKs"], "2c3c4c", opponents=2)
+        self.assertEqual(x.num_players, 3)
+        self.assertEqual(len(x.remaining), 52 - 5)
+        self.assertNotIn(Card(Card.SPADE, 1).code, x.remaining)
+        self.assertEqual(x.num_dealt, 2 + 4)
+
+    def test_num_combinations(self):
+        self.assertEqual(self.create(["AsKs", "QhQd"]).num_combinations,
+            binomial(48, 5))
+        self.assertEqual(self.create(["AsKs", "QhQd"], "2c3c4c")
+            .num_combinations, binomial(45, 2))
+        self.assertIsNone(self.create(["AsKs"], opponents=1).num_combinations)
+
+    def test_seed_chosen(self):
+        x = self.create(["AsKs", "QhQd"])
+        self.assertIsNotNone(x.seed)
+
+    def test_invalid(self):
+        for (hands, board, opponents) in [
+                (["AsKs"], "", 0),
+                (["AsKs", "Qh"], "", 0),
+                (["AsKs", "QhQd"], "2c3c4c5c6c7c", 0),
+                (["AsKs", "AsQd"], "", 0),
+                (["AsKs", "QhQd"], "Ks", 0),
+                (["AsKs"], "", -1),
+                (["AsKs"], "", 30)]:
+            with self.assertRaises(ValueError):
+                self.create(hands, board, opponents=opponents)
+
+################################################################################
+
+class Test_simulate_chunk(EquitySimulatorTestCase):
+    """
+    Unit tests for EquitySimulator.simulate_chunk()
+    """
+
+    def use_numpy_values(self):
+        return (False, True) if numpy is not None else (False,)
+
+    def test_reproducible(self):
+        for use_numpy in self.use_numpy_values():
+            x = self.create(["AsKs"], opponents=2, seed=1, use_numpy=use_numpy)
+            result1 = x.simulate_chunk(3, 200)
+            result2 = x.simulate_chunk(3, 200)
+            self.assertEqual(result1.trials, 200)
+            self.assertListEqual(result1.equity_sums, result2.equity_sums)
+            result3 = x.simulate_chunk(4, 200)
+            self.assertNotEqual(result1.equity_sums, result3.equity_sums)
+
+    def test_river_is_exact(self):
+        # with the whole board dealt, every trial has the same outcome
+        for use_numpy in self.use_numpy_values():
+            x = self.create(["AsAh", "KsKh"], "Kd7c2d9hTc", use_numpy=use_numpy)
+            result = x.simulate_chunk(0, 50)
+            self.assertListEqual(result.wins, [0, 50])
+            self.assertEqual(result.half_width(1), 0.0)
+
+    def test_split_pot(self):
+        # the board is a royal flush, so every player ties
+        for use_numpy in self.use_numpy_values():
+            x = self.create(["2c3d"], "AsKsQsJsTs", opponents=2,
+                use_numpy=use_numpy)
+            result = x.simulate_chunk(0, 20)
+            self.assertListEqual(result.ties, [20, 20, 20])
+            self.assertAlmostEqual(result.equity(0), 1.0 / 3)
+
+    def test_equity(self):
+        # pocket aces against pocket kings win about 82% of the time
+        for use_numpy in self.use_numpy_values():
+            x = self.create(["AsAh", "KsKh"], seed=2, use_numpy=use_numpy)
+            result = x.simulate_chunk(0, 4000)
+            self.assertAlmostEqual(result.equity(0), 0.82, delta=0.03)
+            self.assertAlmostEqual(result.equity(0) + result.equity(1), 1.0)
+
+################################################################################
+
+class Test_run(EquitySimulatorTestCase):
+    """
+    Unit tests for EquitySimulator.run()
+    """
+
+    def test_max_trials(self):
+        x = self.create(["AsKs", "QhQd"], seed=1)
+        progress = []
+        result = x.run(max_trials=2500, chunk_size=1000, precision=0,
+            processes=1, progress=lambda result: progress.append(result.trials))
+        self.assertEqual(result.trials, 2500)
+        self.assertListEqual(progress, [1000, 2000, 2500])
+
+    def test_same_as_chunks(self):
+        x = self.create(["AsKs", "QhQd"], seed=1)
+        result = x.run(max_trials=2000, chunk_size=1000, precision=0,
+            processes=1)
+        expected = x.simulate_chunk(0, 1000).merge(x.simulate_chunk(1, 1000))
+        self.assertListEqual(result.wins, expected.wins)
+        self.assertListEqual(result.equity_sums, expected.equity_sums)
+
+    def test_early_stopping(self):
+        x = self.create(["AsKs", "QhQd"], seed=1)
+        result = x.run(max_trials=100000, min_trials=2000, chunk_size=1000,
+            precision=0.05, processes=1)
+        self.assertGreaterEqual(result.trials, 2000)
+        self.assertLess(result.trials, 100000)
+        self.assertLessEqual(result.max_half_width(), 0.05)
+
+    def test_processes(self):
+        x = self.create(["AsKs", "QhQd"], seed=1)
+        result = x.run(max_trials=3000, chunk_size=1000, precision=0,
+            processes=2)
+        expected = x.run(max_trials=3000, chunk_size=1000, precision=0,
+            processes=1)
+        self.assertEqual(result.trials, 3000)
+        self.assertListEqual(result.wins, expected.wins)
+        self.assertListEqual(result.ties, expected.ties)
+
+################################################################################
+
+class Test_enumerate_all(EquitySimulatorTestCase):
+    """
+    Unit tests for EquitySimulator.enumerate_all() and enumerate_chunk()
+    """
+
+    def use_numpy_values(self):
+        return (False, True) if numpy is not None else (False,)
+
+    def test_turn(self):
+        # the aces win only if the river is one of the 2 remaining aces or one
+        # of the 8 remaining hearts other than the king, which gives the kings
+        # four of a kind
+        for use_numpy in self.use_numpy_values():
+            x = self.create(["AsAh", "KsKc"], "Kd7h2h9h", use_numpy=use_numpy)
+            result = x.enumerate_all(processes=1)
+            self.assertTrue(result.exact)
+            self.assertEqual(result.trials, 44)
+            self.assertEqual(result.total_trials, 44)
+            self.assertListEqual(result.wins, [10, 34])
+            self.assertEqual(result.half_width(0), 0.0)
+
+    def test_same_as_brute_force(self):
+        x = self.create(["AsKs", "QhQd"], "2c7s9d")
+        evaluate = self.evaluator.evaluate
+        expected = EquityResult(2)
+        for dealt in itertools.combinations(x.remaining, 2):
+            board = x.board + list(dealt)
+            expected.add([evaluate(hand + board) for hand in x.hands])
+        for use_numpy in self.use_numpy_values():
+            x.use_numpy = use_numpy
+            result = x.enumerate_all(processes=1, chunk_size=100)
+            self.assertEqual(result.trials, expected.trials)
+            self.assertListEqual(result.wins, expected.wins)
+            self.assertListEqual(result.ties, expected.ties)
+
+    def test_chunks(self):
+        x = self.create(["AsKs", "QhQd"], "2c7s9d")
+        progress = []
+        result = x.enumerate_all(processes=1, chunk_size=400,
+            progress=lambda result: progress.append(result.trials))
+        self.assertListEqual(progress, [400, 800, 990])
+        merged = x.enumerate_chunk(0, 500).merge(x.enumerate_chunk(500, 990))
+        self.assertListEqual(merged.wins, result.wins)
+
+    def test_processes(self):
+        x = self.create(["AsKs", "QhQd"], "2c7s9d")
+        result = x.enumerate_all(processes=2, chunk_size=100)
+        expected = x.enumerate_all(processes=1)
+        self.assertTrue(result.exact)
+        self.assertListEqual(result.wins, expected.wins)
+
+    def test_opponents(self):
+        x = self.create(["AsKs"], opponents=1)
+        with self.assertRaises(ValueError):
+            x.enumerate_all(processes=1)
+        with self.assertRaises(ValueError):
+            x.enumerate_chunk(0, 10)
@@ -0,0 +1,120 @@
+import threading
+import unittest
+
+from cards import EventBroadcaster
+
+################################################################################
+
+class Test_subscribe(unittest.TestCase):
+    """
+    Unit tests for EventBroadcaster.subscribe() and unsubscribe()
+    """
+
+    def test_subscribe(self):
+        x = EventBroadcaster()
+        subscriber = x.subscribe()
+        self.assertSetEqual(x.subscribers, set([subscriber]))
+
+    def test_unsubscribe(self):
+        x = EventBroadcaster()
+        subscriber = x.subscribe()
+        x.unsubscribe(subscriber)
+        self.assertSetEqual(x.subscribers, set())
+        # unsubscribing twice is harmless
+        x.unsubscribe(subscriber)
+
+    def test_only_later_events(self):
+        x = EventBroadcaster()
+        x.publish(b"a")
+        subscriber = x.subscribe()
+        x.publish(b"b")
+        self.assertEqual(subscriber.get(0), ([b"b"], False))
+
+################################################################################
+
+class Test_publish(unittest.TestCase):
+    """
+    Unit tests for EventBroadcaster.publish() and Subscriber.get()
+    """
+
+    def test_all_subscribers(self):
+        x = EventBroadcaster()
+        subscribers = [x.subscribe() for unused in range(3)]
+        x.publish(b"a")
+        x.publish(b"b")
+        for subscriber in subscribers:
+            self.assertEqual(subscriber.get(0), ([b"a", b"b"], False))
+            self.assertEqual(subscriber.get(0), ([], False))
+
+    def test_no_subscribers(self):
+        x = EventBroadcaster()
+        x.publish(b"a")
+
+    def test_overflow(self):
+        x = EventBroadcaster(max_queued_events=2)
+        subscriber = x.subscribe()
+        for event in (b"a", b"b", b"c", b"d"):
+            x.publish(event)
+        self.assertEqual(subscriber.get(0), ([], True))
+        x.publish(b"e")
+        self.assertEqual(subscriber.get(0), ([b"e"], False))
+
+    def test_overflow_is_per_subscriber(self):
+        x = EventBroadcaster(max_queued_events=2)
+        subscriber1 = x.subscribe()
+        x.publish(b"a")
+        x.publish(b"b")
+        subscriber2 = x.subscribe()
+        x.publish(b"c")
+        self.assertEqual(subscriber1.get(0), ([], True))
+        self.assertEqual(subscriber2.get(0), ([b"c"], False))
+
+    def test_get_timeout(self):
+        subscriber = EventBroadcaster().subscribe()
+        self.assertEqual(subscriber.get(0.01), ([], False))
+
+    def test_get_waits(self):
+        x = EventBroadcaster()
+        subscriber = x.subscribe()
+        timer = threading.Timer(0.01, x.publish, [b"a"])
+        timer.start()
+        try:
+            self.assertEqual(subscriber.get(5), ([b"a"], False))
+        finally:
+            timer.join()
+
+################################################################################
+
+class Test_close(unittest.TestCase):
+    """
+    Unit tests for EventBroadcaster.close()
+    """
+
+    def test_close(self):
+        x = EventBroadcaster()
+        subscriber = x.subscribe()
+        x.publish(b"a")
+        x.close()
+        self.assertIsNone(subscriber.get())
+        self.assertSetEqual(x.subscribers, set())
+
+    def test_wakes_up_get(self):
+        x = EventBroadcaster()
+        subscriber = x.subscribe()
+        timer = threading.Timer(0.01, x.close)
+        timer.start()
+        try:
+            self.assertIsNone(subscriber.get(5))
+        finally:
+            timer.join()
+
+################################################################################
+
+class Test_format_event(unittest.TestCase):
+    """
+    Unit tests for EventBroadcaster.format_event()
+    """
+
+    def test(self):
+        actual = EventBroadcaster.format_event("draw", '{"a":1}')
+        self.assertEqual(actual, b'event: draw\ndata: {"a":1}\n\n')
@@ -0,0 +1,233 @@
+import itertools
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from cards import Card
+from cards import Deck
+from cards import HandEvaluator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+################################################################################
+
+def hand(*cards):
+    """
+    Returns a list of Card objects from tuples (suit, rank).
+    """
+    return [Card(suit, rank) for (suit, rank) in cards]
+
+C = Card.CLUB
+D = Card.DIAMOND
+H = Card.HEART
+S = Card.SPADE
+
+class HandEvaluatorTestCase(unittest.TestCase):
+    """
+    Base class for the unit tests of HandEvaluator, which shares one instance
+    that does not use a cache file.
+    """
+
+    evaluator = None
+
+    @classmethod
+    def setUpClass(cls):
+        if HandEvaluatorTestCase.evaluator is None:
+            HandEvaluatorTestCase.evaluator = HandEvaluator(cache_path=None)
+
+################################################################################
+
+class Test_evaluate(HandEvaluatorTestCase):
+    """
+    Unit tests for HandEvaluator.evaluate()
+    """
+
+    def test_best_and_worst(self):
+        x = self.evaluator
+        royal_flush = hand((S, 1), (S, 13), (S, 12), (S, 11), (S, 10))
+        self.assertEqual(x.evaluate(royal_flush), 1)
+        worst = hand((S, 7), (H, 5), (C, 4), (D, 3), (S, 2))
+        self.assertEqual(x.evaluate(worst), HandEvaluator.NUM_HAND_VALUES)
+
+    def test_classes(self):
+        hands = [
+            ("straight flush", hand((H, 5), (H, 4), (H, 3), (H, 2), (H, 1))),
+            ("four of a kind", hand((H, 9), (S, 9), (C, 9), (D, 9), (H, 2))),
+            ("full house", hand((H, 9), (S, 9), (C, 9), (D, 2), (H, 2))),
+            ("flush", hand((H, 1), (H, 9), (H, 7), (H, 4), (H, 2))),
+            ("straight", hand((H, 1), (S, 13), (C, 12), (D, 11), (H, 10))),
+            ("three of a kind", hand((H, 9), (S, 9), (C, 9), (D, 1), (H, 2))),
+            ("two pair", hand((H, 9), (S, 9), (C, 1), (D, 1), (H, 2))),
+            ("one pair", hand((H, 9), (S, 9), (C, 1), (D, 3), (H, 2))),
+            ("high card", hand((H, 9), (S, 8), (C, 1), (D, 3), (H, 2))),
+        ]
+        x = self.evaluator
+        for (name, cards) in hands:
+            self.assertEqual(x.hand_class(x.evaluate(cards)), name)
+
+    def test_ace_low_straight_is_worst(self):
+        x = self.evaluator
+        wheel = hand((H, 5), (S, 4), (C, 3), (D, 2), (H, 1))
+        six_high = hand((H, 6), (S, 5), (C, 4), (D, 3), (H, 2))
+        self.assertEqual(x.evaluate(wheel), 1609)
+        self.assertLess(x.evaluate(six_high), x.evaluate(wheel))
+
+    def test_codes(self):
+        cards = hand((H, 9), (S, 9), (C, 1), (D, 3), (H, 2), (S, 2))
+        x = self.evaluator
+        self.assertEqual(x.evaluate([card.code for card in cards]),
+            x.evaluate(cards))
+
+    def test_best_of_seven(self):
+        x = self.evaluator
+        rng = random.Random(1)
+        for unused in range(500):
+            codes = rng.sample(range(Card.NUM_CODES), 7)
+            expected = min(x.evaluate(combination)
+                for combination in itertools.combinations(codes, 5))
+            self.assertEqual(x.evaluate(codes), expected)
+            expected = min(x.evaluate(combination)
+                for combination in itertools.combinations(codes[:6], 5))
+            self.assertEqual(x.evaluate(codes[:6]), expected)
+
+    def test_flush_beats_straight_in_seven(self):
+        cards = hand((H, 2), (C, 3), (H, 4), (S, 5), (H, 6), (H, 9), (H, 13))
+        x = self.evaluator
+        self.assertEqual(x.hand_class(x.evaluate(cards)), "flush")
+        self.assertEqual(x.hand_class(x.evaluate(cards[:5])), "straight")
+
+    def test_invalid_number_of_cards(self):
+        for num_cards in (0, 4, 8):
+            with self.assertRaises(ValueError):
+                self.evaluator.evaluate(range(num_cards))
+
+    def test_duplicate_cards(self):
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate([0, 0, 0, 0, 0])
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate([0, 0, 1, 2, 3])
+        with self.assertRaises(ValueError):
+            self.evaluator.evaluate([0, 13, 26, 39, 0, 1, 2])
+
+################################################################################
+
+class Test_hand_class(unittest.TestCase):
+    """
+    Unit tests for HandEvaluator.hand_class()
+    """
+
+    def test_boundaries(self):
+        self.assertEqual(HandEvaluator.hand_class(1), "straight flush")
+        self.assertEqual(HandEvaluator.hand_class(10), "straight flush")
+        self.assertEqual(HandEvaluator.hand_class(11), "four of a kind")
+        self.assertEqual(HandEvaluator.hand_class(7462), "high card")
+
+    def test_invalid(self):
+        for value in (0, 7463):
+            with self.assertRaises(ValueError):
+                HandEvaluator.hand_class(value)
+
+################################################################################
+
+class Test_evaluate_batch(HandEvaluatorTestCase):
+    """
+    Unit tests for HandEvaluator.evaluate_batch()
+    """
+
+    def random_hands(self, num_hands, size):
+        rng = random.Random(size)
+        return [rng.sample(range(Card.NUM_CODES), size)
+            for unused in range(num_hands)]
+
+    def test_same_as_evaluate(self):
+        x = self.evaluator
+        for size in HandEvaluator.HAND_SIZES:
+            hands = self.random_hands(500, size)
+            expected = [x.evaluate(codes) for codes in hands]
+            self.assertListEqual(x.evaluate_batch(hands, use_numpy=False),
+                expected)
+            if numpy is not None:
+                self.assertListEqual(x.evaluate_batch(hands).tolist(),
+                    expected)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_numpy_invalid(self):
+        x = self.evaluator
+        with self.assertRaises(ValueError):
+            x.evaluate_batch([[0, 1, 2, 3]])
+        with self.assertRaises(ValueError):
+            x.evaluate_batch([[0, 1, 2, 3, 4], [0, 0, 1, 2, 3]])
+
+################################################################################
+
+class Test_iter_ranks(HandEvaluatorTestCase):
+    """
+    Unit tests for HandEvaluator.iter_ranks()
+    """
+
+    def test_dealt_hands(self):
+        deck = Deck(seed=1)
+        deck.shuffle()
+        hands = deck.deal(7, 7)
+        x = self.evaluator
+        expected = [x.evaluate(cards) for cards in hands]
+        for batch_size in (0, 1, 3, HandEvaluator.DEFAULT_BATCH_SIZE):
+            actual = list(x.iter_ranks(iter(hands), batch_size))
+            self.assertListEqual(actual, expected)
+
+    def test_mixed_sizes(self):
+        hands = [range(5), range(6), range(7)]
+        x = self.evaluator
+        self.assertListEqual(list(x.iter_ranks(hands)),
+            [x.evaluate(cards) for cards in hands])
+
+    def test_lazy(self):
+        def generate():
+            yield range(5)
+            raise AssertionError("consumed too many hands")
+        ranks = self.evaluator.iter_ranks(generate(), batch_size=0)
+        self.assertEqual(next(ranks), self.evaluator.evaluate(range(5)))
+
+################################################################################
+
+class Test_cache(unittest.TestCase):
+    """
+    Unit tests for the cache file of HandEvaluator
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "hand_tables.cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        x1 = HandEvaluator(self.path)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertListEqual(os.listdir(self.directory),
+            [os.path.basename(self.path)])
+        x2 = HandEvaluator(self.path)
+        self.assertListEqual(x2.flush_values, x1.flush_values)
+        self.assertDictEqual(x2.products, x1.products)
+
+    def test_corrupt_file_rebuilt(self):
+        HandEvaluator(self.path)
+        with open(self.path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"x")
+        self.assertIsNone(HandEvaluator._read_cache(self.path))
+        x = HandEvaluator(self.path)
+        self.assertEqual(x.evaluate(range(5)), 10)
+        self.assertIsNotNone(HandEvaluator._read_cache(self.path))
+
+    def test_unwritable_path(self):
+        path = os.path.join(self.directory, "missing", "hand_tables.cache")
+        x = HandEvaluator(path)
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(x.evaluate(range(5)), 10)
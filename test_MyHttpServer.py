@@ -0,0 +1,193 @@
+import httplib
+import json
+import threading
+import time
+import unittest
+
+from cards import MyHttpServer
+
+################################################################################
+
+class QuietHttpServer(MyHttpServer):
+    """
+    A MyHttpServer whose request handler does not log the requests.
+    """
+
+    class MyRequestHandler(MyHttpServer.MyRequestHandler):
+
+        def log_message(self, format, *args):
+            pass
+
+################################################################################
+
+class HttpServerTestCase(unittest.TestCase):
+    """
+    Base class for the tests of MyHttpServer, which runs a server on a free
+    port in a background thread.
+    """
+
+    def setUp(self):
+        self.server = None
+        self.connections = []
+
+    def tearDown(self):
+        for connection in self.connections:
+            connection.close()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def start_server(self, **kwargs):
+        self.server = QuietHttpServer(0, **kwargs)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def connect(self, timeout=5):
+        connection = httplib.HTTPConnection("localhost",
+            self.server.server_address[1], timeout=timeout)
+        self.connections.append(connection)
+        return connection
+
+    @staticmethod
+    def request_state(connection, method, path, body=None):
+        """
+        Sends a request for the JSON state and returns a tuple (response,
+        state).
+        """
+        connection.request(method, path, body, {"Accept": "application/json"})
+        response = connection.getresponse()
+        return (response, json.loads(response.read()))
+
+################################################################################
+
+class Test_round_trip(HttpServerTestCase):
+    """
+    Tests of requests sent to a running MyHttpServer
+    """
+
+    def test_single_thread(self):
+        self.start_server()
+        (response, state) = self.request_state(self.connect(), "POST",
+            "/draw")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(state["remaining"], 51)
+
+    def test_keep_alive(self):
+        self.start_server(num_workers=2, keep_alive=True)
+        connection = self.connect()
+        # the body of a POST request is read even though it is not used, so it
+        # is not mistaken for the next request on the connection
+        (response, state) = self.request_state(connection, "POST", "/draw",
+            "cache-killer=1")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertFalse(response.will_close)
+        self.assertEqual(state["remaining"], 51)
+
+        (response, state) = self.request_state(connection, "GET", "/state")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(state["remaining"], 51)
+
+    def test_idle_connections_leave_workers_for_requests(self):
+        self.start_server(num_workers=2, keep_alive=True)
+        idle_connections = [self.connect() for unused in range(2)]
+        for connection in idle_connections:
+            (response, state) = self.request_state(connection, "GET",
+                "/state")
+            self.assertFalse(response.will_close)
+
+        start_time = time.time()
+        (response, state) = self.request_state(self.connect(timeout=2),
+            "POST", "/draw")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertLess(time.time() - start_time, 1)
+
+        # the idle connections are still served when their next request comes
+        for connection in idle_connections:
+            (response, state) = self.request_state(connection, "GET",
+                "/state")
+            self.assertEqual(response.status, httplib.OK)
+            self.assertEqual(state["remaining"], 51)
+
+    def test_idle_connection_closed(self):
+        self.start_server(num_workers=2, keep_alive=True)
+        self.server.KEEP_ALIVE_TIMEOUT = 0.1
+        connection = self.connect()
+        self.request_state(connection, "GET", "/state")
+        self.assertEqual(connection.sock.recv(1), b"")
+
+    def test_table_created_only_when_used(self):
+        self.start_server()
+        for path in ("/t/abc/find", "/t/abc/res/missing.png", "/t/abc/x"):
+            connection = self.connect()
+            connection.request("GET", path)
+            connection.getresponse().read()
+        self.assertEqual(len(self.server.tables), 0)
+
+        (response, state) = self.request_state(self.connect(), "GET",
+            "/t/abc/state")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(len(self.server.tables), 1)
+
+    def test_response_is_state_of_change(self):
+        self.start_server()
+        self.server.RequestHandlerClass = ConcurrentChangeHandler
+        (response, state) = self.request_state(self.connect(), "POST",
+            "/draw")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(state["remaining"], 51)
+        self.assertEqual(self.server.tables.default_table.snapshot.num_cards,
+            50)
+
+################################################################################
+
+class ConcurrentChangeHandler(QuietHttpServer.MyRequestHandler):
+    """
+    A request handler that draws another card, as if another request did,
+    after its own change has been published and before its response is sent.
+    """
+
+    def wait_for_log(self):
+        table = self.table
+        with table.deck:
+            table.deck.draw()
+            table.publish_snapshot(1)
+        return QuietHttpServer.MyRequestHandler.wait_for_log(self)
+
+################################################################################
+
+class Test_event_streams(HttpServerTestCase):
+    """
+    Tests of the "events" request of a running MyHttpServer
+    """
+
+    def test_streams_leave_workers_for_requests(self):
+        self.start_server(num_workers=2, keep_alive=True)
+        streams = []
+        for unused in range(2):
+            connection = self.connect()
+            connection.request("GET", "/events")
+            streams.append(connection.getresponse())
+        self.assertEqual(streams[0].status, httplib.OK)
+        self.assertEqual(streams[1].status, httplib.SERVICE_UNAVAILABLE)
+        self.assertTrue(streams[1].will_close)
+
+        (response, state) = self.request_state(self.connect(), "POST",
+            "/draw")
+        self.assertEqual(response.status, httplib.OK)
+        self.assertEqual(state["remaining"], 51)
+
+        lines = []
+        while "event: draw\n" not in lines:
+            lines.append(streams[0].fp.readline())
+
+    def test_no_workers(self):
+        self.start_server()
+        connection = self.connect()
+        connection.request("GET", "/events")
+        self.assertEqual(connection.getresponse().status,
+            httplib.SERVICE_UNAVAILABLE)
+
+    def test_max_event_streams_too_large(self):
+        with self.assertRaises(ValueError):
+            QuietHttpServer(0, num_workers=2, max_event_streams=2)
@@ -0,0 +1,113 @@
+import json
+import unittest
+
+from cards import Card
+from cards import MyHttpServer
+
+MyRequestHandler = MyHttpServer.MyRequestHandler
+
+################################################################################
+
+class Test_choose_state_format(unittest.TestCase):
+    """
+    Unit tests for MyRequestHandler.choose_state_format()
+    """
+
+    def test_default_is_xml(self):
+        self.assertEqual(MyRequestHandler.choose_state_format(""), "xml")
+        self.assertEqual(MyRequestHandler.choose_state_format("*/*"), "xml")
+        self.assertEqual(MyRequestHandler.choose_state_format("text/html"),
+            "xml")
+
+    def test_json(self):
+        self.assertEqual(
+            MyRequestHandler.choose_state_format("application/json"), "json")
+        self.assertEqual(
+            MyRequestHandler.choose_state_format("text/html, APPLICATION/JSON"),
+            "json")
+
+    def test_binary(self):
+        self.assertEqual(
+            MyRequestHandler.choose_state_format("application/octet-stream"),
+            "binary")
+
+    def test_first_match_wins(self):
+        self.assertEqual(MyRequestHandler.choose_state_format(
+            "text/xml, application/json"), "xml")
+        self.assertEqual(MyRequestHandler.choose_state_format(
+            "application/octet-stream;q=0.5, application/json"), "binary")
+
+    def test_quality_zero(self):
+        self.assertEqual(MyRequestHandler.choose_state_format(
+            "application/json;q=0, application/octet-stream"), "binary")
+        self.assertEqual(MyRequestHandler.choose_state_format(
+            "application/json; q=0.0"), "xml")
+
+################################################################################
+
+class Test_encode_state_json(unittest.TestCase):
+    """
+    Unit tests for MyRequestHandler.encode_state_json()
+    """
+
+    def test_card(self):
+        card = Card(Card.HEART, 12)
+        actual = json.loads(MyRequestHandler.encode_state_json(card, 40,
+            "hello"))
+        expected = {
+            "version": MyRequestHandler.STATE_VERSION,
+            "discard": card.code,
+            "remaining": 40,
+            "message": "hello",
+        }
+        self.assertDictEqual(actual, expected)
+
+    def test_no_card(self):
+        actual = json.loads(MyRequestHandler.encode_state_json(None, 52, None))
+        self.assertIsNone(actual["discard"])
+        self.assertIsNone(actual["message"])
+        self.assertNotIn("hands", actual)
+
+    def test_hands(self):
+        hands = [[Card.from_code(1), Card.from_code(2)], [Card.from_code(3)]]
+        actual = json.loads(MyRequestHandler.encode_state_json(hands[-1][-1],
+            40, None, hands))
+        self.assertListEqual(actual["hands"], [[1, 2], [3]])
+
+################################################################################
+
+class Test_encode_state_binary(unittest.TestCase):
+    """
+    Unit tests for MyRequestHandler.encode_state_binary()
+    """
+
+    def unpack(self, data):
+        return MyRequestHandler.STATE_STRUCT.unpack(data)
+
+    def test_card(self):
+        card = Card(Card.SPADE, 1)
+        data = MyRequestHandler.encode_state_binary(card, 51, None)
+        self.assertEqual(len(data), 5)
+        self.assertEqual(self.unpack(data),
+            (MyRequestHandler.STATE_VERSION, card.code, 51, 0))
+
+    def test_no_card(self):
+        data = MyRequestHandler.encode_state_binary(None, 0, None)
+        self.assertEqual(self.unpack(data)[1], MyRequestHandler.STATE_NO_CARD)
+
+    def test_messages(self):
+        for (index, message) in enumerate(MyRequestHandler.STATE_MESSAGES):
+            data = MyRequestHandler.encode_state_binary(None, 52, message)
+            self.assertEqual(self.unpack(data)[3], index)
+
+    def test_hands(self):
+        hands = [[Card.from_code(1), Card.from_code(2)], [Card.from_code(3)]]
+        data = MyRequestHandler.encode_state_binary(None, 40, None, hands)
+        size = MyRequestHandler.STATE_STRUCT.size
+        self.assertEqual(self.unpack(data[:size])[2], 40)
+        self.assertEqual(data[size:], b"\x02\x02\x01\x02\x01\x03")
+
+    def test_other_message(self):
+        data = MyRequestHandler.encode_state_binary(None, 52, "foo")
+        self.assertEqual(self.unpack(data)[3],
+            MyRequestHandler.STATE_OTHER_MESSAGE)
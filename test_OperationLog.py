@@ -0,0 +1,349 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from cards import Card
+from cards import FACTORY_CODES
+from cards import OperationLog
+from cards import TableRegistry
+
+################################################################################
+
+class OperationLogTestCase(unittest.TestCase):
+    """
+    Base class for the unit tests of OperationLog, which provides a temporary
+    directory for the files.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.logs = []
+
+    def tearDown(self):
+        for log in self.logs:
+            log.close()
+        shutil.rmtree(self.directory)
+
+    def load(self, seed=None, **kwargs):
+        """
+        Creates an OperationLog for the temporary directory and loads it into
+        a new TableRegistry with the given seed.  Returns a tuple (log,
+        registry).
+        """
+        log = OperationLog(self.directory, **kwargs)
+        self.logs.append(log)
+        registry = TableRegistry(seed=seed)
+        log.load(registry)
+        return (log, registry)
+
+    def crash(self, log):
+        """
+        Stops the given log as if the process stopped, without taking the
+        final snapshot, after waiting for its records to be written.
+        """
+        log.wait(log.appended_sequence, 5)
+        with log.condition:
+            log.closed = True
+            log.condition.notify_all()
+        log.thread.join()
+        log.thread = None
+        log.segment_file.close()
+
+    def draw(self, log, table):
+        with table.deck:
+            table.discard = table.deck.draw()
+            return log.append_draw(table, table.publish_snapshot())
+
+    def shuffle(self, log, table):
+        with table.deck:
+            table.deck.shuffle()
+            return log.append_state(table, table.publish_snapshot())
+
+################################################################################
+
+class Test_load(OperationLogTestCase):
+    """
+    Unit tests for OperationLog.load()
+    """
+
+    def test_empty_directory(self):
+        (log, registry) = self.load()
+        self.assertEqual(len(registry), 0)
+        self.assertEqual(registry.default_table.snapshot.version, 0)
+
+    def test_creates_directory(self):
+        self.directory = os.path.join(self.directory, "a", "b")
+        self.load()
+        self.assertTrue(os.path.isdir(self.directory))
+        self.directory = os.path.dirname(os.path.dirname(self.directory))
+
+    def test_replays_log(self):
+        (log, registry) = self.load()
+        table_a = registry.get("a")
+        self.shuffle(log, table_a)
+        self.draw(log, table_a)
+        self.draw(log, registry.get("b"))
+        self.draw(log, registry.default_table)
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        for table_id in ("a", "b", TableRegistry.DEFAULT_TABLE_ID):
+            expected = registry.get(table_id)
+            actual = registry2.get(table_id)
+            self.assertEqual(actual.snapshot.version,
+                expected.snapshot.version)
+            self.assertEqual(actual.snapshot.codes, expected.snapshot.codes)
+            self.assertEqual(actual.discard, expected.discard)
+            self.assertListEqual(list(actual.deck), list(expected.deck))
+
+    def test_replays_draw_many(self):
+        (log, registry) = self.load()
+        table = registry.get("a")
+        with table.deck:
+            cards = table.deck.draw_many(5)
+            table.discard = cards[-1]
+            log.append_draw(table, table.publish_snapshot(), 5)
+        self.draw(log, table)
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        actual = registry2.get("a")
+        self.assertEqual(actual.snapshot.version, 2)
+        self.assertListEqual(list(actual.deck), list(table.deck))
+        self.assertEqual(actual.discard, table.discard)
+
+    def test_deleted_table(self):
+        (log, registry) = self.load()
+        registry.max_tables = 1
+        self.draw(log, registry.get("a"))
+        registry.get("b")
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        self.assertEqual(registry2.get("a").snapshot.version, 0)
+        self.assertEqual(registry2.get("a").snapshot.codes, FACTORY_CODES)
+
+    def test_changes_after_delete_ignored(self):
+        (log, registry) = self.load()
+        registry.max_tables = 1
+        table_a = registry.get("a")
+        self.draw(log, table_a)
+        registry.get("b")
+        # a request that still has the discarded table changes it after a
+        # table with the same ID was created again
+        table_a2 = registry.get("a")
+        self.shuffle(log, table_a)
+        self.draw(log, table_a2)
+        self.shuffle(log, table_a)
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        actual = registry2.get("a")
+        self.assertEqual(actual.incarnation, table_a2.incarnation)
+        self.assertEqual(actual.snapshot.version, 1)
+        self.assertListEqual(list(actual.deck), list(table_a2.deck))
+        self.assertGreater(registry2.get("c").incarnation,
+            table_a2.incarnation)
+
+    def test_changes_after_delete_and_snapshot_ignored(self):
+        (log, registry) = self.load(snapshot_interval=10**9)
+        registry.max_tables = 1
+        table_a = registry.get("a")
+        self.draw(log, table_a)
+        registry.get("b")
+        log.wait(log.appended_sequence, 5)
+        log._write_snapshot()
+        self.shuffle(log, table_a)
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        self.assertEqual(len(registry2), 0)
+        self.assertEqual(registry2.get("a").snapshot.version, 0)
+        self.assertGreater(registry2.get("a").incarnation,
+            table_a.incarnation)
+
+    def test_torn_record_ignored(self):
+        (log, registry) = self.load()
+        table = registry.get("a")
+        self.draw(log, table)
+        self.draw(log, table)
+        self.crash(log)
+        path = log._segment_path(log.segment_number)
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 1)
+
+        (unused, registry2) = self.load()
+        self.assertEqual(registry2.get("a").snapshot.version, 1)
+        self.assertEqual(len(registry2.get("a").deck), 51)
+
+    def test_corrupt_record_ignored(self):
+        (log, registry) = self.load()
+        table = registry.get("a")
+        self.draw(log, table)
+        self.draw(log, table)
+        self.crash(log)
+        path = log._segment_path(log.segment_number)
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"x")
+
+        (unused, registry2) = self.load()
+        self.assertEqual(registry2.get("a").snapshot.version, 1)
+
+    def test_restored_tables_created_when_used(self):
+        (log, registry) = self.load()
+        self.draw(log, registry.get("a"))
+        log.close()
+
+        (unused, registry2) = self.load()
+        self.assertEqual(len(registry2), 0)
+        self.assertEqual(registry2.get("a").snapshot.version, 1)
+        self.assertEqual(len(registry2), 1)
+
+################################################################################
+
+class Test_snapshot(OperationLogTestCase):
+    """
+    Unit tests for the snapshots taken by OperationLog
+    """
+
+    def test_close_takes_snapshot(self):
+        (log, registry) = self.load()
+        self.shuffle(log, registry.get("a"))
+        log.close()
+        filenames = sorted(os.listdir(self.directory))
+        self.assertEqual(filenames, sorted([log.SNAPSHOT_FILENAME,
+            os.path.basename(log._segment_path(log.segment_number))]))
+
+        (unused, registry2) = self.load()
+        self.assertEqual(registry2.get("a").snapshot.codes,
+            registry.get("a").snapshot.codes)
+
+    def test_snapshot_interval(self):
+        (log, registry) = self.load(snapshot_interval=3)
+        table = registry.get("a")
+        for unused in range(3):
+            log.wait(self.draw(log, table), 5)
+        segment_number = log.segment_number
+        self.draw(log, table)
+        self.crash(log)
+        self.assertGreater(segment_number, 1)
+        self.assertFalse(os.path.exists(log._segment_path(1)))
+
+        (unused, registry2) = self.load()
+        self.assertEqual(registry2.get("a").snapshot.version, 4)
+        self.assertEqual(len(registry2.get("a").deck), 48)
+
+    def test_saved_states_in_snapshot(self):
+        (log, registry) = self.load()
+        self.draw(log, registry.get("a"))
+        log.close()
+        (log2, unused) = self.load()
+        log2.close()
+
+        (unused, registry3) = self.load()
+        self.assertEqual(registry3.get("a").snapshot.version, 1)
+
+    def test_idle_saved_states_discarded(self):
+        (log, registry) = self.load()
+        self.draw(log, registry.get("a"))
+        self.draw(log, registry.get("b"))
+        registry.get("a").last_used -= registry.idle_timeout + 60
+        log.close()
+
+        (unused, registry2) = self.load()
+        self.assertListEqual(list(registry2.saved_states), ["b"])
+        self.assertEqual(registry2.get("a").snapshot.version, 0)
+        self.assertEqual(registry2.get("b").snapshot.version, 1)
+
+    def test_skips_records_in_snapshot(self):
+        (log, registry) = self.load(snapshot_interval=10**9)
+        table = registry.get("a")
+        self.draw(log, table)
+        log.wait(self.draw(log, table), 5)
+        log._write_snapshot()
+        # a record that is in both the snapshot and the new log file
+        log.append_draw(table, table.snapshot)
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        self.assertEqual(registry2.get("a").snapshot.version, 2)
+        self.assertEqual(len(registry2.get("a").deck), 50)
+
+    def test_rng_counter(self):
+        (log, registry) = self.load(seed=1)
+        self.shuffle(log, registry.get("a"))
+        log.close()
+        counter = registry.get("a").deck.rng.counter
+        self.assertGreater(counter, 0)
+
+        (unused, registry2) = self.load(seed=1)
+        self.assertEqual(registry2.get("a").deck.rng.counter, counter)
+
+################################################################################
+
+class Test_wait(OperationLogTestCase):
+    """
+    Unit tests for OperationLog.wait()
+    """
+
+    def test_wait(self):
+        (log, registry) = self.load()
+        sequence = self.draw(log, registry.get("a"))
+        self.assertTrue(log.wait(sequence, 5))
+        self.assertGreaterEqual(log.committed_sequence, sequence)
+
+    def test_closed(self):
+        (log, registry) = self.load()
+        log.close()
+        self.assertFalse(log.wait(log.appended_sequence + 1))
+
+    def test_snapshot_error(self):
+        (log, registry) = self.load(snapshot_interval=1)
+        # a directory in the way of the snapshot makes writing it fail
+        os.mkdir(os.path.join(self.directory, log.SNAPSHOT_FILENAME + ".tmp"))
+        table = registry.get("a")
+        self.assertTrue(log.wait(self.draw(log, table), 5))
+        log.thread.join(5)
+        self.assertFalse(log.thread.is_alive())
+        self.assertIsInstance(log.error, (IOError, OSError))
+
+        self.assertFalse(log.wait(self.draw(log, table)))
+        self.assertEqual(log.pending, [])
+
+################################################################################
+
+class Test_append_state(OperationLogTestCase):
+    """
+    Unit tests for OperationLog.append_state()
+    """
+
+    def test_rng_counter(self):
+        (log, registry) = self.load(seed=1)
+        table = registry.get("a")
+        self.shuffle(log, table)
+        self.crash(log)
+
+        (unused, registry2) = self.load(seed=1)
+        table2 = registry2.get("a")
+        self.assertEqual(table2.deck.rng.counter, table.deck.rng.counter)
+        self.assertEqual(table2.snapshot.rng_counter, table.deck.rng.counter)
+        # the next shuffle continues the sequence instead of repeating it
+        for x in (table, table2):
+            x.deck.shuffle()
+        self.assertEqual(table2.deck, table.deck)
+
+    def test_empty_deck(self):
+        (log, registry) = self.load()
+        table = registry.get("a")
+        with table.deck:
+            del table.deck[:]
+            table.discard = Card.from_code(0)
+            log.append_state(table, table.publish_snapshot())
+        self.crash(log)
+
+        (unused, registry2) = self.load()
+        table2 = registry2.get("a")
+        self.assertEqual(len(table2.deck), 0)
+        self.assertEqual(table2.discard, Card.from_code(0))
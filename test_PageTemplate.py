@@ -0,0 +1,64 @@
+import unittest
+
+from cards import PageTemplate
+
+################################################################################
+
+class Test_render(unittest.TestCase):
+    """
+    Unit tests for PageTemplate.__init__() and render()
+    """
+
+    def test_no_placeholders(self):
+        x = PageTemplate(u"<html></html>")
+        self.assertEqual(x.render(), b"<html></html>")
+
+    def test_placeholders(self):
+        x = PageTemplate(u"<a>{{one}}</a><b>{{two}}</b>{{one}}")
+        actual = x.render(one=u"1", two=u"2")
+        self.assertEqual(actual, b"<a>1</a><b>2</b>1")
+
+    def test_placeholder_at_start_and_end(self):
+        x = PageTemplate(u"{{a}}-{{b}}")
+        self.assertEqual(x.render(a=u"x", b=u"y"), b"x-y")
+
+    def test_unicode(self):
+        x = PageTemplate(u"\u2660 {{suit}}")
+        actual = x.render(suit=u"\u2665")
+        self.assertEqual(actual, u"\u2660 \u2665".encode("UTF-8"))
+
+    def test_single_braces_are_not_placeholders(self):
+        x = PageTemplate(u"function f() { return {a: 1}; }")
+        self.assertEqual(x.render(), b"function f() { return {a: 1}; }")
+
+    def test_values_not_escaped(self):
+        x = PageTemplate(u"{{html}}")
+        self.assertEqual(x.render(html=u"<b>&</b>"), b"<b>&</b>")
+
+    def test_missing_value(self):
+        x = PageTemplate(u"{{a}}")
+        with self.assertRaises(KeyError):
+            x.render()
+
+    def test_extra_values_ignored(self):
+        x = PageTemplate(u"{{a}}")
+        self.assertEqual(x.render(a=u"1", b=u"2"), b"1")
+
+################################################################################
+
+class Test_escape(unittest.TestCase):
+    """
+    Unit tests for PageTemplate.escape()
+    """
+
+    def test_special_characters(self):
+        actual = PageTemplate.escape("<a href=\"x\" title='y'>&</a>")
+        expected = ("&lt;a href=&quot;x&quot; title=&apos;y&apos;&gt;"
+            "&amp;&lt;/a&gt;")
+        self.assertEqual(actual, expected)
+
+    def test_no_special_characters(self):
+        self.assertEqual(PageTemplate.escape("ace of spades"), "ace of spades")
+
+    def test_ampersand_escaped_first(self):
+        self.assertEqual(PageTemplate.escape("&lt;"), "&amp;lt;")
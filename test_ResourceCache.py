@@ -0,0 +1,179 @@
+import email.utils
+import gzip
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+
+from cards import ResourceCache
+
+################################################################################
+
+class ResourceCacheTestCase(unittest.TestCase):
+    """
+    Base class for unit tests of ResourceCache, which creates a temporary
+    directory of files to cache.
+    """
+
+    FILES = {
+        "a.png": "\x89PNG" + "".join(chr(i) for i in range(256)),
+        "b.svg": "<svg>" + ("<rect/>" * 1000) + "</svg>",
+        "c.unknownext": "hello",
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for (filename, data) in self.FILES.items():
+            with open(os.path.join(self.directory, filename), "wb") as f:
+                f.write(data)
+        os.mkdir(os.path.join(self.directory, "subdir"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+################################################################################
+
+class Test__init__(ResourceCacheTestCase):
+    """
+    Unit tests for ResourceCache.__init__() and get()
+    """
+
+    def test_caches_files(self):
+        x = ResourceCache(self.directory)
+        self.assertSetEqual(set(x.entries), set(self.FILES))
+        for (filename, data) in self.FILES.items():
+            self.assertEqual(x.get(filename).data, data)
+        self.assertIsNone(x.get("subdir"))
+        self.assertIsNone(x.get("missing.png"))
+
+    def test_max_size(self):
+        x = ResourceCache(self.directory, max_size=300, compress=False)
+        self.assertSetEqual(set(x.entries), set(["a.png", "c.unknownext"]))
+        self.assertLessEqual(x.size, 300)
+
+    def test_missing_directory(self):
+        x = ResourceCache(os.path.join(self.directory, "missing"))
+        self.assertDictEqual(x.entries, {})
+
+    def test_size(self):
+        x = ResourceCache(self.directory)
+        expected = sum(entry.size for entry in x.entries.values())
+        self.assertEqual(x.size, expected)
+
+################################################################################
+
+class Test_Entry(ResourceCacheTestCase):
+    """
+    Unit tests for ResourceCache.Entry
+    """
+
+    def test_content_type(self):
+        x = ResourceCache(self.directory)
+        self.assertEqual(x.get("a.png").content_type, "image/png")
+        self.assertEqual(x.get("b.svg").content_type, "image/svg+xml")
+        self.assertEqual(x.get("c.unknownext").content_type,
+            "application/octet-stream")
+
+    def test_etag(self):
+        x = ResourceCache(self.directory)
+        etags = set(entry.etag for entry in x.entries.values())
+        self.assertEqual(len(etags), len(self.FILES))
+        for etag in etags:
+            self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+
+    def test_etag_depends_only_on_data(self):
+        x1 = ResourceCache(self.directory)
+        x2 = ResourceCache(self.directory)
+        self.assertEqual(x1.get("a.png").etag, x2.get("a.png").etag)
+
+    def test_gzip(self):
+        x = ResourceCache(self.directory)
+        entry = x.get("b.svg")
+        self.assertIsNotNone(entry.gzip_data)
+        self.assertNotEqual(entry.gzip_etag, entry.etag)
+        f = gzip.GzipFile(fileobj=StringIO.StringIO(entry.gzip_data))
+        self.assertEqual(f.read(), self.FILES["b.svg"])
+
+    def test_gzip_not_smaller(self):
+        x = ResourceCache(self.directory)
+        entry = x.get("c.unknownext")
+        self.assertIsNone(entry.gzip_data)
+        self.assertIsNone(entry.gzip_etag)
+
+    def test_no_compress(self):
+        x = ResourceCache(self.directory, compress=False)
+        self.assertIsNone(x.get("b.svg").gzip_data)
+
+################################################################################
+
+class Test_is_not_modified(ResourceCacheTestCase):
+    """
+    Unit tests for ResourceCache.Entry.is_not_modified()
+    """
+
+    def setUp(self):
+        ResourceCacheTestCase.setUp(self)
+        self.entry = ResourceCache(self.directory).get("b.svg")
+
+    def test_no_headers(self):
+        self.assertFalse(self.entry.is_not_modified(None, None))
+
+    def test_if_none_match(self):
+        entry = self.entry
+        self.assertTrue(entry.is_not_modified(entry.etag, None))
+        self.assertTrue(entry.is_not_modified('"x", ' + entry.etag, None))
+        self.assertTrue(entry.is_not_modified("W/" + entry.etag, None))
+        self.assertTrue(entry.is_not_modified("*", None))
+        self.assertFalse(entry.is_not_modified('"x"', None))
+        self.assertFalse(entry.is_not_modified("", None))
+
+    def test_if_none_match_gzip(self):
+        entry = self.entry
+        self.assertTrue(entry.is_not_modified(entry.gzip_etag, None, True))
+        self.assertFalse(entry.is_not_modified(entry.etag, None, True))
+        self.assertFalse(entry.is_not_modified(entry.gzip_etag, None))
+
+    def test_if_modified_since(self):
+        entry = self.entry
+        self.assertTrue(entry.is_not_modified(None, entry.last_modified))
+        later = email.utils.formatdate(entry.mtime + 60, usegmt=True)
+        self.assertTrue(entry.is_not_modified(None, later))
+        earlier = email.utils.formatdate(entry.mtime - 60, usegmt=True)
+        self.assertFalse(entry.is_not_modified(None, earlier))
+        self.assertFalse(entry.is_not_modified(None, "garbage"))
+
+    def test_if_none_match_takes_precedence(self):
+        entry = self.entry
+        self.assertFalse(entry.is_not_modified('"x"', entry.last_modified))
+
+################################################################################
+
+class Test_load_entry(ResourceCacheTestCase):
+    """
+    Unit tests for ResourceCache.load_entry()
+    """
+
+    def test_file(self):
+        x = ResourceCache(self.directory, max_size=0)
+        self.assertIsNone(x.get("a.png"))
+        entry = x.load_entry("a.png")
+        self.assertEqual(entry.data, self.FILES["a.png"])
+        self.assertIsNone(x.get("a.png"))
+
+    def test_no_digest(self):
+        x = ResourceCache(self.directory, max_size=0)
+        entry = x.load_entry("b.svg", digest=False)
+        self.assertEqual(entry.data, self.FILES["b.svg"])
+        self.assertIsNone(entry.gzip_data)
+        self.assertEqual(entry.etag, '"{:x}-{:x}"'.format(entry.mtime,
+            len(self.FILES["b.svg"])))
+
+    def test_missing(self):
+        x = ResourceCache(self.directory)
+        self.assertIsNone(x.load_entry("missing.png"))
+
+    def test_unsafe_filenames(self):
+        x = ResourceCache(os.path.join(self.directory, "subdir"))
+        for filename in ("../a.png", "..", ".", "", "subdir/../../a.png"):
+            self.assertIsNone(x.load_entry(filename))
@@ -0,0 +1,70 @@
+import httplib
+import unittest
+
+from cards import ResponseBuilder
+
+################################################################################
+
+class Test__init__(unittest.TestCase):
+    """
+    Unit tests for ResponseBuilder.__init__()
+    """
+
+    def test_noargs(self):
+        x = ResponseBuilder()
+        self.assertEqual(x.status, httplib.OK)
+        self.assertIsNone(x.reason)
+        self.assertListEqual(x.headers, [])
+        self.assertEqual(x.size, 0)
+        self.assertEqual(x.getvalue(), b"")
+
+    def test_status(self):
+        x = ResponseBuilder(httplib.NOT_FOUND, "Gone Fishing")
+        self.assertEqual(x.status, httplib.NOT_FOUND)
+        self.assertEqual(x.reason, "Gone Fishing")
+
+################################################################################
+
+class Test_add_header(unittest.TestCase):
+    """
+    Unit tests for ResponseBuilder.add_header()
+    """
+
+    def test_keeps_order(self):
+        x = ResponseBuilder()
+        x.add_header("Content-Type", "text/xml")
+        x.add_header("Cache-Control", "no-cache")
+        self.assertListEqual(x.headers,
+            [("Content-Type", "text/xml"), ("Cache-Control", "no-cache")])
+
+################################################################################
+
+class Test_write(unittest.TestCase):
+    """
+    Unit tests for ResponseBuilder.write(), write_escaped() and write_bytes()
+    """
+
+    def test_write(self):
+        x = ResponseBuilder()
+        x.write("abc")
+        x.write("def", newline=False)
+        self.assertEqual(x.getvalue(), b"abc\ndef")
+        self.assertEqual(x.size, 7)
+
+    def test_write_encodes_utf8(self):
+        x = ResponseBuilder()
+        x.write(u"\u2660", newline=False)
+        self.assertEqual(x.getvalue(), b"\xe2\x99\xa0")
+        self.assertEqual(x.size, 3)
+
+    def test_write_escaped(self):
+        x = ResponseBuilder()
+        x.write_escaped("<a&b>")
+        self.assertEqual(x.getvalue(), b"&lt;a&amp;b&gt;\n")
+
+    def test_write_bytes(self):
+        x = ResponseBuilder()
+        x.write_bytes(b"\x89PNG")
+        x.write_bytes(b"\x00")
+        self.assertEqual(x.getvalue(), b"\x89PNG\x00")
+        self.assertEqual(x.size, 5)
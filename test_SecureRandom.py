@@ -0,0 +1,199 @@
+import os
+import pickle
+import unittest
+
+from cards import CompactDeck
+from cards import Deck
+from cards import SECURE_RANDOM
+from cards import SecureRandom
+from cards import Shoe
+from cards import TableRegistry
+
+################################################################################
+
+class Test__init__(unittest.TestCase):
+    """
+    Unit tests for SecureRandom.__init__()
+    """
+
+    def test_does_not_read(self):
+        x = SecureRandom()
+        self.assertEqual(x.metrics.bytes_read, 0)
+
+    def test_buffer_size(self):
+        self.assertEqual(SecureRandom().buffer_size,
+            SecureRandom.DEFAULT_BUFFER_SIZE)
+        self.assertEqual(SecureRandom(buffer_size=10).buffer_size, 8)
+        self.assertEqual(SecureRandom(buffer_size=1).buffer_size, 4)
+
+    def test_state(self):
+        x = SecureRandom()
+        x.seed(5)
+        with self.assertRaises(NotImplementedError):
+            x.getstate()
+        with self.assertRaises(NotImplementedError):
+            x.setstate(None)
+
+    def test_pickle(self):
+        x = pickle.loads(pickle.dumps(SecureRandom(buffer_size=64)))
+        self.assertIsInstance(x, SecureRandom)
+        self.assertEqual(x.buffer_size, 64)
+
+################################################################################
+
+class Test_random(unittest.TestCase):
+    """
+    Unit tests for SecureRandom.random(), getrandbits(), _randbelow() and
+    randrange()
+    """
+
+    def test_random(self):
+        x = SecureRandom(buffer_size=16)
+        values = [x.random() for unused in range(100)]
+        for value in values:
+            self.assertGreaterEqual(value, 0.0)
+            self.assertLess(value, 1.0)
+        self.assertGreater(len(set(values)), 90)
+        self.assertEqual(x.metrics.words_used, 200)
+        self.assertEqual(x.metrics.bytes_read, 800)
+        self.assertEqual(x.metrics.num_reads, 50)
+
+    def test_getrandbits(self):
+        x = SecureRandom()
+        for k in (1, 31, 32, 33, 100):
+            value = x.getrandbits(k)
+            self.assertGreaterEqual(value, 0)
+            self.assertLess(value, 1 << k)
+
+    def test_getrandbits_zero(self):
+        with self.assertRaises(ValueError):
+            SecureRandom().getrandbits(0)
+
+    def test_randbelow(self):
+        x = SecureRandom()
+        values = set(x._randbelow(3) for unused in range(200))
+        self.assertSetEqual(values, set([0, 1, 2]))
+        self.assertEqual(x._randbelow(1), 0)
+
+    def test_randint(self):
+        x = SecureRandom()
+        values = set(x.randint(1, 3) for unused in range(200))
+        self.assertSetEqual(values, set([1, 2, 3]))
+
+    def test_randrange_uses_randbelow(self):
+        x = SecureRandom()
+        x._randbelow = lambda n: n - 1
+        self.assertEqual(x.randrange(5), 4)
+        self.assertEqual(x.randrange(2, 5), 4)
+        self.assertEqual(x.randrange(0, 10, 3), 9)
+        self.assertEqual(x.randrange(10, 0, -3), 1)
+        self.assertEqual(x.randint(1, 3), 3)
+        self.assertEqual(x.choice("abc"), "c")
+
+    def test_randrange_invalid(self):
+        x = SecureRandom()
+        for args in ((0,), (3, 3), (1, 5, 0), (5, 1), (1.5,), (1, 2.5)):
+            with self.assertRaises(ValueError):
+                x.randrange(*args)
+        with self.assertRaises(IndexError):
+            x.choice([])
+
+################################################################################
+
+class Test_shuffle(unittest.TestCase):
+    """
+    Unit tests for SecureRandom.shuffle()
+    """
+
+    def test_permutation(self):
+        x = SecureRandom(buffer_size=16)
+        values = range(300)
+        x.shuffle(values)
+        self.assertListEqual(sorted(values), range(300))
+        self.assertNotEqual(values, range(300))
+
+    def test_small(self):
+        x = SecureRandom()
+        for n in (0, 1, 2):
+            values = range(n)
+            x.shuffle(values)
+            self.assertListEqual(sorted(values), range(n))
+
+    def test_uniform(self):
+        # each of the 6 orders of 3 elements should be about equally likely
+        x = SecureRandom()
+        counts = {}
+        for unused in range(6000):
+            values = [0, 1, 2]
+            x.shuffle(values)
+            counts[tuple(values)] = counts.get(tuple(values), 0) + 1
+        self.assertEqual(len(counts), 6)
+        for count in counts.values():
+            self.assertGreater(count, 800)
+            self.assertLess(count, 1200)
+
+    def test_metrics(self):
+        x = SecureRandom()
+        x.shuffle(range(52))
+        metrics = x.metrics
+        self.assertEqual(metrics.num_shuffles, 1)
+        self.assertEqual(metrics.cards_shuffled, 52)
+        self.assertGreaterEqual(metrics.words_used, 51)
+        self.assertEqual(metrics.words_used - metrics.words_rejected, 51)
+        actual = metrics.as_dict()
+        self.assertEqual(actual["num_shuffles"], 1)
+        self.assertIn("cards_per_second", actual)
+        self.assertIn("rejection_rate", actual)
+
+    def test_random_argument(self):
+        values = range(10)
+        SecureRandom().shuffle(values, lambda: 0.0)
+        self.assertListEqual(values, range(1, 10) + [0])
+
+    def test_forked_process_discards_buffer(self):
+        x = SecureRandom()
+        x.random()
+        x.pid = os.getpid() + 1 # as if this process were forked
+        x.random()
+        self.assertEqual(x.metrics.num_reads, 2)
+
+################################################################################
+
+class Test_secure(unittest.TestCase):
+    """
+    Unit tests for the "secure" arguments of Deck, Shoe, CompactDeck and
+    TableRegistry
+    """
+
+    def test_deck(self):
+        x = Deck(secure=True)
+        self.assertIs(x.rng, SECURE_RANDOM)
+        x.shuffle()
+        x.shuffle_riffle()
+        x.shuffle_3waycut()
+        self.assertListEqual(sorted(x), sorted(Deck()))
+
+    def test_shoe(self):
+        x = Shoe(num_decks=2, secure=True)
+        self.assertIs(x.rng, SECURE_RANDOM)
+        x.shuffle()
+        self.assertEqual(len(x), 104)
+
+    def test_compact_deck(self):
+        x = CompactDeck(secure=True)
+        self.assertIs(x.rng, SECURE_RANDOM)
+        x.shuffle()
+        self.assertEqual(len(x), 52)
+
+    def test_conflicting_arguments(self):
+        with self.assertRaises(ValueError):
+            Deck(seed=1, secure=True)
+        with self.assertRaises(ValueError):
+            CompactDeck(rng=SecureRandom(), secure=True)
+
+    def test_table_registry(self):
+        x = TableRegistry(secure=True)
+        self.assertIs(x.get("a").deck.rng, SECURE_RANDOM)
+        self.assertIs(x.default_table.deck.rng, SECURE_RANDOM)
+        with self.assertRaises(ValueError):
+            TableRegistry(seed=1, secure=True)
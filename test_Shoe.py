@@ -0,0 +1,170 @@
+import unittest
+
+from cards import Card
+from cards import Deck
+from cards import Shoe
+
+################################################################################
+
+class Test__init__(unittest.TestCase):
+    """
+    Unit tests for Shoe.__init__()
+    """
+
+    def test_noargs(self):
+        x = Shoe()
+        self.assertEqual(x.num_decks, 6)
+        self.assertEqual(x.num_cards, 312)
+        self.assertEqual(len(x), 312)
+        self.assertEqual(x.cut_card_position, 234)
+
+    def test_num_decks(self):
+        x = Shoe(num_decks=2)
+        self.assertEqual(len(x), 104)
+        self.assertListEqual(x, list(Deck.iter_cards()) * 2)
+
+    def test_cut_card_penetration(self):
+        x = Shoe(num_decks=1, cut_card_penetration=0.5)
+        self.assertEqual(x.cut_card_position, 26)
+
+    def test_is_deck(self):
+        self.assertIsInstance(Shoe(), Deck)
+
+################################################################################
+
+class Test_counts(unittest.TestCase):
+    """
+    Unit tests for Shoe.count_rank(), count_suit() and recount()
+    """
+
+    def test_full(self):
+        x = Shoe(num_decks=8)
+        for rank in range(1, 14):
+            self.assertEqual(x.count_rank(rank), 32)
+        for suit in (Card.SPADE, Card.HEART, Card.CLUB, Card.DIAMOND):
+            self.assertEqual(x.count_suit(suit), 104)
+
+    def test_draw(self):
+        x = Shoe(num_decks=2)
+        x.shuffle()
+        drawn = [x.draw() for unused in range(50)]
+        for rank in range(1, 14):
+            expected = 8 - sum(1 for card in drawn if card.rank == rank)
+            self.assertEqual(x.count_rank(rank), expected)
+        for suit in (Card.SPADE, Card.HEART, Card.CLUB, Card.DIAMOND):
+            expected = 26 - sum(1 for card in drawn if card.suit == suit)
+            self.assertEqual(x.count_suit(suit), expected)
+
+    def test_draw_many(self):
+        x = Shoe(num_decks=2)
+        x.shuffle()
+        drawn = x.draw_many(30)
+        for hand in x.deal(4, 5):
+            drawn.extend(hand)
+        for rank in range(1, 14):
+            expected = 8 - sum(1 for card in drawn if card.rank == rank)
+            self.assertEqual(x.count_rank(rank), expected)
+        x.recount()
+        self.assertEqual(sum(x.rank_counts), 104 - 50)
+
+    def test_shuffles_keep_counts(self):
+        x = Shoe(num_decks=1)
+        x.draw()
+        x.draw()
+        rank_counts = list(x.rank_counts)
+        suit_counts = dict(x.suit_counts)
+        x.shuffle()
+        x.shuffle_3waycut()
+        x.shuffle_riffle(times=3)
+        self.assertListEqual(x.rank_counts, rank_counts)
+        self.assertDictEqual(x.suit_counts, suit_counts)
+
+    def test_reset(self):
+        x = Shoe(num_decks=1)
+        for unused in range(52):
+            x.draw()
+        self.assertEqual(x.count_rank(1), 0)
+        x.reset()
+        self.assertEqual(x.count_rank(1), 4)
+        self.assertEqual(x.count_suit(Card.HEART), 13)
+
+    def test_recount(self):
+        x = Shoe(num_decks=1)
+        x[:] = [Card(Card.HEART, 10), Card(Card.SPADE, 10)]
+        x.recount()
+        self.assertEqual(x.count_rank(10), 2)
+        self.assertEqual(x.count_rank(1), 0)
+        self.assertEqual(x.count_suit(Card.HEART), 1)
+        self.assertEqual(x.count_suit(Card.CLUB), 0)
+
+    def test_list_mutations(self):
+        card = Card(Card.HEART, 10)
+        mutations = [
+            lambda x: x.pop(0),
+            lambda x: x.remove(card),
+            lambda x: x.__setitem__(0, card),
+            lambda x: x.__delitem__(slice(0, 5)),
+            lambda x: x.__delslice__(0, 5),
+            lambda x: x.append(card),
+            lambda x: x.extend([card, card]),
+            lambda x: x.__iadd__([card]),
+            lambda x: x.insert(3, card),
+        ]
+        for mutation in mutations:
+            x = Shoe(num_decks=1)
+            x.shuffle()
+            x.draw()
+            mutation(x)
+            for rank in range(1, 14):
+                expected = sum(1 for c in x if c.rank == rank)
+                self.assertEqual(x.count_rank(rank), expected)
+            for suit in (Card.SPADE, Card.HEART, Card.CLUB, Card.DIAMOND):
+                expected = sum(1 for c in x if c.suit == suit)
+                self.assertEqual(x.count_suit(suit), expected)
+            # draws after the recount keep the counts up to date
+            drawn = x.draw()
+            self.assertEqual(x.count_rank(drawn.rank),
+                sum(1 for c in x if c.rank == drawn.rank))
+
+    def test_draw_empty(self):
+        x = Shoe(num_decks=1)
+        x[:] = []
+        x.recount()
+        with self.assertRaises(IndexError):
+            x.draw()
+
+################################################################################
+
+class Test_penetration(unittest.TestCase):
+    """
+    Unit tests for Shoe.num_dealt, penetration and needs_shuffle
+    """
+
+    def test_full(self):
+        x = Shoe(num_decks=2)
+        self.assertEqual(x.num_dealt, 0)
+        self.assertEqual(x.penetration, 0.0)
+        self.assertFalse(x.needs_shuffle)
+
+    def test_partial(self):
+        x = Shoe(num_decks=2, cut_card_penetration=0.5)
+        for unused in range(51):
+            x.draw()
+        self.assertEqual(x.num_dealt, 51)
+        self.assertAlmostEqual(x.penetration, 51.0 / 104)
+        self.assertFalse(x.needs_shuffle)
+        x.draw()
+        self.assertTrue(x.needs_shuffle)
+        x.reset()
+        self.assertFalse(x.needs_shuffle)
+
+    def test_more_than_full(self):
+        x = Shoe(num_decks=1)
+        x.append(Card(Card.HEART, 10))
+        self.assertEqual(x.num_dealt, 0)
+        self.assertEqual(x.penetration, 0.0)
+
+    def test_empty_shoe(self):
+        x = Shoe(num_decks=0)
+        self.assertEqual(len(x), 0)
+        self.assertEqual(x.penetration, 0.0)
@@ -0,0 +1,189 @@
+import itertools
+import math
+import unittest
+
+from cards import SHUFFLE_METHODS
+from cards import ShuffleStatistics
+from cards import analyze_shuffles
+from cards import eulerian_numbers
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+################################################################################
+
+class Test_eulerian_numbers(unittest.TestCase):
+    """
+    Unit tests for eulerian_numbers()
+    """
+
+    def test_small(self):
+        self.assertListEqual(eulerian_numbers(0), [1])
+        self.assertListEqual(eulerian_numbers(1), [1])
+        self.assertListEqual(eulerian_numbers(4), [1, 11, 11, 1])
+        self.assertListEqual(eulerian_numbers(5), [1, 26, 66, 26, 1])
+
+    def test_sum_is_factorial(self):
+        self.assertEqual(sum(eulerian_numbers(52)), math.factorial(52))
+
+################################################################################
+
+class Test_add(unittest.TestCase):
+    """
+    Unit tests for ShuffleStatistics.add() and add_batch()
+    """
+
+    def test_identity(self):
+        x = ShuffleStatistics(4)
+        x.add([0, 1, 2, 3])
+        self.assertEqual(x.num_decks, 1)
+        self.assertListEqual(x.position_counts,
+            [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]])
+        self.assertEqual(x.mean_rising_sequences(), 1.0)
+        self.assertEqual(x.mean_adjacent_pairs(), 3.0)
+
+    def test_reversed(self):
+        x = ShuffleStatistics(4)
+        x.add([3, 2, 1, 0])
+        self.assertEqual(x.mean_rising_sequences(), 4.0)
+        self.assertEqual(x.mean_adjacent_pairs(), 0.0)
+
+    def test_cut(self):
+        # a cut leaves 2 rising sequences and all but one adjacent pair
+        x = ShuffleStatistics(5)
+        x.add([3, 4, 0, 1, 2])
+        self.assertListEqual(x.rising_sequence_counts, [0, 0, 1, 0, 0, 0])
+        self.assertListEqual(x.adjacent_pair_counts, [0, 0, 0, 1, 0])
+
+    def test_all_permutations_are_uniform(self):
+        x = ShuffleStatistics(5)
+        for perm in itertools.permutations(range(5)):
+            x.add(perm)
+        self.assertListEqual(x.rising_sequence_counts[1:], eulerian_numbers(5))
+        self.assertAlmostEqual(x.rising_sequence_distance(), 0.0)
+        self.assertAlmostEqual(x.position_distance(), 0.0)
+        self.assertAlmostEqual(x.mean_rising_sequences(), 3.0)
+        self.assertAlmostEqual(x.mean_adjacent_pairs(), 4.0 / 5)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_same_as_add(self):
+        perms = list(itertools.permutations(range(5)))[::7]
+        expected = ShuffleStatistics(5)
+        for perm in perms:
+            expected.add(perm)
+        x = ShuffleStatistics(5)
+        x.add_batch(numpy.array(perms, dtype=numpy.uint8))
+        self.assertEqual(x.num_decks, expected.num_decks)
+        self.assertListEqual(x.position_counts, expected.position_counts)
+        self.assertListEqual(x.rising_sequence_counts,
+            expected.rising_sequence_counts)
+        self.assertListEqual(x.adjacent_pair_counts,
+            expected.adjacent_pair_counts)
+
+################################################################################
+
+class Test_merge(unittest.TestCase):
+    """
+    Unit tests for ShuffleStatistics.merge()
+    """
+
+    def test_merge(self):
+        perms = list(itertools.permutations(range(4)))
+        expected = ShuffleStatistics(4)
+        x = ShuffleStatistics(4)
+        y = ShuffleStatistics(4)
+        for (index, perm) in enumerate(perms):
+            expected.add(perm)
+            (x if index % 3 else y).add(perm)
+        self.assertIs(x.merge(y), x)
+        self.assertEqual(x.num_decks, expected.num_decks)
+        self.assertListEqual(x.position_counts, expected.position_counts)
+        self.assertListEqual(x.rising_sequence_counts,
+            expected.rising_sequence_counts)
+        self.assertListEqual(x.adjacent_pair_counts,
+            expected.adjacent_pair_counts)
+
+    def test_different_cards(self):
+        with self.assertRaises(ValueError):
+            ShuffleStatistics(4).merge(ShuffleStatistics(5))
+
+################################################################################
+
+class Test_distances(unittest.TestCase):
+    """
+    Unit tests for ShuffleStatistics.position_distance() and
+    rising_sequence_distance()
+    """
+
+    def test_identity(self):
+        x = ShuffleStatistics(4)
+        x.add([0, 1, 2, 3])
+        # every card is at one position instead of at each with probability 1/4
+        self.assertAlmostEqual(x.position_distance(), 0.75)
+        # a uniform shuffle has 1 rising sequence with probability 1/24
+        self.assertAlmostEqual(x.rising_sequence_distance(), 23.0 / 24)
+
+    def test_probabilities(self):
+        x = ShuffleStatistics(3)
+        x.add([0, 1, 2])
+        x.add([2, 1, 0])
+        self.assertListEqual(x.position_probabilities()[0], [0.5, 0.0, 0.5])
+        self.assertListEqual(x.rising_sequence_probabilities(),
+            [0.0, 0.5, 0.0, 0.5])
+        self.assertListEqual(x.uniform_rising_sequence_probabilities(),
+            [0.0, 1.0 / 6, 4.0 / 6, 1.0 / 6])
+
+################################################################################
+
+class Test_analyze_shuffles(unittest.TestCase):
+    """
+    Unit tests for analyze_shuffles()
+    """
+
+    def use_numpy_values(self):
+        return (False, True) if numpy is not None else (False,)
+
+    def test_counts(self):
+        for use_numpy in self.use_numpy_values():
+            for method in SHUFFLE_METHODS:
+                statistics = analyze_shuffles(100, method, times=3, seed=1,
+                    num_cards=10, use_numpy=use_numpy)
+                self.assertEqual(len(statistics), 3)
+                for x in statistics:
+                    self.assertEqual(x.num_decks, 100)
+                    self.assertEqual(sum(x.rising_sequence_counts), 100)
+
+    def test_riffle_rising_sequences(self):
+        # each riffle at most doubles the number of rising sequences
+        for use_numpy in self.use_numpy_values():
+            statistics = analyze_shuffles(200, "riffle", times=3, seed=1,
+                use_numpy=use_numpy)
+            for (index, x) in enumerate(statistics):
+                self.assertEqual(sum(x.rising_sequence_counts[2 ** (index + 1)
+                    + 1:]), 0)
+            distances = [x.rising_sequence_distance() for x in statistics]
+            self.assertAlmostEqual(distances[0], 1.0)
+
+    def test_random_is_close_to_uniform(self):
+        for use_numpy in self.use_numpy_values():
+            (x,) = analyze_shuffles(5000, "random", seed=1, num_cards=6,
+                use_numpy=use_numpy)
+            self.assertLess(x.rising_sequence_distance(), 0.05)
+            self.assertLess(x.position_distance(), 0.05)
+
+    def test_progress(self):
+        decks = []
+        analyze_shuffles(10, "random", seed=1, progress=decks.append)
+        self.assertEqual(decks[-1], 10)
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            analyze_shuffles(10, "foo")
+
+    def test_3waycut_too_few_cards(self):
+        for use_numpy in self.use_numpy_values():
+            with self.assertRaises(ValueError):
+                analyze_shuffles(10, "3waycut", num_cards=2,
+                    use_numpy=use_numpy)
@@ -0,0 +1,80 @@
+import unittest
+
+from cards import Card
+from cards import CompactDeck
+from cards import Deck
+from cards import StateSnapshot
+from cards import Table
+
+################################################################################
+
+class Test__init__(unittest.TestCase):
+    """
+    Unit tests for StateSnapshot.__init__()
+    """
+
+    def test_full_deck(self):
+        deck = Deck()
+        x = StateSnapshot(3, deck, None)
+        self.assertEqual(x.version, 3)
+        self.assertEqual(x.num_cards, 52)
+        self.assertIsNone(x.discard)
+        self.assertFalse(x.empty)
+        self.assertEqual(x.codes, bytes(bytearray(card.code for card in deck)))
+
+    def test_empty_deck(self):
+        card = Card(Card.SPADE, 1)
+        x = StateSnapshot(0, Deck([]), card)
+        self.assertEqual(x.num_cards, 0)
+        self.assertIs(x.discard, card)
+        self.assertTrue(x.empty)
+
+    def test_copies_deck(self):
+        deck = Deck()
+        x = StateSnapshot(0, deck, None)
+        deck.draw()
+        self.assertEqual(x.num_cards, 52)
+        self.assertEqual(len(x.codes), 52)
+
+    def test_immutable(self):
+        x = StateSnapshot(0, Deck(), None)
+        with self.assertRaises(AttributeError):
+            x.version = 1
+        with self.assertRaises(AttributeError):
+            del x.discard
+
+################################################################################
+
+class Test_publish_snapshot(unittest.TestCase):
+    """
+    Unit tests for Table.snapshot and Table.publish_snapshot()
+    """
+
+    def test_initial_snapshot(self):
+        table = Table("a")
+        self.assertEqual(table.snapshot.version, 0)
+        self.assertEqual(table.snapshot.num_cards, 52)
+
+    def test_publish(self):
+        table = Table("a")
+        old_snapshot = table.snapshot
+        with table.deck:
+            table.discard = table.deck.draw()
+            snapshot = table.publish_snapshot()
+        self.assertIs(table.snapshot, snapshot)
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual(snapshot.num_cards, 51)
+        self.assertIs(snapshot.discard, table.discard)
+        self.assertEqual(old_snapshot.num_cards, 52)
+
+    def test_publish_draw(self):
+        table = Table("a")
+        with table.deck:
+            table.deck.shuffle()
+            table.publish_snapshot()
+            cards = table.deck.draw_many(3)
+            table.discard = cards[-1]
+            snapshot = table.publish_snapshot(3)
+        self.assertEqual(snapshot.version, 2)
+        self.assertEqual(snapshot.num_cards, 49)
+        self.assertEqual(snapshot.codes, bytes(CompactDeck.encode(table.deck)))
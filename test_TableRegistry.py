@@ -0,0 +1,175 @@
+import time
+import unittest
+
+from cards import Deck
+from cards import FACTORY_CODES
+from cards import Table
+from cards import TableRegistry
+
+################################################################################
+
+class Test_get(unittest.TestCase):
+    """
+    Unit tests for TableRegistry.get()
+    """
+
+    def test_creates_table(self):
+        x = TableRegistry()
+        table = x.get("abc")
+        self.assertIsInstance(table, Table)
+        self.assertEqual(table.table_id, "abc")
+        self.assertIsInstance(table.deck, Deck)
+        self.assertIsNone(table.discard)
+        self.assertIsNone(table.message)
+        self.assertEqual(len(x), 1)
+
+    def test_same_table(self):
+        x = TableRegistry()
+        self.assertIs(x.get("abc"), x.get("abc"))
+
+    def test_independent_tables(self):
+        x = TableRegistry()
+        table1 = x.get("a")
+        table2 = x.get("b")
+        self.assertIsNot(table1.deck, table2.deck)
+        self.assertIsNot(table1.deck.lock, table2.deck.lock)
+        self.assertIsNot(table1.events, table2.events)
+
+    def test_default_table(self):
+        x = TableRegistry()
+        table = x.get(TableRegistry.DEFAULT_TABLE_ID)
+        self.assertIs(table, x.default_table)
+        self.assertEqual(len(x), 0)
+
+    def test_invalid_table_id(self):
+        x = TableRegistry()
+        for table_id in ("a/b", "a.b", "x" * 65, u"\u00e9"):
+            with self.assertRaises(ValueError):
+                x.get(table_id)
+
+    def test_seed(self):
+        x1 = TableRegistry(seed=1)
+        x2 = TableRegistry(seed=1)
+        for x in (x1, x2):
+            x.get("a").deck.shuffle()
+            x.get("b").deck.shuffle()
+            x.default_table.deck.shuffle()
+        self.assertListEqual(x1.get("a").deck, x2.get("a").deck)
+        self.assertListEqual(x1.default_table.deck, x2.default_table.deck)
+        self.assertNotEqual(x1.get("a").deck, x1.get("b").deck)
+
+################################################################################
+
+class Test_eviction(unittest.TestCase):
+    """
+    Unit tests for the eviction of tables by TableRegistry.get()
+    """
+
+    def test_max_tables(self):
+        x = TableRegistry(max_tables=2)
+        table_a = x.get("a")
+        x.get("b")
+        x.get("a")
+        x.get("c")
+        self.assertListEqual(list(x.tables), ["a", "c"])
+        self.assertIs(x.get("a"), table_a)
+
+    def test_default_table_not_counted(self):
+        x = TableRegistry(max_tables=1)
+        default_table = x.default_table
+        x.get("a")
+        x.get("b")
+        self.assertListEqual(list(x.tables), ["b"])
+        self.assertIs(x.get(TableRegistry.DEFAULT_TABLE_ID), default_table)
+
+    def test_idle_timeout(self):
+        x = TableRegistry(idle_timeout=60)
+        table_a = x.get("a")
+        table_a.last_used -= 61
+        x.get("b")
+        self.assertListEqual(list(x.tables), ["b"])
+        self.assertIsNot(x.get("a"), table_a)
+
+    def test_idle_table_with_subscribers(self):
+        x = TableRegistry(idle_timeout=60)
+        table_a = x.get("a")
+        table_a.events.subscribe()
+        table_a.last_used -= 61
+        x.get("b")
+        self.assertListEqual(list(x.tables), ["b", "a"])
+
+    def test_evicted_table_closed(self):
+        x = TableRegistry(max_tables=1)
+        subscriber = x.get("a").events.subscribe()
+        x.get("b")
+        self.assertIsNone(subscriber.get(0))
+
+    def test_on_evict_holding_lock(self):
+        x = TableRegistry(max_tables=1)
+        evicted = []
+        x.on_evict = lambda table_id, incarnation: evicted.append(
+            (table_id, incarnation, x.lock.locked()))
+        table_a = x.get("a")
+        x.get("b")
+        self.assertListEqual(evicted, [("a", table_a.incarnation, True)])
+
+    def test_incarnation(self):
+        x = TableRegistry(max_tables=1)
+        table_a = x.get("a")
+        table_b = x.get("b")
+        self.assertEqual(x.default_table.incarnation, 0)
+        self.assertGreater(table_a.incarnation, 0)
+        self.assertGreater(table_b.incarnation, table_a.incarnation)
+        self.assertGreater(x.get("a").incarnation, table_b.incarnation)
+
+    def test_saved_states(self):
+        x = TableRegistry(max_tables=2, idle_timeout=60)
+        evicted = []
+        x.on_evict = lambda table_id, incarnation: evicted.append(table_id)
+        now = time.time()
+        x.restore({
+            "a": (1, now - 30, 1, FACTORY_CODES, None, 0),
+            "b": (2, now - 10, 1, FACTORY_CODES, None, 0),
+            "c": (3, now - 20, 1, FACTORY_CODES, None, 0),
+            "d": (4, now - 61, 1, FACTORY_CODES, None, 0),
+        })
+        # the idle and least-recently used saved states are discarded
+        self.assertListEqual(evicted, ["d", "a"])
+        self.assertListEqual(list(x.saved_states), ["c", "b"])
+
+        x.get("e")
+        self.assertListEqual(evicted, ["d", "a", "c"])
+        self.assertEqual(x.get("b").snapshot.version, 1)
+        self.assertListEqual(evicted, ["d", "a", "c"])
+        self.assertEqual(len(x.saved_states), 0)
+        self.assertListEqual(list(x.tables), ["e", "b"])
+
+################################################################################
+
+class Test_close(unittest.TestCase):
+    """
+    Unit tests for TableRegistry.close()
+    """
+
+    def test_close(self):
+        x = TableRegistry()
+        subscriber1 = x.get("a").events.subscribe()
+        subscriber2 = x.default_table.events.subscribe()
+        x.close()
+        self.assertIsNone(subscriber1.get(0))
+        self.assertIsNone(subscriber2.get(0))
+
+################################################################################
+
+class Test_is_valid_table_id(unittest.TestCase):
+    """
+    Unit tests for TableRegistry.is_valid_table_id()
+    """
+
+    def test_valid(self):
+        for table_id in ("a", "Table_1", "x-y", "9" * 64):
+            self.assertTrue(TableRegistry.is_valid_table_id(table_id))
+
+    def test_invalid(self):
+        for table_id in ("", "a b", "a/b", "..", "x" * 65, "a\n"):
+            self.assertFalse(TableRegistry.is_valid_table_id(table_id))
@@ -0,0 +1,111 @@
+import unittest
+
+import cards
+from cards import shuffle_batch
+
+################################################################################
+
+class ShuffleBatchTestsMixin(object):
+    """
+    Unit tests for shuffle_batch() that are run with and without NumPy.
+    """
+
+    USE_NUMPY = None
+
+    def shuffle_batch(self, *args, **kwargs):
+        kwargs["use_numpy"] = self.USE_NUMPY
+        perms = shuffle_batch(*args, **kwargs)
+        return [list(row) for row in perms]
+
+    def assertPermutations(self, perms, n_decks, num_cards):
+        self.assertEqual(len(perms), n_decks)
+        for perm in perms:
+            self.assertListEqual(sorted(perm), range(num_cards))
+
+    def test_random(self):
+        perms = self.shuffle_batch(100, "random", seed=1)
+        self.assertPermutations(perms, 100, 52)
+        self.assertNotEqual(perms[0], perms[1])
+
+    def test_3waycut(self):
+        perms = self.shuffle_batch(100, "3waycut", seed=1)
+        self.assertPermutations(perms, 100, 52)
+        for perm in perms:
+            # a 3-way cut leaves at most 3 "breaks" in the original order
+            breaks = sum(1 for (a, b) in zip(perm, perm[1:]) if b != a + 1)
+            self.assertLessEqual(breaks, 2)
+
+    def test_riffle(self):
+        perms = self.shuffle_batch(100, "riffle", seed=1)
+        self.assertPermutations(perms, 100, 52)
+        for perm in perms:
+            # a riffle interleaves 2 piles, each of which keeps its order
+            rising = [card for card in perm if card < perm[0]]
+            self.assertListEqual(rising, sorted(rising))
+
+    def test_riffle_times(self):
+        perms = self.shuffle_batch(20, "riffle", seed=1, times=7)
+        self.assertPermutations(perms, 20, 52)
+
+    def test_num_cards(self):
+        for method in cards.SHUFFLE_METHODS:
+            for num_cards in (0, 1, 2, 3, 10, 312):
+                if method == "3waycut" and num_cards < 3:
+                    continue
+                perms = self.shuffle_batch(5, method, seed=1,
+                    num_cards=num_cards)
+                self.assertPermutations(perms, 5, num_cards)
+
+    def test_3waycut_too_few_cards(self):
+        for num_cards in (0, 1, 2):
+            with self.assertRaises(ValueError):
+                self.shuffle_batch(5, "3waycut", num_cards=num_cards)
+
+    def test_seed(self):
+        for method in cards.SHUFFLE_METHODS:
+            perms1 = self.shuffle_batch(10, method, seed=123)
+            perms2 = self.shuffle_batch(10, method, seed=123)
+            self.assertListEqual(perms1, perms2)
+
+    def test_zero_decks(self):
+        perms = self.shuffle_batch(0, "random")
+        self.assertEqual(len(perms), 0)
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            self.shuffle_batch(1, "foo")
+
+################################################################################
+
+class Test_shuffle_batch_python(ShuffleBatchTestsMixin, unittest.TestCase):
+    """
+    Unit tests for the pure Python implementation of shuffle_batch().
+    """
+
+    USE_NUMPY = False
+
+    def test_returns_lists(self):
+        perms = shuffle_batch(2, "random", use_numpy=False)
+        self.assertIsInstance(perms, list)
+        self.assertIsInstance(perms[0], list)
+
+################################################################################
+
+@unittest.skipIf(cards.numpy is None, "NumPy is not installed")
+class Test_shuffle_batch_numpy(ShuffleBatchTestsMixin, unittest.TestCase):
+    """
+    Unit tests for the NumPy implementation of shuffle_batch().
+    """
+
+    USE_NUMPY = True
+
+    def test_returns_array(self):
+        perms = shuffle_batch(2, "random", use_numpy=True)
+        self.assertIsInstance(perms, cards.numpy.ndarray)
+        self.assertEqual(perms.shape, (2, 52))
+
+    def test_more_decks_than_chunk_size(self):
+        n_decks = cards.SHUFFLE_BATCH_CHUNK_SIZE + 3
+        perms = shuffle_batch(n_decks, "riffle", seed=1, use_numpy=True)
+        self.assertEqual(perms.shape, (n_decks, 52))
+        self.assertListEqual(sorted(perms[-1]), range(52))